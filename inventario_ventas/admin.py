@@ -1,12 +1,27 @@
-from django.contrib import admin
-from django.utils.html import format_html # <<< Importar para el HTML
+import io
+from collections import defaultdict
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.forms.models import BaseInlineFormSet
+from django.shortcuts import redirect, render
+from django.urls import path
+from django.db.models import F, Sum, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce, Round
+from django.utils.html import format_html, format_html_join # <<< Importar para el HTML
 
 # Register your models here.
 
 from .models import (
     Tienda, Editorial, Bodega, Staff, Cliente, 
-    Libro, Stock, Venta, DetalleVenta
+    Libro, Stock, Venta, DetalleVenta, MovimientoInventario, ComprobanteOrden
 )
+from .asignacion import StockInsuficiente, asignar_lineas
+from .dinero import Dinero
+from .busqueda import filtrar_por_busqueda
+from .forms import ImportarCatalogoForm
+from .importacion import formato_de, importar
+from .templatetags.portadas import portada_miniatura_url
 
 # --- INLINE para Stock ---
 
@@ -14,6 +29,8 @@ from .models import (
 class StockInline(admin.TabularInline):
     model = Stock
     extra = 1  # Muestra un campo vacío adicional para agregar nuevo stock
+    # Buscador en lugar de un <select> con todas las bodegas en cada fila
+    autocomplete_fields = ('bodega',)
 
 # --- Administrador del Libro (Custom) ---
 
@@ -29,33 +46,130 @@ class LibroAdmin(admin.ModelAdmin):
     )
     # Filtros laterales
     list_filter = ('editorial', 'autor')
-    # Campos de búsqueda
+    # Campos de búsqueda (se resuelven con el índice FTS5, ver get_search_results)
     search_fields = ('nombre', 'autor', 'editorial__nombre')
+    # Mismo orden que el índice (nombre, id): el autocompletado pagina sin ordenar en memoria
+    ordering = ('nombre', 'id')
     
     # El inline que inyecta la tabla Stock en el formulario de Libro
     inlines = [StockInline] 
     
+    def get_queryset(self, request):
+        # Editorial y resumen de stock en la misma consulta (un JOIN, no una consulta por fila).
+        # El total se anota para poder ordenar la columna.
+        return super().get_queryset(request).select_related('editorial', 'resumen_stock').annotate(
+            stock_total_anotado=Coalesce(F('resumen_stock__total'), 0),
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Índice FTS5 en lugar de LIKE '%...%' sobre tres columnas. El
+        # autocompletado de los formularios (libro en DetalleVenta) busca solo
+        # por título y autor.
+        if not search_term.strip():
+            return queryset, False
+        columnas = None
+        if request.resolver_match and request.resolver_match.url_name == 'autocomplete':
+            columnas = ('nombre', 'autor')
+        return filtrar_por_busqueda(queryset, search_term, columnas), False
+
     # Define la columna calculada para mostrar el stock total
     def stock_total_display(self, obj):
-        return obj.stock_total
+        return obj.stock_total_anotado
     stock_total_display.short_description = 'Stock Total'
+    stock_total_display.admin_order_field = 'stock_total_anotado'
 
     def mostrar_portada(self, obj):
         if obj.portada:
             # Usa format_html para inyectar código HTML seguro
-            return format_html('<img src="{}" style="width: 50px; height: auto; border-radius: 4px;" />', obj.portada.url)
+            # Miniatura de 80px (derivado WebP), no el PNG original completo
+            return format_html('<img src="{}" style="width: 50px; height: auto; border-radius: 4px;" loading="lazy" />', portada_miniatura_url(obj.portada))
         return "Sin portada"
     
     mostrar_portada.short_description = 'Portada' # Nombre de la columna en el admin    
 
+    # Carga masiva desde CSV/JSON Lines (botón "Importar" en la lista).
+    # Los archivos de más de FILE_UPLOAD_MAX_MEMORY_SIZE llegan a un archivo
+    # temporal y se leen por bloques; para millones de filas es mejor el
+    # comando importar_catalogo (no depende del tiempo máximo del request).
+    def get_urls(self):
+        return [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='inventario_ventas_libro_importar'),
+            *super().get_urls(),
+        ]
+
+    def importar_view(self, request):
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        form = ImportarCatalogoForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            formato = form.cleaned_data['formato'] or formato_de(archivo.name)
+            if formato is None:
+                form.add_error('formato', "No se reconoce la extensión del archivo; elige el formato.")
+            else:
+                texto = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+                try:
+                    resumen = importar(texto, formato, entradas=form.cleaned_data['entradas'])
+                except UnicodeDecodeError:
+                    form.add_error('archivo', "El archivo no está en UTF-8.")
+                else:
+                    self._informar_importacion(request, resumen)
+                    return redirect('admin:inventario_ventas_libro_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Importar libros y stock",
+            'form': form,
+        }
+        return render(request, 'admin/inventario_ventas/libro/importar.html', context)
+
+    def _informar_importacion(self, request, resumen):
+        datos = resumen.como_dict()
+        self.message_user(request, (
+            f"{datos['filas']} filas en {datos['segundos']} s: {datos['libros']} libros, "
+            f"{datos['editoriales_nuevas']} editoriales nuevas, {datos['stock']} filas de stock, "
+            f"{datos['movimientos']} movimientos."
+        ), messages.SUCCESS)
+        if resumen.num_errores:
+            detalle = '; '.join(f"fila {fila or '?'}: {mensaje}" for fila, mensaje in resumen.errores[:5])
+            self.message_user(request, f"{resumen.num_errores} filas con errores ({detalle}).", messages.WARNING)
+
 admin.site.register(Libro, LibroAdmin)
 # --- INLINE para Detalle de Venta ---
 
+def _se_confirma(venta):
+    # PENDIENTE -> CONFIRMADA, o una venta nueva que se crea ya CONFIRMADA
+    estado_previo = None if venta._state.adding else getattr(venta, '_estado_original', None)
+    return venta.estado == 'CONFIRMADA' and estado_previo in (None, 'PENDIENTE')
+
+
+class DetalleVentaFormSet(BaseInlineFormSet):
+    def clean(self):
+        # Si el envío confirma la venta, las líneas tal como quedan deben poder
+        # surtirse: si no, es un error del formulario y no se guarda nada
+        super().clean()
+        if any(self.errors) or not _se_confirma(self.instance):
+            return
+        lineas = defaultdict(int)
+        for form in self.forms:
+            datos = getattr(form, 'cleaned_data', None)
+            if datos and not datos.get('DELETE') and datos.get('libro') and datos.get('cantidad'):
+                lineas[datos['libro'].pk] += datos['cantidad']
+        try:
+            asignar_lineas(lineas)
+        except StockInsuficiente as e:
+            raise ValidationError(f"No se puede confirmar la venta: {e}")
+
+
 # 2. Permite administrar los DetalleVenta directamente en la página de Venta.
 class DetalleVentaInline(admin.TabularInline):
     model = DetalleVenta
+    formset = DetalleVentaFormSet
     readonly_fields = ('total_linea',)
     extra = 1
+    # Autocompletado paginado contra el buscador de LibroAdmin: el formulario
+    # ya no incluye un <option> por cada libro del catálogo en cada fila
+    autocomplete_fields = ('libro',)
 
 # --- Administrador de la Venta (Custom) ---
 
@@ -63,23 +177,131 @@ class DetalleVentaInline(admin.TabularInline):
 class VentaAdmin(admin.ModelAdmin):
     list_display = ('id', 'fecha_hora', 'cliente', 'staff', 'precio_total', 'total_calculado_display')
     list_filter = ('fecha_hora', 'staff')
+    # Con un filtro activo el admin cuenta además toda la tabla ("de N en total"): no lo necesitamos
+    show_full_result_count = False
+    list_select_related = ('cliente', 'staff')
+    autocomplete_fields = ('cliente', 'staff')
     search_fields = ('cliente__nombre', 'cliente__apellido', 'staff__nombre')
     inlines = [DetalleVentaInline]
     # Hace el precio_total readonly y lo calcularemos antes de guardar
-    readonly_fields = ('precio_total',) 
+    readonly_fields = ('precio_total', 'comprobante_display') 
+
+    # save_model corre antes de guardar las líneas del inline: si ahí se
+    # confirmara, la asignación usaría las líneas de antes de la edición (y una
+    # venta nueva todavía no tiene ninguna). Se guarda con el estado anterior
+    # (PENDIENTE si es nueva) y se confirma en save_related, con las líneas ya guardadas.
+    def save_model(self, request, obj, form, change):
+        obj._confirmar_despues = _se_confirma(obj)
+        if obj._confirmar_despues:
+            obj.estado = 'PENDIENTE'
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        venta = form.instance
+        if not getattr(venta, '_confirmar_despues', False):
+            return
+        venta.estado = 'CONFIRMADA'
+        try:
+            venta.save()
+        except StockInsuficiente as e:
+            # El stock cambió después de validar el formulario (ver DetalleVentaFormSet).
+            # La confirmación se revierte; el resto de los cambios ya quedó guardado
+            venta.estado = 'PENDIENTE'
+            venta._confirmacion_fallida = True
+            self.message_user(request, f"No se pudo confirmar la Venta #{venta.id}: {e}", messages.ERROR)
+
+    # Tras una confirmación fallida, de vuelta a la venta sin el mensaje de "guardado con éxito"
+    def response_add(self, request, obj, post_url_continue=None):
+        if getattr(obj, '_confirmacion_fallida', False):
+            return redirect('admin:inventario_ventas_venta_change', obj.pk)
+        return super().response_add(request, obj, post_url_continue)
+
+    def response_change(self, request, obj):
+        if getattr(obj, '_confirmacion_fallida', False):
+            return redirect('admin:inventario_ventas_venta_change', obj.pk)
+        return super().response_change(request, obj)
+
+    def get_queryset(self, request):
+        # Suma de las líneas en centavos enteros, en la misma consulta del listado
+        # (ver Venta.total_calculado, que hace lo mismo para una sola venta).
+        # Subconsulta por fila en vez de JOIN + GROUP BY: así el filtro por fecha
+        # usa el índice de fecha_hora y el COUNT del paginador no agrupa toda la tabla.
+        lineas = (
+            DetalleVenta.objects.filter(venta=OuterRef('pk'))
+            .values('venta')
+            .annotate(total=Sum(
+                Coalesce(F('cantidad'), 0) * Cast(Round(Coalesce(F('precio'), 0) * 100), IntegerField())
+            ))
+            .values('total')
+        )
+        return super().get_queryset(request).annotate(
+            total_calculado_centavos=Subquery(lineas, output_field=IntegerField()),
+        )
 
     # Muestra el total calculado antes de guardar (para comparación)
     def total_calculado_display(self, obj):
-        return f"{obj.total_calculado:.2f}"
+        return f"{Dinero(obj.total_calculado_centavos or 0):.2f}"
     total_calculado_display.short_description = 'Total Calculado'
+    total_calculado_display.admin_order_field = 'total_calculado_centavos'
+
+    # Lo que pidió el cliente en el checkout (una búsqueda por PK, sin leer las líneas)
+    def comprobante_display(self, obj):
+        try:
+            comprobante = obj.comprobante
+        except ComprobanteOrden.DoesNotExist:
+            return "Sin comprobante (venta registrada fuera del checkout)"
+        return format_html(
+            '{}<br>{}<strong>Total: ${}</strong>',
+            ' | '.join(str(valor) for valor in comprobante.contacto.values() if valor),
+            format_html_join(
+                '', '• {} (x{}) — ${}<br>',
+                ((linea.titulo, linea.cantidad, linea.total_linea) for linea in comprobante.lineas),
+            ),
+            comprobante.total,
+        )
+    comprobante_display.short_description = 'Comprobante del Checkout'
+
+# --- Libro Mayor de Inventario (solo lectura) ---
+
+@admin.register(MovimientoInventario)
+class MovimientoInventarioAdmin(admin.ModelAdmin):
+    list_display = ('id', 'fecha_hora', 'tipo', 'libro', 'bodega', 'cantidad', 'venta')
+    list_filter = ('tipo', 'bodega')
+    list_select_related = ('libro', 'bodega', 'venta')
+    raw_id_fields = ('libro', 'bodega', 'venta')
+
+    # El registro es de solo-anexado: no se crea ni se edita a mano
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 # --- Registro de Modelos Simples ---
 
 # 3. Modelos sin personalización avanzada, simplemente se registran.
 admin.site.register(Tienda)
 admin.site.register(Editorial)
-admin.site.register(Bodega)
-admin.site.register(Staff)
-admin.site.register(Cliente)
+
+# Con search_fields para poder usarlos en autocomplete_fields
+
+@admin.register(Bodega)
+class BodegaAdmin(admin.ModelAdmin):
+    search_fields = ('=id', 'nota')
+    ordering = ('id',)
+
+@admin.register(Staff)
+class StaffAdmin(admin.ModelAdmin):
+    search_fields = ('nombre', 'apellido')
+    ordering = ('nombre', 'apellido', 'id')
+
+@admin.register(Cliente)
+class ClienteAdmin(admin.ModelAdmin):
+    search_fields = ('nombre', 'apellido', 'telefono')
+    ordering = ('nombre', 'apellido', 'id')
 
 # Stock no se registra solo porque se administra desde Libro
@@ -0,0 +1,303 @@
+import logging
+import re
+import secrets
+from decimal import InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .dinero import Dinero
+from .models import LineaCarrito
+
+logger = logging.getLogger(__name__)
+
+# Dónde guarda el Carrito sus líneas (settings.CARRITO_ALMACEN):
+#   'cookie' -> cookie firmada con el carrito codificado (sin tocar la BD)
+#   'cache'  -> framework de caché de Django (settings.CARRITO_CACHE)
+#   'tabla'  -> tabla LineaCarrito, una fila por libro (UPDATE de una fila por cambio)
+#   'sesion' -> request.session como antes (cada cambio reescribe la sesión entera)
+# 'cache' y 'tabla' identifican al cliente con un token aleatorio en una cookie.
+#
+# Todos trabajan con el mismo formato en memoria:
+#   {libro_id (str): {'cantidad': int, 'precio': centavos (int)}}
+# y la cookie (si cambió) se escribe en la respuesta desde CarritoMiddleware.
+
+ALMACEN_POR_DEFECTO = 'cookie'
+CLAVE_SESION = 'carrito'
+SAL_COOKIE = 'inventario_ventas.carrito'
+TOKEN_VALIDO = re.compile(r'^[A-Za-z0-9_-]{32}$')
+# Los navegadores descartan cookies de más de ~4096 bytes
+MAX_BYTES_COOKIE = 4000
+
+
+def nombre_cookie():
+    return getattr(settings, 'CARRITO_COOKIE_NOMBRE', 'carrito')
+
+
+def edad_cookie():
+    return getattr(settings, 'CARRITO_COOKIE_EDAD', settings.SESSION_COOKIE_AGE)
+
+
+class AlmacenCarrito:
+    """Interfaz común de los backends. `datos` se carga una vez por request."""
+
+    def __init__(self, request):
+        self.request = request
+
+    @cached_property
+    def datos(self):
+        return self.cargar()
+
+    def cargar(self):
+        raise NotImplementedError
+
+    async def acargar(self):
+        # Por defecto, cargar() en un hilo; los backends con API async la sobrescriben
+        return await sync_to_async(self.cargar)()
+
+    async def adatos(self):
+        """Carga `datos` sin bloquear el bucle de eventos; después se usan igual que siempre."""
+        if 'datos' not in self.__dict__:
+            self.__dict__['datos'] = await self.acargar()
+        return self.datos
+
+    def fijar(self, libro_id, cantidad, precio):
+        raise NotImplementedError
+
+    def quitar(self, libro_id):
+        raise NotImplementedError
+
+    def vaciar(self):
+        raise NotImplementedError
+
+    def actualizar_respuesta(self, response):
+        pass
+
+
+def a_centavos(precio):
+    # Los carritos guardados antes de usar centavos traen el precio como '12.50'
+    if isinstance(precio, int):
+        return precio
+    return Dinero.desde_decimal(precio).centavos
+
+
+class AlmacenSesion(AlmacenCarrito):
+
+    def cargar(self):
+        # Sin escribir un carrito vacío en la sesión solo por leerlo
+        return self._normalizar(self.request.session.get(CLAVE_SESION))
+
+    async def acargar(self):
+        return self._normalizar(await self.request.session.aget(CLAVE_SESION))
+
+    def _normalizar(self, carrito):
+        carrito = carrito or {}
+        for item in carrito.values():
+            item['precio'] = a_centavos(item['precio'])
+        return carrito
+
+    def _guardar(self):
+        self.request.session[CLAVE_SESION] = self.datos
+
+    def fijar(self, libro_id, cantidad, precio):
+        self.datos[libro_id] = {'cantidad': cantidad, 'precio': precio}
+        self._guardar()
+
+    def quitar(self, libro_id):
+        self.datos.pop(libro_id, None)
+        self._guardar()
+
+    def vaciar(self):
+        self.datos.clear()
+        self.request.session.pop(CLAVE_SESION, None)
+
+
+def codificar(datos):
+    # "12:3:15000|45:1:9950" (precio en centavos; solo caracteres válidos en una cookie sin comillas)
+    return '|'.join(f"{libro_id}:{item['cantidad']}:{item['precio']}" for libro_id, item in datos.items())
+
+
+def decodificar(valor):
+    datos = {}
+    for parte in filter(None, (valor or '').split('|')):
+        try:
+            libro_id, cantidad, precio = parte.split(':')
+            datos[str(int(libro_id))] = {'cantidad': int(cantidad), 'precio': a_centavos(precio if '.' in precio else int(precio))}
+        except (ValueError, InvalidOperation):
+            return {}  # Cookie corrupta: empezamos con un carrito vacío
+    return datos
+
+
+class AlmacenCookieFirmada(AlmacenCarrito):
+
+    modificado = False
+
+    def cargar(self):
+        valor = self.request.get_signed_cookie(nombre_cookie(), default=None, salt=SAL_COOKIE, max_age=edad_cookie())
+        return decodificar(valor)
+
+    async def acargar(self):
+        # Solo lee la cookie: no hay E/S que esperar
+        return self.cargar()
+
+    def fijar(self, libro_id, cantidad, precio):
+        self.datos[libro_id] = {'cantidad': cantidad, 'precio': precio}
+        self.modificado = True
+
+    def quitar(self, libro_id):
+        if self.datos.pop(libro_id, None) is not None:
+            self.modificado = True
+
+    def vaciar(self):
+        self.datos.clear()
+        self.modificado = True
+
+    def actualizar_respuesta(self, response):
+        if not self.modificado:
+            return
+        if not self.datos:
+            response.delete_cookie(nombre_cookie(), samesite='Lax')
+            return
+        valor = codificar(self.datos)
+        if len(valor) > MAX_BYTES_COOKIE:
+            logger.warning("Carrito de %d bytes: el navegador podría descartar la cookie", len(valor))
+        response.set_signed_cookie(
+            nombre_cookie(), valor, salt=SAL_COOKIE, max_age=edad_cookie(),
+            httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+        )
+
+
+class _AlmacenConToken(AlmacenCarrito):
+    """Base de los backends del lado del servidor: la cookie solo lleva un token."""
+
+    token_nuevo = False
+
+    @cached_property
+    def token_actual(self):
+        token = self.request.COOKIES.get(nombre_cookie())
+        return token if token and TOKEN_VALIDO.match(token) else None
+
+    def token(self):
+        # Solo se genera (y se envía la cookie) al modificar el carrito por primera vez
+        if self.token_actual is None:
+            self.token_actual = secrets.token_urlsafe(24)
+            self.token_nuevo = True
+        return self.token_actual
+
+    def actualizar_respuesta(self, response):
+        if self.token_nuevo:
+            response.set_cookie(
+                nombre_cookie(), self.token_actual, max_age=edad_cookie(),
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+
+
+class AlmacenCache(_AlmacenConToken):
+
+    @cached_property
+    def cache(self):
+        return caches[getattr(settings, 'CARRITO_CACHE', 'default')]
+
+    def _clave(self, token):
+        return f'carrito:{token}'
+
+    def cargar(self):
+        if self.token_actual is None:
+            return {}
+        return self.cache.get(self._clave(self.token_actual)) or {}
+
+    async def acargar(self):
+        if self.token_actual is None:
+            return {}
+        return await self.cache.aget(self._clave(self.token_actual)) or {}
+
+    def _guardar(self):
+        self.cache.set(self._clave(self.token()), self.datos, edad_cookie())
+
+    def fijar(self, libro_id, cantidad, precio):
+        self.datos[libro_id] = {'cantidad': cantidad, 'precio': precio}
+        self._guardar()
+
+    def quitar(self, libro_id):
+        if self.datos.pop(libro_id, None) is not None:
+            self._guardar()
+
+    def vaciar(self):
+        self.datos.clear()
+        if self.token_actual is not None:
+            self.cache.delete(self._clave(self.token_actual))
+
+
+class AlmacenTabla(_AlmacenConToken):
+
+    def cargar(self):
+        if self.token_actual is None:
+            return {}
+        return {
+            str(libro_id): {'cantidad': cantidad, 'precio': precio}
+            for libro_id, cantidad, precio in self._lineas()
+        }
+
+    async def acargar(self):
+        if self.token_actual is None:
+            return {}
+        return {
+            str(libro_id): {'cantidad': cantidad, 'precio': precio}
+            # async for sobre el queryset (no aiterator: con values_list la consulta
+            # se ejecutaría fuera del hilo de sync_to_async)
+            async for libro_id, cantidad, precio in self._lineas()
+        }
+
+    def _lineas(self):
+        return LineaCarrito.objects.filter(carrito=self.token_actual).values_list('libro_id', 'cantidad', 'precio_centavos')
+
+    def fijar(self, libro_id, cantidad, precio):
+        token = self.token()
+        nueva = libro_id not in self.datos
+        self.datos[libro_id] = {'cantidad': cantidad, 'precio': precio}
+        if nueva:
+            # INSERT OR IGNORE por si otra pestaña ya la creó; el UPDATE de abajo fija los valores
+            LineaCarrito.objects.bulk_create(
+                [LineaCarrito(carrito=token, libro_id=int(libro_id), cantidad=cantidad, precio_centavos=precio)],
+                ignore_conflicts=True,
+            )
+        LineaCarrito.objects.filter(carrito=token, libro_id=int(libro_id)).update(
+            cantidad=cantidad, precio_centavos=precio, actualizado=timezone.now(),
+        )
+
+    def quitar(self, libro_id):
+        if self.datos.pop(libro_id, None) is not None and self.token_actual is not None:
+            LineaCarrito.objects.filter(carrito=self.token_actual, libro_id=int(libro_id)).delete()
+
+    def vaciar(self):
+        self.datos.clear()
+        if self.token_actual is not None:
+            LineaCarrito.objects.filter(carrito=self.token_actual).delete()
+
+
+ALMACENES = {
+    'cookie': AlmacenCookieFirmada,
+    'cache': AlmacenCache,
+    'tabla': AlmacenTabla,
+    'sesion': AlmacenSesion,
+}
+
+
+def clase_almacen(nombre=None):
+    nombre = nombre or getattr(settings, 'CARRITO_ALMACEN', ALMACEN_POR_DEFECTO)
+    try:
+        return ALMACENES[nombre]
+    except KeyError:
+        raise ImproperlyConfigured(f"CARRITO_ALMACEN desconocido: {nombre!r} (opciones: {', '.join(ALMACENES)})")
+
+
+def almacen_para(request):
+    """Un solo almacén por request, compartido por todas las instancias de Carrito."""
+    almacen = getattr(request, '_carrito_almacen', None)
+    if almacen is None:
+        almacen = request._carrito_almacen = clase_almacen()(request)
+    return almacen
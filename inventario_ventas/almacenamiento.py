@@ -0,0 +1,47 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Almacenamiento "direccionado por contenido" para las portadas:
+# el archivo se guarda como <carpeta>/<sha256[:32]>.<ext>, así que
+#   - el mismo contenido siempre tiene el mismo nombre (subir dos veces la
+#     misma portada no ocupa más disco), y
+#   - un nombre nunca cambia de contenido, por lo que se puede servir con
+#     Cache-Control: immutable (ver views.servir_media).
+
+LONGITUD_HASH = 32
+
+# <hash>.<ext> o <hash>-<ancho>-<firma>.<ext> (derivados de portadas.py, la
+# firma cambia con las opciones con que se generan)
+NOMBRE_INMUTABLE = re.compile(r'^[0-9a-f]{%d}(-\d+-[0-9a-f]{8})?\.[A-Za-z0-9]+$' % LONGITUD_HASH)
+
+
+def es_nombre_inmutable(nombre):
+    return bool(NOMBRE_INMUTABLE.match(os.path.basename(nombre)))
+
+
+def hash_contenido(contenido):
+    digest = hashlib.sha256()
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    for bloque in contenido.chunks() if hasattr(contenido, 'chunks') else iter(lambda: contenido.read(65536), b''):
+        digest.update(bloque)
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    return digest.hexdigest()[:LONGITUD_HASH]
+
+
+@deconstructible
+class AlmacenamientoPorContenido(FileSystemStorage):
+
+    def _save(self, name, content):
+        carpeta = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        nombre = os.path.join(carpeta, hash_contenido(content) + extension)
+        if self.exists(nombre):
+            # Mismo contenido ya guardado: reutilizamos el archivo
+            return nombre
+        return super()._save(nombre, content)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class InventarioVentasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario_ventas'
+
+    def ready(self):
+        # Registra los receptores de señales (resúmenes de stock, etc.)
+        from . import signals  # noqa: F401
+
+        # PRAGMA de SQLite en cada conexión nueva (synchronous, busy_timeout, ...)
+        from django.db.backends.signals import connection_created
+        from .basedatos import configurar_conexion
+        connection_created.connect(configurar_conexion, dispatch_uid='inventario_ventas.configurar_conexion')
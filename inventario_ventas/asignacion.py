@@ -0,0 +1,145 @@
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import Stock
+
+# Motor de asignación de bodegas para ventas confirmadas.
+# Decide de qué bodega(s) sale cada libro de una Venta. Todo el cálculo se
+# hace en memoria sobre los candidatos cargados con UNA consulta; el
+# descuento se escribe después en bloque en el libro mayor (stock.py).
+#
+# Políticas disponibles (settings.INVENTARIO_POLITICA_ASIGNACION):
+#   'menos_bodegas'      -> cubrir la orden con el menor número de bodegas (greedy)
+#   'mayor_primero'      -> por cada libro, vaciar primero la bodega con más stock
+#   'principal_primero'  -> usar la bodega principal y luego las de más stock
+
+POLITICA_POR_DEFECTO = 'menos_bodegas'
+
+
+class StockInsuficiente(ValueError):
+    """No hay stock suficiente en ninguna combinación de bodegas."""
+
+    def __init__(self, faltantes):
+        # faltantes: {libro_id: unidades que no se pudieron asignar}
+        self.faltantes = faltantes
+        detalle = ', '.join(f"libro {libro_id}: faltan {cantidad}" for libro_id, cantidad in faltantes.items())
+        super().__init__(f"Stock insuficiente ({detalle})")
+
+
+def _mayor_primero(pendiente, candidatos, preferida=None):
+    asignaciones = []
+    for libro_id, cantidad in pendiente.items():
+        opciones = sorted(
+            candidatos.get(libro_id, ()),
+            key=lambda opcion: (opcion[0] != preferida, -opcion[1]),
+        )
+        for bodega_id, disponible in opciones:
+            if cantidad <= 0:
+                break
+            tomar = min(cantidad, disponible)
+            asignaciones.append((libro_id, bodega_id, tomar))
+            cantidad -= tomar
+        pendiente[libro_id] = cantidad
+    return asignaciones
+
+
+def _menos_bodegas(pendiente, candidatos):
+    # Inventario por bodega: {bodega_id: {libro_id: disponible}}
+    por_bodega = defaultdict(dict)
+    for libro_id, opciones in candidatos.items():
+        if pendiente.get(libro_id, 0) > 0:
+            for bodega_id, disponible in opciones:
+                por_bodega[bodega_id][libro_id] = disponible
+
+    # Greedy de cobertura: en cada paso se toma la bodega que surte más unidades
+    # pendientes (empate: id menor). La cobertura de cada bodega se mantiene de
+    # forma incremental (al asignar un libro solo cambian las bodegas que lo
+    # tienen) y el heap es "perezoso": como la cobertura solo baja, el valor
+    # encolado es una cota superior y solo se corrige al llegar arriba.
+    cobertura = {
+        bodega_id: sum(min(pendiente[libro_id], disponible) for libro_id, disponible in inventario.items())
+        for bodega_id, inventario in por_bodega.items()
+    }
+    heap = [(-valor, bodega_id) for bodega_id, valor in cobertura.items()]
+    heapq.heapify(heap)
+
+    asignaciones = []
+    total_pendiente = sum(pendiente.values())
+    while heap and total_pendiente > 0:
+        valor, bodega_id = heapq.heappop(heap)
+        actual = cobertura.get(bodega_id)
+        if not actual:
+            continue  # Ya usada o sin nada que aportar
+        if actual != -valor:
+            # La cobertura bajó desde que se encoló: se reinserta con su valor real
+            heapq.heappush(heap, (-actual, bodega_id))
+            continue
+        del cobertura[bodega_id]
+
+        for libro_id, disponible in por_bodega.pop(bodega_id).items():
+            antes = pendiente[libro_id]
+            tomar = min(antes, disponible)
+            if tomar <= 0:
+                continue
+            asignaciones.append((libro_id, bodega_id, tomar))
+            despues = pendiente[libro_id] = antes - tomar
+            total_pendiente -= tomar
+
+            for otra_id, otra_disponible in candidatos[libro_id]:
+                if otra_id in cobertura:
+                    cobertura[otra_id] -= min(antes, otra_disponible) - min(despues, otra_disponible)
+    return asignaciones
+
+
+def asignar(lineas, candidatos, politica=POLITICA_POR_DEFECTO, bodega_principal=None):
+    """
+    Núcleo del motor (sin acceso a la BD).
+    `lineas`: {libro_id: cantidad pedida}
+    `candidatos`: {libro_id: [(bodega_id, disponible), ...]}
+    Devuelve [(libro_id, bodega_id, cantidad), ...] o lanza StockInsuficiente.
+    """
+    pendiente = {libro_id: cantidad for libro_id, cantidad in lineas.items() if cantidad > 0}
+
+    if politica == 'menos_bodegas':
+        asignaciones = _menos_bodegas(pendiente, candidatos)
+    elif politica == 'mayor_primero':
+        asignaciones = _mayor_primero(pendiente, candidatos)
+    elif politica == 'principal_primero':
+        asignaciones = _mayor_primero(pendiente, candidatos, preferida=bodega_principal)
+    else:
+        raise ValueError(f"Política de asignación desconocida: {politica!r}")
+
+    faltantes = {libro_id: cantidad for libro_id, cantidad in pendiente.items() if cantidad > 0}
+    if faltantes:
+        raise StockInsuficiente(faltantes)
+    return asignaciones
+
+
+def cargar_candidatos(libro_ids):
+    """Stock positivo de todos los libros indicados, en una sola consulta."""
+    candidatos = defaultdict(list)
+    filas = (
+        Stock.objects.filter(libro_id__in=libro_ids, cantidad__gt=0)
+        .order_by('bodega_id')
+        .values_list('libro_id', 'bodega_id', 'cantidad')
+    )
+    for libro_id, bodega_id, cantidad in filas:
+        candidatos[libro_id].append((bodega_id, cantidad))
+    return candidatos
+
+
+def asignar_venta(venta, politica=None):
+    """Calcula de qué bodegas sale cada libro de `venta` (2 consultas en total)."""
+    lineas = defaultdict(int)
+    for libro_id, cantidad in venta.detalleventa_set.values_list('libro_id', 'cantidad'):
+        lineas[libro_id] += cantidad
+    return asignar_lineas(lineas, politica)
+
+
+def asignar_lineas(lineas, politica=None):
+    """Como asignar_venta, para {libro_id: cantidad} que aún no están guardadas (1 consulta)."""
+    politica = politica or getattr(settings, 'INVENTARIO_POLITICA_ASIGNACION', POLITICA_POR_DEFECTO)
+    bodega_principal = getattr(settings, 'INVENTARIO_BODEGA_PRINCIPAL', None)
+    return asignar(lineas, cargar_candidatos(lineas.keys()), politica, bodega_principal)
@@ -0,0 +1,104 @@
+import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, transaction
+
+# Ajustes de SQLite y escrituras serializadas.
+#
+# El modo WAL se activa una sola vez en la migración 0015: journal_mode queda
+# guardado en el archivo de la BD. Con WAL las lecturas no esperan a las
+# escrituras (ni al revés); solo puede haber un escritor a la vez.
+# configurar_conexion() se conecta a connection_created (ver apps.py) y aplica
+# los PRAGMA que valen solo para la conexión; no escribe en el archivo, así que
+# un comando cualquiera de manage.py no cambia la BD.
+# Con CONN_MAX_AGE las conexiones se reutilizan y esto pasa una vez por conexión.
+#
+# escritura_serializada envuelve los caminos calientes de escritura (checkout,
+# confirmar venta, movimientos de stock):
+#   - con settings.ESCRITOR_SERIALIZADO, los hilos de este proceso hacen fila en
+#     un candado de Python en vez de pelearse el candado de SQLite (que espera
+#     con sleeps cada vez más largos y dispara la latencia p99);
+#   - si aun así SQLite dice "database is locked" (otro proceso escribiendo más
+#     que busy_timeout), reintenta unas pocas veces con espera exponencial.
+# Dentro de una transacción ya abierta (admin, tests) no hace nada: reintentar
+# ahí no sirve, la transacción de afuera ya falló.
+
+PRAGMAS_POR_DEFECTO = {
+    'foreign_keys': 'ON',
+    'synchronous': 'NORMAL',     # con WAL no se corrompe; solo se puede perder la última transacción si se cae el SO
+    'busy_timeout': 5000,        # ms esperando el candado antes de "database is locked"
+    'cache_size': -20000,        # negativo = KiB (unos 20 MB por conexión)
+    'mmap_size': 134217728,      # 128 MB
+    'temp_store': 'MEMORY',
+}
+
+
+# Se guardan en el archivo de la BD: no van en cada conexión
+PRAGMAS_PERSISTENTES = {'journal_mode', 'page_size', 'auto_vacuum'}
+
+
+def pragmas():
+    """PRAGMA por defecto más los de settings.SQLITE_PRAGMAS (None quita uno)."""
+    valores = {**PRAGMAS_POR_DEFECTO, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+    persistentes = PRAGMAS_PERSISTENTES & valores.keys()
+    if persistentes:
+        raise ImproperlyConfigured(
+            f"SQLITE_PRAGMAS: {', '.join(sorted(persistentes))} se guarda en la BD; cámbielo con una migración."
+        )
+    return {nombre: valor for nombre, valor in valores.items() if valor is not None}
+
+
+def configurar_conexion(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Directo sobre la conexión de sqlite3: no pasa por los wrappers (perfilado, debug)
+    for nombre, valor in pragmas().items():
+        connection.connection.execute(f'PRAGMA {nombre} = {valor}')
+
+
+# --- Escritor serializado ---
+
+_candado_escritura = threading.RLock()
+
+
+def es_bloqueo(error):
+    mensaje = str(error).lower()
+    return isinstance(error, OperationalError) and ('locked' in mensaje or 'busy' in mensaje)
+
+
+@contextmanager
+def turno_escritura():
+    if getattr(settings, 'ESCRITOR_SERIALIZADO', False):
+        with _candado_escritura:
+            yield
+    else:
+        yield
+
+
+def escritura_serializada(funcion):
+    """
+    Decorador para funciones que abren su propia transacción de escritura.
+    La función se puede repetir entera, así que no debe tener efectos fuera de la BD.
+    """
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if transaction.get_connection().in_atomic_block:
+            return funcion(*args, **kwargs)
+
+        reintentos = getattr(settings, 'ESCRITOR_REINTENTOS', 3)
+        espera = getattr(settings, 'ESCRITOR_ESPERA_SEGUNDOS', 0.05)
+        for intento in range(reintentos + 1):
+            try:
+                with turno_escritura():
+                    return funcion(*args, **kwargs)
+            except OperationalError as error:
+                if not es_bloqueo(error) or intento == reintentos:
+                    raise
+            # Espera exponencial con algo de azar para no reintentar todos a la vez
+            time.sleep(espera * 2 ** intento * random.uniform(0.5, 1.5))
+    return envoltura
@@ -0,0 +1,123 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Libro, Editorial
+
+# Índice de texto completo (SQLite FTS5) para el buscador del catálogo.
+# La tabla virtual usa el id del libro como rowid y el tokenizador
+# unicode61 con remove_diacritics, así "dragon" encuentra "Dragón".
+# Se crea en la migración 0004 y se mantiene con las señales de Libro/Editorial.
+
+TABLA_FTS = 'inventario_ventas_libro_fts'
+
+# Pesos de bm25 por columna: nombre, autor, ilustrador, editorial, sinopsis
+PESOS_BM25 = (10.0, 5.0, 2.0, 3.0, 1.0)
+
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_disponible():
+    """El índice solo existe en SQLite; en otros motores se usa LIKE."""
+    return connection.vendor == 'sqlite'
+
+
+def expresion_fts(consulta, columnas=None):
+    """
+    Convierte el texto del usuario en una expresión MATCH segura:
+    cada palabra entre comillas y con '*' (búsqueda por prefijo),
+    todas obligatorias. Con `columnas` (p.ej. ('nombre', 'autor')) solo se
+    busca en esas columnas del índice. Devuelve '' si no hay palabras.
+    """
+    palabras = _PALABRA.findall(consulta or '')
+    expresion = ' '.join(f'"{palabra}"*' for palabra in palabras)
+    if expresion and columnas:
+        expresion = f"{{{' '.join(columnas)}}} : ({expresion})"
+    return expresion
+
+
+def filtrar_por_like(queryset, consulta):
+    """Búsqueda original con icontains (se conserva como respaldo y para el benchmark)."""
+    return queryset.filter(
+        Q(nombre__icontains=consulta) |
+        Q(autor__icontains=consulta) |
+        Q(editorial__nombre__icontains=consulta)
+    )
+
+
+def filtrar_por_busqueda(queryset, consulta, columnas=None):
+    """Filtra un queryset de Libro con el índice FTS5 (o LIKE si no hay FTS)."""
+    expresion = expresion_fts(consulta, columnas)
+    if not fts_disponible() or not expresion:
+        if columnas:
+            filtro = Q()
+            for columna in columnas:
+                filtro |= Q(**{f'{columna}__icontains': consulta})
+            return queryset.filter(filtro)
+        return filtrar_por_like(queryset, consulta)
+    return queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s', [expresion])
+    )
+
+
+def relevancia(consulta):
+    """
+    Expresión con el bm25 de cada libro para `consulta` (menor = más relevante),
+    para anotar un queryset ya filtrado con filtrar_por_busqueda. None si no
+    hay índice FTS o la consulta no tiene palabras (se ordena por nombre).
+    """
+    expresion = expresion_fts(consulta)
+    if not fts_disponible() or not expresion:
+        return None
+    pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+    # Subconsulta por fila con MATCH + rowid: FTS5 la resuelve sin recorrer el índice
+    return RawSQL(
+        f'SELECT bm25({TABLA_FTS}, {pesos}) FROM {TABLA_FTS} '
+        f'WHERE {TABLA_FTS} MATCH %s AND rowid = {Libro._meta.db_table}.id',
+        [expresion], output_field=FloatField(),
+    )
+
+
+# --- Sincronización del índice ---
+
+def _select_documentos(condicion=''):
+    libro = Libro._meta.db_table
+    editorial = Editorial._meta.db_table
+    return (
+        f'INSERT INTO {TABLA_FTS}(rowid, nombre, autor, ilustrador, editorial, sinopsis) '
+        f"SELECT l.id, l.nombre, l.autor, COALESCE(l.ilustrador, ''), e.nombre, COALESCE(l.sinopsis, '') "
+        f'FROM {libro} l JOIN {editorial} e ON e.id = l.editorial_id {condicion}'
+    )
+
+
+def indexar_libros(libro_ids):
+    """(Re)indexa los libros indicados."""
+    libro_ids = list(libro_ids)
+    if not libro_ids or not fts_disponible():
+        return
+    marcadores = ', '.join(['%s'] * len(libro_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid IN ({marcadores})', libro_ids)
+        cursor.execute(_select_documentos(f'WHERE l.id IN ({marcadores})'), libro_ids)
+
+
+def desindexar_libro(libro_id):
+    if not fts_disponible():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid = %s', [libro_id])
+
+
+def reconstruir_indice():
+    """Vacía y vuelve a llenar el índice con todo el catálogo. Devuelve el número de libros."""
+    if not fts_disponible():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS}')
+        cursor.execute(_select_documentos())
+        # Compacta los segmentos del índice para que las búsquedas sean más rápidas
+        cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLA_FTS}')
+        return cursor.fetchone()[0]
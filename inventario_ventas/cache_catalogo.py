@@ -0,0 +1,157 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.messages.storage.session import SessionStorage
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .carrito import Carrito
+
+# Caché de las páginas públicas del catálogo (lista y detalle).
+# El HTML se guarda una vez para todos los visitantes, con una clave que
+# incluye la "versión" del catálogo; cualquier cambio de Libro, Stock o
+# Editorial incrementa la versión y las páginas viejas simplemente dejan de
+# leerse (caducan solas).
+#
+# Lo que es de cada visitante no se guarda: el HTML en caché lleva marcadores
+# que se sustituyen en cada request por el contador del carrito, los mensajes
+# y el token CSRF (ninguno consulta la BD).
+#
+# Con varios procesos, CACHES debe ser compartida (archivo, memcached, redis):
+# con LocMemCache cada proceso tiene su propia versión.
+
+CLAVE_VERSION = 'catalogo:version'
+MARCADOR_CARRITO = mark_safe('<!--carrito-->')
+MARCADOR_MENSAJES = mark_safe('<!--mensajes-->')
+MARCADOR_CSRF = 'csrf-por-request'
+
+
+def segundos_cache():
+    return getattr(settings, 'CATALOGO_CACHE_SEGUNDOS', 300)
+
+
+def version_catalogo():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        # Sin versión (primer uso o desalojada): una nueva que no choque con las anteriores
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+async def aversion_catalogo():
+    version = await cache.aget(CLAVE_VERSION)
+    if version is None:
+        await cache.aadd(CLAVE_VERSION, time.time_ns(), None)
+        version = await cache.aget(CLAVE_VERSION)
+    return version
+
+
+def _incrementar_version():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+
+
+def invalidar_catalogo():
+    """Incrementa la versión al confirmar la transacción actual (o ya, si no hay)."""
+    transaction.on_commit(_incrementar_version)
+
+
+def clave_pagina(request, parametros=()):
+    return _clave_pagina(request, parametros, version_catalogo())
+
+
+async def aclave_pagina(request, parametros=()):
+    return _clave_pagina(request, parametros, await aversion_catalogo())
+
+
+def _clave_pagina(request, parametros, version):
+    # Solo los parámetros que cambian el contenido: ?utm=... no crea otra entrada
+    consulta = '&'.join(f"{nombre}={request.GET.get(nombre, '')}" for nombre in parametros)
+    resumen = hashlib.md5(f"{request.path}?{consulta}".encode(), usedforsecurity=False).hexdigest()
+    return f'catalogo:pagina:{version}:{resumen}'
+
+
+def contexto_compartido():
+    """Marcadores que reemplazan, al renderizar para la caché, lo que es de cada visitante."""
+    return {
+        'fragmento_carrito': MARCADOR_CARRITO,
+        'fragmento_mensajes': MARCADOR_MENSAJES,
+        'csrf_token': MARCADOR_CSRF,
+    }
+
+
+def personalizar(request, html):
+    """Sustituye los marcadores por el contador del carrito, los mensajes y el token CSRF."""
+    html = html.replace(MARCADOR_CARRITO, render_to_string('catalogo/_contador_carrito.html', {'carrito': Carrito(request)}), 1)
+    if MARCADOR_MENSAJES in html:
+        html = html.replace(MARCADOR_MENSAJES, render_to_string('catalogo/_mensajes.html', request=request), 1)
+    if MARCADOR_CSRF in html:
+        html = html.replace(MARCADOR_CSRF, get_token(request))
+    return html
+
+
+async def precargar_visitante(request, con_libros=False):
+    """
+    Para vistas async: carga con la API async lo que personalizar() y las
+    plantillas leen del visitante (carrito y sesión, de donde salen los
+    mensajes), para que después no haya consultas síncronas en el bucle de eventos.
+    """
+    carrito = Carrito(request)
+    await carrito.acargar(con_libros)
+    await request.session.aget(SessionStorage.session_key)
+    return carrito
+
+
+async def apersonalizar(request, html):
+    await precargar_visitante(request)
+    return personalizar(request, html)
+
+
+class PaginaEnCacheMixin:
+    """
+    Para vistas GET del catálogo: sirve el HTML compartido desde la caché y
+    solo ejecuta la vista (consultas + plantilla) cuando no está.
+    `parametros_cache`: parámetros GET que forman parte de la clave.
+    """
+    parametros_cache = ()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(contexto_compartido())
+        return context
+
+    def get(self, request, *args, **kwargs):
+        clave = clave_pagina(request, self.parametros_cache)
+        html = cache.get(clave)
+        if html is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            html = response.render().content.decode(response.charset)
+            cache.set(clave, html, segundos_cache())
+        return HttpResponse(personalizar(request, html))
+
+
+class PaginaEnCacheAsyncMixin:
+    """
+    Lo mismo que PaginaEnCacheMixin para vistas async (ver views.py): la caché
+    y las consultas van por la API async y solo se renderiza la plantilla.
+    La vista define `async acontexto()` con el contexto ya consultado.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        clave = await aclave_pagina(request, self.parametros_cache)
+        html = await cache.aget(clave)
+        if html is None:
+            context = await self.acontexto()
+            html = render_to_string(self.get_template_names(), context, request)
+            await cache.aset(clave, html, segundos_cache())
+        return HttpResponse(await apersonalizar(request, html))
@@ -1,67 +1,88 @@
-from decimal import Decimal
-from django.conf import settings
 from .models import Libro
-
-# Nombre de la clave de sesión que contendrá el carrito
-CARRITO_SESSION_ID = 'carrito'
+from .dinero import Dinero
+from .almacen_carrito import almacen_para
 
 class Carrito:
     """
     Clase Carrito para gestionar la lógica de añadir,
     eliminar y calcular los totales.
+    Las líneas se guardan en el almacén configurado en
+    settings.CARRITO_ALMACEN (cookie firmada, caché, tabla o sesión).
     """
     def __init__(self, request):
-        """Inicializa el carrito"""
-        self.session = request.session
-        carrito = self.session.get(CARRITO_SESSION_ID)
-        
-        # Si no existe carrito en la sesión, crea uno vacío
-        if not carrito:
-            carrito = self.session[CARRITO_SESSION_ID] = {}
-            
-        self.carrito = carrito
+        """Inicializa el carrito (el almacén se comparte durante todo el request)"""
+        self.almacen = almacen_para(request)
+        # Líneas ya armadas con sus libros (ver acargar)
+        self._lineas_cargadas = None
+
+    async def acargar(self, con_libros=False):
+        """
+        Para vistas async: carga el carrito (y con `con_libros`, sus libros)
+        con la API async. Después el carrito se usa igual, sin consultas
+        (solo para leerlo: las líneas cargadas no siguen los cambios).
+        """
+        await self.almacen.adatos()
+        if con_libros:
+            ids = [int(libro_id) for libro_id in self.carrito]
+            libros = {libro.id: libro async for libro in Libro.objects.filter(id__in=ids).aiterator()}
+            self._lineas_cargadas = list(self._lineas_con_libros(libros))
 
-    def add(self, libro, cantidad=1):
+    @property
+    def carrito(self):
+        # {libro_id (str): {'cantidad': int, 'precio': centavos (int)}}; se carga al primer uso
+        return self.almacen.datos
+
+    def add(self, libro, cantidad=1, override_quantity=False):
         """Añade un libro al carrito o actualiza su cantidad."""
         libro_id = str(libro.id)
-        
+
         # Si el libro no está en el carrito, lo añade con su precio actual
+        item = self.carrito.get(libro_id)
+        precio = item['precio'] if item else Dinero.desde_decimal(libro.precio_venta).centavos
+        actual = item['cantidad'] if item else 0
+
+        # Reemplaza o aumenta la cantidad
+        self.almacen.fijar(libro_id, cantidad if override_quantity else actual + cantidad, precio)
+
+    def set_qty(self, libro_id, cantidad):
+        """Fija la cantidad de un libro ya presente (0 lo elimina). No consulta la BD."""
+        libro_id = str(libro_id)
         if libro_id not in self.carrito:
-            self.carrito[libro_id] = {
-                'cantidad': 0,
-                'precio': str(libro.precio_venta) # Almacenar como string para serialización
-            }
-        
-        # Aumenta la cantidad
-        self.carrito[libro_id]['cantidad'] += cantidad
-        self.save()
+            return
+        if cantidad > 0:
+            self.almacen.fijar(libro_id, cantidad, self.carrito[libro_id]['precio'])
+        else:
+            self.almacen.quitar(libro_id)
 
     def remove(self, libro):
         """Elimina un libro completamente del carrito."""
-        libro_id = str(libro.id)
-        if libro_id in self.carrito:
-            del self.carrito[libro_id]
-            self.save()
+        self.almacen.quitar(str(libro.id))
 
     def __iter__(self):
         """
         Itera sobre los ítems del carrito y obtiene los libros
         desde la base de datos para mostrarlos en la vista.
         """
-        libro_ids = self.carrito.keys()
+        if self._lineas_cargadas is not None:
+            return iter(self._lineas_cargadas)
         # Obtiene los objetos Libro
-        libros = Libro.objects.filter(id__in=libro_ids)
-        
-        for libro in libros:
-            libro_id = str(libro.id)
-            # Copia los datos del ítem de la sesión al objeto
-            self.carrito[libro_id]['libro'] = libro
-            self.carrito[libro_id]['precio'] = Decimal(self.carrito[libro_id]['precio'])
-            
-        for item in self.carrito.values():
-            # Calcula el total de la línea
-            item['total_linea'] = item['precio'] * item['cantidad']
-            yield item
+        libros = Libro.objects.in_bulk(int(libro_id) for libro_id in self.carrito)
+        return self._lineas_con_libros(libros)
+
+    def _lineas_con_libros(self, libros):
+        for libro_id, item in self.carrito.items():
+            libro = libros.get(int(libro_id))
+            if libro is None:
+                continue  # Libro eliminado del catálogo
+            # Copia los datos guardados (sin modificar lo que persiste el almacén)
+            precio = Dinero(item['precio'])
+            yield {
+                'libro': libro,
+                'cantidad': item['cantidad'],
+                'precio': precio,
+                # Calcula el total de la línea
+                'total_linea': precio * item['cantidad'],
+            }
 
     def __len__(self):
         """Cuenta el total de ítems (unidades de libros) en el carrito."""
@@ -69,21 +90,22 @@ class Carrito:
 
     def get_total_price(self):
         """Calcula el coste total de todos los artículos en el carrito."""
-        return sum(Decimal(item['precio']) * item['cantidad'] for item in self.carrito.values())
+        return Dinero(sum(item['precio'] * item['cantidad'] for item in self.carrito.values()))
 
     def clear(self):
-        """Elimina el carrito de la sesión."""
-        del self.session[CARRITO_SESSION_ID]
-        self.save()
+        """Vacía el carrito."""
+        self.almacen.vaciar()
 
-    def save(self):
-        """Marca la sesión como modificada para asegurar que se guarde."""
-        self.session.modified = True
+    def lineas(self):
+        """Devuelve {libro_id (int): (cantidad, precio Dinero)} sin consultar la BD."""
+        return {
+            int(libro_id): (item['cantidad'], Dinero(item['precio']))
+            for libro_id, item in self.carrito.items()
+        }
 
     def get_qty(self, libro_id):
         """Devuelve la cantidad actual de un libro en el carrito."""
         libro_id = str(libro_id) # Las claves del carrito son strings
         if libro_id in self.carrito:
-            # Asumiendo que el diccionario interno guarda la cantidad bajo la clave 'cantidad'
             return self.carrito[libro_id]['cantidad']
-        return 0
\ No newline at end of file
+        return 0
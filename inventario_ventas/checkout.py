@@ -0,0 +1,96 @@
+import urllib.parse
+from collections import namedtuple
+
+from django.db import transaction
+
+from .models import Libro, Venta, DetalleVenta, ComprobanteOrden
+from .dinero import Dinero
+from .basedatos import escritura_serializada
+
+# Pipeline de checkout en lote:
+#   1. validar_carrito: una sola consulta trae los libros del carrito con su
+#      stock disponible (JOIN con el resumen de stock) y ajusta las líneas.
+#   2. crear_venta: transacción corta con un INSERT de la Venta y un único
+#      bulk_create para todas las líneas de DetalleVenta (escritura serializada,
+#      ver basedatos.py). En la misma transacción se guarda el comprobante
+#      (ComprobanteOrden): la confirmación y el mensaje de WhatsApp se arman
+#      con él, sin volver a leer las líneas ni los libros.
+
+NUMERO_WHATSAPP = "+525620576697"
+
+LineaCheckout = namedtuple('LineaCheckout', ['libro', 'cantidad', 'precio'])
+AjusteLinea = namedtuple('AjusteLinea', ['libro_id', 'nombre', 'solicitada', 'disponible'])
+
+
+def validar_carrito(carrito):
+    """
+    Revisa el carrito contra el stock actual.
+    Devuelve (lineas, ajustes): las líneas que se pueden vender y la lista de
+    líneas que hubo que reducir (disponible > 0) o quitar (disponible = 0).
+    """
+    contenido = carrito.lineas()
+    libros = (
+        Libro.objects.filter(id__in=contenido.keys())
+        .select_related('resumen_stock')
+        .only('id', 'nombre', 'resumen_stock__total')
+    )
+    libros = {libro.id: libro for libro in libros}
+
+    lineas = []
+    ajustes = []
+    for libro_id, (cantidad, precio) in contenido.items():
+        libro = libros.get(libro_id)
+        disponible = libro.stock_total if libro else 0
+        if cantidad > disponible:
+            nombre = libro.nombre if libro else f"Libro #{libro_id}"
+            ajustes.append(AjusteLinea(libro_id, nombre, cantidad, disponible))
+            cantidad = disponible
+        if cantidad > 0:
+            lineas.append(LineaCheckout(libro, cantidad, precio))
+    return lineas, ajustes
+
+
+@escritura_serializada
+def crear_venta(lineas, contacto=None, **campos_venta):
+    """
+    Registra una Venta PENDIENTE con sus líneas y su comprobante.
+    El total se calcula de las mismas líneas que se insertan.
+    `contacto`: datos del cliente para el comprobante (nombre, teléfono, ...).
+    """
+    detalles = [
+        DetalleVenta(libro=linea.libro, cantidad=linea.cantidad, precio=linea.precio.a_decimal())
+        for linea in lineas
+    ]
+    # Suma exacta en centavos (linea.precio es Dinero)
+    precio_total = sum((linea.precio * linea.cantidad for linea in lineas), Dinero(0)).a_decimal()
+
+    with transaction.atomic():
+        venta = Venta.objects.create(precio_total=precio_total, estado='PENDIENTE', **campos_venta)
+        for detalle in detalles:
+            detalle.venta = venta
+        DetalleVenta.objects.bulk_create(detalles)
+        ComprobanteOrden.armar(venta, lineas, contacto).save()
+    return venta
+
+
+def mensaje_whatsapp(comprobante):
+    """Texto del pedido para WhatsApp, armado solo con el comprobante."""
+    contacto = comprobante.contacto
+    partes = [
+        f"¡Hola! He generado una Orden *PENDIENTE* *#{comprobante.venta_id}*.",
+        "Mis datos de contacto son:",
+        f"Nombre: {contacto.get('nombre', 'N/A')}",
+        f"Teléfono: {contacto.get('telefono', 'N/A')}",
+        f"Email: {contacto.get('email') or 'N/A'}",
+        f"Dirección de Envío: {contacto.get('direccion', 'N/A')}",
+        "\n--- Detalle del Pedido ---",
+    ]
+    for linea in comprobante.lineas:
+        partes.append(f"• {linea.titulo} (x{linea.cantidad}) | P/U: ${linea.precio}")
+    partes.append(f"\n*SUBTOTAL (+ envío): ${comprobante.total:.2f}*")
+    partes.append("\nPor favor, confirme mi pedido y los pasos para el pago y envío.")
+    return "\n".join(partes)
+
+
+def enlace_whatsapp(comprobante):
+    return f"https://wa.me/{NUMERO_WHATSAPP}?text={urllib.parse.quote(mensaje_whatsapp(comprobante))}"
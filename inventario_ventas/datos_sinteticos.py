@@ -0,0 +1,170 @@
+import random
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Tienda, Staff, Cliente, Editorial, Libro, Bodega, Stock,
+    Venta, DetalleVenta, MovimientoInventario,
+)
+from .stock import reconstruir_resumenes
+from .reportes import reconstruir_resumen_ventas
+from .busqueda import reconstruir_indice
+from .cache_catalogo import invalidar_catalogo
+
+# Datos sintéticos para medir la aplicación con catálogos grandes.
+# Todo se inserta con bulk_create (sin señales) y al final se reconstruyen
+# los resúmenes de stock y ventas y el índice de búsqueda. El libro mayor
+# queda consistente: cada fila de Stock tiene su ENTRADA y cada venta
+# confirmada sus movimientos VENTA, así que ENTRADA + VENTAS = stock actual.
+
+PALABRAS = (
+    'dragón', 'gato', 'pirata', 'mar', 'sombra', 'luna', 'bosque', 'ciudad', 'viaje', 'secreto',
+    'noche', 'jardín', 'reino', 'espejo', 'tormenta', 'isla', 'río', 'fuego', 'invierno', 'estrella',
+    'niño', 'bruja', 'lobo', 'tesoro', 'montaña', 'cielo', 'sueño', 'camino', 'historia', 'rey',
+)
+NOMBRES = ('Ana', 'Luis', 'Marta', 'José', 'Lucía', 'Pedro', 'Sofía', 'Diego', 'Elena', 'Pablo', 'Carmen', 'Jorge')
+APELLIDOS = ('García', 'López', 'Martínez', 'Sánchez', 'Pérez', 'Gómez', 'Ruiz', 'Díaz', 'Moreno', 'Álvarez')
+ESTADOS = (('CONFIRMADA', 0.7), ('PENDIENTE', 0.2), ('CANCELADA', 0.1))
+TAMANO_LOTE = 1000
+
+
+def _titulo(aleatorio):
+    palabras = aleatorio.sample(PALABRAS, aleatorio.randint(2, 4))
+    return ' '.join(palabras).capitalize()[:40]
+
+
+def _persona(aleatorio):
+    return aleatorio.choice(NOMBRES), aleatorio.choice(APELLIDOS)
+
+
+def generar(editoriales=20, libros=1000, bodegas=5, stock_por_libro=2, clientes=500, ventas=2000,
+            lineas_por_venta=3, dias=90, tiendas=2, staff=6, semilla=42):
+    """
+    Inserta un conjunto de datos sintético y devuelve {modelo: filas creadas}.
+    Se suma a lo que ya haya en la base de datos.
+    """
+    aleatorio = random.Random(semilla)
+    ahora = timezone.now().replace(minute=0, second=0, microsecond=0)
+
+    with transaction.atomic():
+        lista_tiendas = Tienda.objects.bulk_create(
+            [Tienda(nombre=f"Sucursal {i + 1}", lugar=aleatorio.choice(PALABRAS).capitalize()) for i in range(tiendas)]
+        )
+        lista_staff = Staff.objects.bulk_create([
+            Staff(nombre=nombre, apellido=apellido, tienda=aleatorio.choice(lista_tiendas) if lista_tiendas else None)
+            for nombre, apellido in (_persona(aleatorio) for _ in range(staff))
+        ])
+        lista_editoriales = Editorial.objects.bulk_create([
+            Editorial(nombre=f"Ediciones {aleatorio.choice(PALABRAS).capitalize()} {i + 1}", telefono=f"55{i:08d}")
+            for i in range(editoriales)
+        ], batch_size=TAMANO_LOTE)
+        lista_libros = Libro.objects.bulk_create([
+            Libro(
+                editorial=aleatorio.choice(lista_editoriales),
+                nombre=_titulo(aleatorio),
+                autor=' '.join(_persona(aleatorio)),
+                costo=Decimal(aleatorio.randint(50, 300)),
+                precio_venta=Decimal(aleatorio.randint(100, 600)) + Decimal('0.50') * aleatorio.randint(0, 1),
+                sinopsis=' '.join(aleatorio.choices(PALABRAS, k=20)),
+            )
+            for _ in range(libros)
+        ], batch_size=TAMANO_LOTE)
+        lista_bodegas = Bodega.objects.bulk_create([Bodega(nota=f"Bodega sintética {i + 1}") for i in range(bodegas)])
+        lista_clientes = Cliente.objects.bulk_create([
+            Cliente(nombre=nombre, apellido=apellido, telefono=f"55{i:08d}")
+            for i, (nombre, apellido) in enumerate(_persona(aleatorio) for _ in range(clientes))
+        ], batch_size=TAMANO_LOTE)
+
+        # Bodegas de cada libro y stock final (algunos en 0 o bajos para la lista de bajo inventario)
+        bodegas_de = {
+            libro.id: aleatorio.sample(lista_bodegas, min(stock_por_libro, len(lista_bodegas)))
+            for libro in lista_libros
+        }
+        stock_final = {
+            (libro_id, bodega.id): aleatorio.choice((0, aleatorio.randint(1, 10), aleatorio.randint(10, 80)))
+            for libro_id, lista in bodegas_de.items() for bodega in lista
+        }
+
+        # Ventas ordenadas por fecha para poder fijar fecha_hora por hora en pocos UPDATE
+        fechas = sorted(
+            ahora - timedelta(days=aleatorio.randrange(dias), hours=aleatorio.randrange(9, 21))
+            for _ in range(ventas)
+        )
+        estados, pesos = zip(*ESTADOS)
+        nuevas_ventas, lineas_de_venta = [], []
+        vendido = defaultdict(int)
+        for fecha in fechas:
+            estado = aleatorio.choices(estados, pesos)[0]
+            lineas = []
+            for libro in aleatorio.sample(lista_libros, min(aleatorio.randint(1, lineas_por_venta), len(lista_libros))):
+                cantidad = aleatorio.randint(1, 3)
+                bodega = aleatorio.choice(bodegas_de[libro.id]) if bodegas_de[libro.id] else None
+                lineas.append((libro, cantidad, bodega))
+            total = sum(libro.precio_venta * cantidad for libro, cantidad, _ in lineas)
+            staff = aleatorio.choice(lista_staff) if lista_staff and aleatorio.random() < 0.8 else None
+            nuevas_ventas.append(Venta(
+                cliente=aleatorio.choice(lista_clientes) if lista_clientes else None,
+                staff=staff, id_tienda=(staff.tienda_id or 0) if staff else 0,  # bulk_create no pasa por save()
+                precio_total=total, estado=estado,
+            ))
+            lineas_de_venta.append((fecha, estado, lineas))
+
+        nuevas_ventas = Venta.objects.bulk_create(nuevas_ventas, batch_size=TAMANO_LOTE)
+
+        # fecha_hora es auto_now_add: bulk_create pone "ahora"; se corrige con un UPDATE por hora
+        por_hora = defaultdict(list)
+        for venta, (fecha, _, _) in zip(nuevas_ventas, lineas_de_venta):
+            por_hora[fecha].append(venta.id)
+        for fecha, ids in por_hora.items():
+            for inicio in range(0, len(ids), TAMANO_LOTE):
+                Venta.objects.filter(id__in=ids[inicio:inicio + TAMANO_LOTE]).update(
+                    fecha_hora=fecha + timedelta(minutes=aleatorio.randrange(60))
+                )
+
+        detalles, movimientos_venta = [], []
+        for venta, (_, estado, lineas) in zip(nuevas_ventas, lineas_de_venta):
+            for libro, cantidad, bodega in lineas:
+                detalles.append(DetalleVenta(venta=venta, libro=libro, cantidad=cantidad, precio=libro.precio_venta))
+                if estado == 'CONFIRMADA' and bodega is not None:
+                    vendido[(libro.id, bodega.id)] += cantidad
+                    movimientos_venta.append(MovimientoInventario(
+                        libro_id=libro.id, bodega_id=bodega.id, venta=venta, tipo='VENTA', cantidad=-cantidad,
+                    ))
+        DetalleVenta.objects.bulk_create(detalles, batch_size=TAMANO_LOTE)
+
+        Stock.objects.bulk_create(
+            [Stock(libro_id=libro_id, bodega_id=bodega_id, cantidad=cantidad) for (libro_id, bodega_id), cantidad in stock_final.items()],
+            batch_size=TAMANO_LOTE,
+        )
+        # Entradas primero (ids menores) y luego las ventas: el libro mayor cuadra con Stock
+        MovimientoInventario.objects.bulk_create(
+            [
+                MovimientoInventario(libro_id=libro_id, bodega_id=bodega_id, tipo='ENTRADA',
+                                     cantidad=cantidad + vendido[(libro_id, bodega_id)])
+                for (libro_id, bodega_id), cantidad in stock_final.items()
+                if cantidad + vendido[(libro_id, bodega_id)]
+            ],
+            batch_size=TAMANO_LOTE,
+        )
+        MovimientoInventario.objects.bulk_create(movimientos_venta, batch_size=TAMANO_LOTE)
+
+        reconstruir_resumenes()
+        reconstruir_resumen_ventas()
+        invalidar_catalogo()
+    reconstruir_indice()
+
+    return {
+        'tiendas': len(lista_tiendas),
+        'staff': len(lista_staff),
+        'editoriales': len(lista_editoriales),
+        'libros': len(lista_libros),
+        'bodegas': len(lista_bodegas),
+        'stock': len(stock_final),
+        'clientes': len(lista_clientes),
+        'ventas': len(nuevas_ventas),
+        'detalles': len(detalles),
+    }
@@ -0,0 +1,89 @@
+from decimal import Decimal, ROUND_HALF_UP
+from functools import total_ordering
+
+# Dinero como entero de centavos. Se usa en el carrito (se serializa como un
+# int: "1250" en vez de "12.50"), en los totales del checkout y en los
+# cálculos del admin. Las columnas de la BD siguen siendo DecimalField con 2
+# decimales; la conversión es exacta en ambos sentidos:
+#   Dinero.desde_decimal(Decimal('12.50')).a_decimal() == Decimal('12.50')
+# A propósito NO hereda de int: asignar un Dinero a un DecimalField sin pasar
+# por a_decimal() falla en vez de guardar 1250 pesos.
+
+CENTAVO = Decimal('0.01')
+
+
+@total_ordering
+class Dinero:
+    __slots__ = ('centavos',)
+
+    def __init__(self, centavos=0):
+        self.centavos = int(centavos)
+
+    @classmethod
+    def desde_decimal(cls, valor):
+        """Desde un Decimal/str/int en pesos ('12.50' -> 1250 centavos)."""
+        if valor is None:
+            return cls(0)
+        if isinstance(valor, Dinero):
+            return valor
+        valor = Decimal(valor)
+        centavos = (valor / CENTAVO).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+        return cls(centavos)
+
+    def a_decimal(self):
+        return Decimal(self.centavos).scaleb(-2)
+
+    # --- Aritmética (solo entre Dinero, o por una cantidad entera) ---
+
+    def __add__(self, otro):
+        if isinstance(otro, Dinero):
+            return Dinero(self.centavos + otro.centavos)
+        if otro == 0:
+            return self  # Para sum(), que empieza en 0
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, otro):
+        if isinstance(otro, Dinero):
+            return Dinero(self.centavos - otro.centavos)
+        return NotImplemented
+
+    def __mul__(self, cantidad):
+        if isinstance(cantidad, int) and not isinstance(cantidad, bool):
+            return Dinero(self.centavos * cantidad)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Dinero(-self.centavos)
+
+    def __eq__(self, otro):
+        if isinstance(otro, Dinero):
+            return self.centavos == otro.centavos
+        if otro == 0:
+            return self.centavos == 0
+        return NotImplemented
+
+    def __lt__(self, otro):
+        if isinstance(otro, Dinero):
+            return self.centavos < otro.centavos
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.centavos)
+
+    def __bool__(self):
+        return bool(self.centavos)
+
+    # --- Presentación ---
+
+    def __str__(self):
+        return str(self.a_decimal())
+
+    def __format__(self, especificacion):
+        return format(self.a_decimal(), especificacion)
+
+    def __repr__(self):
+        return f"Dinero({self})"
@@ -0,0 +1,275 @@
+import http.cookiejar
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.db import OperationalError, connections
+from django.db.models import Sum
+from django.test import Client
+from django.urls import reverse
+
+from .asignacion import StockInsuficiente
+from .models import Libro, Stock, Venta, MovimientoInventario
+
+# Prueba de estrés del flujo de compra: muchos compradores a la vez se pelean
+# las últimas unidades de unos pocos libros "calientes".
+# Cada comprador hace  carrito_add -> orden_checkout -> confirmar  y anota
+# cuánto tardó cada paso y cómo terminó. Al final se cuentan las unidades
+# sobrevendidas (filas de Stock en negativo) y las confirmadas de más
+# respecto al stock inicial.
+#
+# Los compradores pueden ir contra la app en el mismo proceso (django.test.Client,
+# en hilos o en procesos) o contra un servidor de verdad (--url). La
+# confirmación la hace el staff en el admin; aquí se hace por el ORM (Venta.save),
+# que es el mismo camino.
+#
+# Las funciones de este módulo son de nivel superior para que los procesos
+# hijos (multiprocessing con spawn) puedan importarlas.
+
+DATOS_CHECKOUT = {'nombre': 'Ana', 'apellido': 'Pérez', 'telefono': '5550000000', 'direccion': 'Calle 1'}
+PASOS = ('carrito_add', 'checkout', 'confirmar')
+RE_ORDEN = re.compile(r'class="order-id">#(\d+)<')
+
+# Resultados posibles de un comprador
+CONFIRMADA = 'confirmada'
+RECHAZADA_CARRITO = 'rechazada_carrito'      # carrito_add no dejó añadir (sin stock)
+AJUSTADA_CHECKOUT = 'ajustada_checkout'      # el checkout ajustó el carrito y no creó la venta
+RECHAZADA_CONFIRMAR = 'rechazada_confirmar'  # StockInsuficiente al confirmar
+BLOQUEO = 'bloqueo'                          # "database is locked" en algún paso
+ERROR = 'error'                              # 5xx u otra excepción
+
+
+def es_bloqueo(error):
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+class ClienteLocal:
+    """Comprador contra la app en este proceso. Devuelve (status, Location, html)."""
+
+    def __init__(self):
+        self.cliente = Client()
+
+    def post(self, ruta, datos):
+        respuesta = self.cliente.post(ruta, datos)
+        return respuesta.status_code, respuesta.get('Location', ''), respuesta.content.decode()
+
+    def get(self, ruta):
+        respuesta = self.cliente.get(ruta)
+        return respuesta.status_code, respuesta.get('Location', ''), respuesta.content.decode()
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClienteHTTP:
+    """Comprador contra un servidor (runserver, gunicorn...). Guarda cookies y manda el token CSRF."""
+
+    def __init__(self, url_base, timeout=30):
+        self.url_base = url_base.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SinRedirecciones,
+        )
+
+    def _token(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), None)
+
+    def _abrir(self, ruta, datos=None, cabeceras=None):
+        cuerpo = urllib.parse.urlencode(datos).encode() if datos is not None else None
+        peticion = urllib.request.Request(self.url_base + ruta, data=cuerpo, headers=cabeceras or {})
+        try:
+            with self.abridor.open(peticion, timeout=self.timeout) as respuesta:
+                return respuesta.status, respuesta.headers.get('Location', ''), respuesta.read().decode()
+        except urllib.error.HTTPError as error:  # 3xx (sin seguir) y 4xx/5xx
+            return error.code, error.headers.get('Location', ''), error.read().decode(errors='replace')
+
+    def get(self, ruta):
+        return self._abrir(ruta)
+
+    def post(self, ruta, datos):
+        if self._token() is None:
+            # La primera visita deja la cookie csrftoken
+            self.get(reverse('catalogo_libros'))
+        cabeceras = {'Referer': self.url_base + ruta, 'X-CSRFToken': self._token() or ''}
+        return self._abrir(ruta, {**datos, 'csrfmiddlewaretoken': self._token() or ''}, cabeceras)
+
+
+def confirmar_venta(venta_id):
+    venta = Venta.objects.get(pk=venta_id)
+    venta.estado = 'CONFIRMADA'
+    venta.save()
+
+
+def comprar(cliente, libro_id, unidades, confirmar=True):
+    """
+    Un comprador: añade `unidades` del libro, hace checkout y confirma la venta.
+    Devuelve {'resultado', 'ms': {paso: ms}, 'venta_id', 'unidades'}.
+    """
+    ms = {}
+
+    def paso(nombre, funcion, *args):
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args)
+        finally:
+            ms[nombre] = (time.perf_counter() - inicio) * 1000
+
+    salida = {'resultado': ERROR, 'ms': ms, 'venta_id': None, 'unidades': unidades, 'paso': None}
+    try:
+        salida['paso'] = 'carrito_add'
+        status, destino, _ = paso('carrito_add', cliente.post, reverse('carrito_add', args=[libro_id]), {'cantidad': unidades})
+        if status >= 500:
+            return salida
+        if not destino.endswith(reverse('carrito_detail')):
+            salida['resultado'] = RECHAZADA_CARRITO
+            return salida
+
+        salida['paso'] = 'checkout'
+        status, destino, _ = paso('checkout', cliente.post, reverse('orden_checkout'), DATOS_CHECKOUT)
+        if status >= 500:
+            return salida
+        if not destino.endswith(reverse('orden_confirmada')):
+            salida['resultado'] = AJUSTADA_CHECKOUT
+            return salida
+        # La página de confirmación (fuera de la medición) dice el número de orden
+        encontrado = RE_ORDEN.search(cliente.get(reverse('orden_confirmada'))[2])
+        if not encontrado:
+            return salida
+        salida['venta_id'] = int(encontrado.group(1))
+
+        if confirmar:
+            salida['paso'] = 'confirmar'
+            try:
+                paso('confirmar', confirmar_venta, salida['venta_id'])
+            except StockInsuficiente:
+                salida['resultado'] = RECHAZADA_CONFIRMAR
+                return salida
+        salida['resultado'] = CONFIRMADA
+    except Exception as error:
+        salida['resultado'] = BLOQUEO if es_bloqueo(error) else ERROR
+        salida['error'] = f"{type(error).__name__}: {error}"
+    return salida
+
+
+def ejecutar_compradores(num_compradores, libros, unidades, concurrencia, url=None, confirmar=True, inicio=None):
+    """
+    Lanza `num_compradores` en `concurrencia` hilos. Los compradores se reparten
+    los `libros` en turno. Con `inicio` (time.time()) todos arrancan a la vez,
+    también entre procesos.
+    """
+    pendientes = list(range(num_compradores))
+    resultados = []
+    candado = threading.Lock()
+    barrera = threading.Barrier(concurrencia)
+
+    def trabajador():
+        barrera.wait()
+        if inicio is not None:
+            time.sleep(max(0, inicio - time.time()))
+        try:
+            while True:
+                with candado:
+                    if not pendientes:
+                        return
+                    numero = pendientes.pop()
+                cliente = ClienteHTTP(url) if url else ClienteLocal()
+                resultado = comprar(cliente, libros[numero % len(libros)], unidades, confirmar)
+                with candado:
+                    resultados.append(resultado)
+        finally:
+            connections.close_all()
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados
+
+
+def proceso_compradores(archivo_bd, num_compradores, libros, unidades, concurrencia, confirmar, inicio):
+    """
+    Punto de entrada de cada proceso hijo (el pool debe iniciarse con
+    initializer=django.setup: este módulo importa modelos). Apunta a la BD de prueba y compra.
+    """
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    connections['default'].settings_dict['NAME'] = archivo_bd
+    return ejecutar_compradores(num_compradores, libros, unidades, concurrencia, confirmar=confirmar, inicio=inicio)
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def resumir(resultados, segundos):
+    """Rendimiento, latencias por paso y cómo terminaron los compradores."""
+    por_resultado = {}
+    for resultado in resultados:
+        por_resultado[resultado['resultado']] = por_resultado.get(resultado['resultado'], 0) + 1
+    bloqueos_por_paso = {}
+    for resultado in resultados:
+        if resultado['resultado'] == BLOQUEO:
+            bloqueos_por_paso[resultado['paso']] = bloqueos_por_paso.get(resultado['paso'], 0) + 1
+
+    latencias = {}
+    for nombre in PASOS:
+        tiempos = [resultado['ms'][nombre] for resultado in resultados if nombre in resultado['ms']]
+        if tiempos:
+            latencias[nombre] = {
+                'n': len(tiempos),
+                'ms_p50': round(percentil(tiempos, 50), 2),
+                'ms_p99': round(percentil(tiempos, 99), 2),
+                'ms_max': round(max(tiempos), 2),
+            }
+    completos = [sum(resultado['ms'].values()) for resultado in resultados]
+    return {
+        'compradores': len(resultados),
+        'segundos': round(segundos, 3),
+        'flujos_por_segundo': round(len(resultados) / segundos, 2) if segundos else None,
+        'ms_flujo_p50': round(percentil(completos, 50), 2) if completos else None,
+        'ms_flujo_p99': round(percentil(completos, 99), 2) if completos else None,
+        'resultados': por_resultado,
+        'bloqueos_por_paso': bloqueos_por_paso,
+        'errores': sorted({resultado['error'] for resultado in resultados if 'error' in resultado})[:10],
+        'latencias': latencias,
+    }
+
+
+def sobreventa(libros, stock_inicial):
+    """
+    Compara lo vendido con lo que había. `stock_inicial`: {libro_id: unidades}.
+    Sobrevendidas = unidades en negativo en Stock; también se cruza con el libro
+    mayor (VENTA - CANCELACION) por si Stock y el libro mayor no cuadran.
+    """
+    negativas = -(Stock.objects.filter(libro_id__in=libros, cantidad__lt=0).aggregate(total=Sum('cantidad'))['total'] or 0)
+    vendidas = dict(
+        MovimientoInventario.objects
+        .filter(libro_id__in=libros, tipo__in=('VENTA', 'CANCELACION'))
+        .values_list('libro_id')
+        .annotate(total=Sum('cantidad'))
+    )
+    por_libro = {}
+    for libro in Libro.objects.filter(id__in=libros).select_related('resumen_stock').order_by('id'):
+        vendidas_libro = -(vendidas.get(libro.id) or 0)
+        por_libro[libro.id] = {
+            'stock_inicial': stock_inicial[libro.id],
+            'vendidas': vendidas_libro,
+            'stock_final': libro.resumen_stock.total if hasattr(libro, 'resumen_stock') else None,
+            'de_mas': max(0, vendidas_libro - stock_inicial[libro.id]),
+        }
+    return {
+        'unidades_en_negativo': negativas,
+        'unidades_de_mas': sum(fila['de_mas'] for fila in por_libro.values()),
+        'por_libro': por_libro,
+    }
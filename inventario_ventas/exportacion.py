@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .dinero import Dinero
+from .models import DetalleVenta
+
+# Exportación de ventas por rango de fechas, en CSV o JSON Lines.
+#
+# Una fila por línea de venta (DetalleVenta) con los datos de su Venta y los
+# nombres del libro, el cliente y el vendedor, todo en un solo SELECT con JOIN.
+# Las filas salen de un iterator() por tandas (fetchmany), se escriben en un
+# búfer de texto y se entregan en pedazos de unos TAMANO_PEDAZO bytes: la
+# memoria no depende de cuántas filas haya y el encabezado sale antes de que
+# la consulta devuelva la primera fila.
+#
+# Orden: fecha de la venta y luego id, recorriendo venta_fecha_estado_idx;
+# los detalles de cada venta se buscan por su índice de venta_id.
+# Las ventas sin líneas no aparecen.
+
+FORMATOS = ('csv', 'jsonl')
+TAMANO_TANDA = 2000        # filas por fetchmany
+TAMANO_PEDAZO = 64 * 1024  # bytes por pedazo entregado
+COLUMNAS = (
+    'venta', 'fecha_hora', 'estado', 'cliente', 'vendedor', 'total_venta',
+    'linea', 'libro_id', 'isbn', 'libro', 'cantidad', 'precio', 'total_linea',
+)
+_CAMPOS = (
+    'venta_id', 'venta__fecha_hora', 'venta__estado',
+    'venta__cliente__nombre', 'venta__cliente__apellido',
+    'venta__staff__nombre', 'venta__staff__apellido', 'venta__precio_total',
+    'id', 'libro_id', 'libro__isbn', 'libro__nombre', 'cantidad', 'precio',
+)
+
+
+def rango_fechas(desde, hasta):
+    """Días [desde, hasta] (ambos incluidos, hora local) como datetimes [inicio, fin)."""
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    return inicio, fin
+
+
+def lineas_de_venta(desde, hasta, estado=None):
+    inicio, fin = rango_fechas(desde, hasta)
+    detalles = DetalleVenta.objects.filter(venta__fecha_hora__gte=inicio, venta__fecha_hora__lt=fin)
+    if estado:
+        detalles = detalles.filter(venta__estado=estado)
+    return detalles.order_by('venta__fecha_hora', 'venta_id', 'id').values_list(*_CAMPOS)
+
+
+def _nombre(nombre, apellido):
+    return f"{nombre} {apellido}" if nombre is not None else ''
+
+
+def _filas(consulta):
+    for (venta_id, fecha_hora, estado, cliente_nombre, cliente_apellido, staff_nombre, staff_apellido,
+         total_venta, linea_id, libro_id, isbn, titulo, cantidad, precio) in consulta.iterator(chunk_size=TAMANO_TANDA):
+        yield (
+            venta_id, timezone.localtime(fecha_hora).isoformat(), estado,
+            _nombre(cliente_nombre, cliente_apellido), _nombre(staff_nombre, staff_apellido), total_venta,
+            linea_id, libro_id, isbn or '', titulo, cantidad, precio,
+            (Dinero.desde_decimal(precio) * cantidad).a_decimal(),
+        )
+
+
+def _texto_csv(filas, contador):
+    bufer = io.StringIO()
+    escritor = csv.writer(bufer)
+    escritor.writerow(COLUMNAS)
+    yield bufer.getvalue()  # El encabezado sale antes de ejecutar la consulta
+    bufer.seek(0)
+    bufer.truncate()
+    for fila in filas:
+        escritor.writerow(fila)
+        contador[0] += 1
+        if bufer.tell() >= TAMANO_PEDAZO:
+            yield bufer.getvalue()
+            bufer.seek(0)
+            bufer.truncate()
+    yield bufer.getvalue()
+
+
+def _texto_jsonl(filas, contador):
+    yield ''  # Sin encabezado; el pedazo vacío es para el primer vaciado con gzip
+    pedazo, tamano = [], 0
+    for fila in filas:
+        linea = json.dumps(dict(zip(COLUMNAS, fila)), ensure_ascii=False, default=str) + '\n'
+        pedazo.append(linea)
+        tamano += len(linea)
+        contador[0] += 1
+        if tamano >= TAMANO_PEDAZO:
+            yield ''.join(pedazo)
+            pedazo, tamano = [], 0
+    yield ''.join(pedazo)
+
+
+def exportar(desde, hasta, formato='csv', estado=None, comprimir=False, contador=None):
+    """
+    Generador de bytes con las líneas de venta de [desde, hasta] (fechas).
+    Con comprimir=True el flujo es un archivo .gz. `contador` (una lista [0])
+    acumula las filas escritas.
+    """
+    contador = contador if contador is not None else [0]
+    textos = (_texto_csv if formato == 'csv' else _texto_jsonl)(_filas(lineas_de_venta(desde, hasta, estado)), contador)
+    if not comprimir:
+        for texto in textos:
+            if texto:
+                yield texto.encode()
+        return
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: con encabezado gzip
+    # El primer pedazo se vacía a la fuerza para que el cliente reciba algo de inmediato
+    yield compresor.compress(next(textos).encode()) + compresor.flush(zlib.Z_SYNC_FLUSH)
+    for texto in textos:
+        comprimido = compresor.compress(texto.encode())
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def nombre_archivo(desde, hasta, formato, comprimir=False):
+    return f"ventas_{desde:%Y%m%d}_{hasta:%Y%m%d}.{formato}" + ('.gz' if comprimir else '')
+
+
+async def en_async(iterador):
+    """Recorre un generador síncrono (que consulta la BD) desde una respuesta ASGI, pedazo por pedazo."""
+    siguiente = sync_to_async(next)  # thread_sensitive: siempre el mismo hilo y la misma conexión
+    fin = object()
+    while (pedazo := await siguiente(iterador, fin)) is not fin:
+        yield pedazo
@@ -1,5 +1,7 @@
 from django import forms
 
+from .models import Venta
+
 class CarritoAddLibroForm(forms.Form):
     # Campo para seleccionar la cantidad (de 1 a 20 por defecto)
     cantidad = forms.IntegerField(
@@ -13,4 +15,32 @@ class ClienteCheckoutForm(forms.Form):
     apellido = forms.CharField(max_length=50, label="Tu Apellido")
     telefono = forms.CharField(max_length=20, label="Tu Teléfono (WhatsApp)")
     email = forms.EmailField(required=False, label="Tu Email (Opcional)")
-    direccion = forms.CharField(max_length=255, label="Dirección de envío")
\ No newline at end of file
+    direccion = forms.CharField(max_length=255, label="Dirección de envío")
+
+class ImportarCatalogoForm(forms.Form):
+    # Para la carga masiva desde el admin (ver importacion.py)
+    archivo = forms.FileField(label="Archivo CSV o JSON Lines")
+    formato = forms.ChoiceField(
+        choices=[('', 'Según la extensión'), ('csv', 'CSV'), ('jsonl', 'JSON Lines')],
+        required=False, label="Formato",
+    )
+    entradas = forms.BooleanField(
+        required=False, label="Sumar como entradas",
+        help_text="Sin marcar, la cantidad es el conteo de la bodega y la diferencia queda como ajuste.",
+    )
+
+
+class ExportarVentasForm(forms.Form):
+    # Parámetros GET de la exportación de ventas (ver exportacion.py)
+    desde = forms.DateField(label="Desde")
+    hasta = forms.DateField(label="Hasta")
+    formato = forms.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], required=False, label="Formato")
+    estado = forms.ChoiceField(choices=[('', 'Todos')] + Venta.ESTADO_CHOICES, required=False, label="Estado")
+    gzip = forms.BooleanField(required=False, label="Comprimir (gzip)")
+
+    def clean(self):
+        datos = super().clean()
+        if datos.get('desde') and datos.get('hasta') and datos['hasta'] < datos['desde']:
+            raise forms.ValidationError("La fecha final es anterior a la inicial.")
+        datos['formato'] = datos.get('formato') or 'csv'
+        return datos
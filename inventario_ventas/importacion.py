@@ -0,0 +1,319 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import reset_queries, transaction
+
+from .models import Editorial, Libro, Bodega, Stock, ResumenStockLibro, MovimientoInventario
+from .stock import registrar_movimientos
+from .busqueda import indexar_libros
+from .cache_catalogo import invalidar_catalogo
+from .basedatos import escritura_serializada
+
+# Carga masiva de libros, editoriales y stock desde CSV o JSON Lines.
+#
+# El archivo se lee fila por fila y se procesa en bloques de `tamano_bloque`
+# filas, cada uno en su propia transacción: la memoria no depende del tamaño
+# del archivo (solo del bloque y del mapa nombre -> id de editoriales).
+#
+# Columnas (CSV con encabezado, o claves de cada objeto JSON):
+#   isbn          clave natural del libro (obligatoria)
+#   nombre, autor, editorial, costo, precio_venta   datos del libro
+#   ilustrador, sinopsis, editorial_telefono        opcionales
+#   bodega, cantidad                                stock de una bodega (id)
+# En JSON Lines el stock también puede venir como "stock": {"<bodega>": cantidad}.
+# Una fila sin nombre solo trae stock de un libro que ya existe (o que vino antes).
+#
+# Por bloque:
+#   - editoriales por nombre (las nuevas se crean con un bulk_create);
+#   - libros con un upsert por isbn (INSERT ... ON CONFLICT DO UPDATE);
+#   - stock: la cantidad del archivo es el conteo de la bodega. Se escribe con
+#     un upsert en Stock y la diferencia con lo que había queda en el libro
+#     mayor como AJUSTE (con entradas=True, la cantidad se suma como ENTRADA).
+# Volver a cargar el mismo archivo no cambia nada: es idempotente.
+
+TAMANO_BLOQUE = 5000
+MAX_ERRORES_GUARDADOS = 20
+CAMPOS_LIBRO = ('nombre', 'autor', 'ilustrador', 'costo', 'precio_venta', 'sinopsis')
+LARGO_MAXIMO = {'isbn': 20, 'nombre': 40, 'autor': 40, 'ilustrador': 40, 'editorial': 40, 'editorial_telefono': 40}
+PRECIO_MAXIMO = Decimal('99999999.99')  # costo y precio_venta: max_digits=10, decimal_places=2
+CANTIDAD_MAXIMA = 2**31 - 1               # rango de IntegerField
+FORMATOS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+class ErrorFila(ValueError):
+    pass
+
+
+class ResumenImportacion:
+    def __init__(self):
+        self.filas = 0
+        self.libros = 0
+        self.editoriales_nuevas = 0
+        self.stock = 0
+        self.movimientos = 0
+        self.num_errores = 0
+        self.errores = []  # [(número de fila, mensaje)], solo los primeros
+        self.inicio = time.perf_counter()
+
+    @property
+    def segundos(self):
+        return time.perf_counter() - self.inicio
+
+    @property
+    def filas_por_segundo(self):
+        return self.filas / self.segundos if self.segundos else 0
+
+    def error(self, numero, mensaje):
+        self.num_errores += 1
+        if len(self.errores) < MAX_ERRORES_GUARDADOS:
+            self.errores.append((numero, mensaje))
+
+    def como_dict(self):
+        return {
+            'filas': self.filas,
+            'libros': self.libros,
+            'editoriales_nuevas': self.editoriales_nuevas,
+            'stock': self.stock,
+            'movimientos': self.movimientos,
+            'errores': self.num_errores,
+            'segundos': round(self.segundos, 2),
+            'filas_por_segundo': round(self.filas_por_segundo, 1),
+        }
+
+
+def formato_de(nombre_archivo):
+    """'csv' o 'jsonl' según la extensión (None si no se reconoce)."""
+    nombre = nombre_archivo.lower()
+    return next((formato for extension, formato in FORMATOS.items() if nombre.endswith(extension)), None)
+
+
+def leer_filas(archivo, formato):
+    """(número de fila, fila sin validar) sin cargar el archivo entero. `archivo`: texto."""
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+    else:
+        for numero, linea in enumerate(archivo, 1):
+            if linea.strip():
+                yield numero, linea
+
+
+# --- Validación de cada fila ---
+
+def _texto(fila, campo, obligatorio=False):
+    valor = fila.get(campo)
+    valor = '' if valor is None else str(valor).strip()
+    if obligatorio and not valor:
+        raise ErrorFila(f"falta '{campo}'")
+    if len(valor) > LARGO_MAXIMO.get(campo, len(valor)):
+        raise ErrorFila(f"'{campo}' tiene más de {LARGO_MAXIMO[campo]} caracteres")
+    return valor
+
+
+def _precio(fila, campo):
+    try:
+        valor = Decimal(str(fila.get(campo)).strip())
+    except InvalidOperation:
+        raise ErrorFila(f"'{campo}' no es un número: {fila.get(campo)!r}")
+    if not valor.is_finite() or valor < 0:
+        raise ErrorFila(f"'{campo}' debe ser un número positivo")
+    try:
+        valor = valor.quantize(Decimal('0.01'))
+    except InvalidOperation:  # Más dígitos de los que admite el contexto decimal
+        valor = None
+    if valor is None or valor > PRECIO_MAXIMO:
+        raise ErrorFila(f"'{campo}' es demasiado grande (máximo {PRECIO_MAXIMO})")
+    return valor
+
+
+def _entero(valor, campo):
+    try:
+        numero = int(str(valor).strip())
+    except ValueError:
+        raise ErrorFila(f"'{campo}' no es un entero: {valor!r}")
+    if abs(numero) > CANTIDAD_MAXIMA:
+        raise ErrorFila(f"'{campo}' es demasiado grande: {valor!r}")
+    return numero
+
+
+def normalizar(crudo):
+    """
+    Valida una fila y devuelve (isbn, datos del libro o None, [(bodega_id, cantidad)]).
+    Lanza ErrorFila si no sirve.
+    """
+    if isinstance(crudo, str):
+        try:
+            crudo = json.loads(crudo)
+        except ValueError as error:
+            raise ErrorFila(f"JSON inválido: {error}")
+    if not isinstance(crudo, dict):
+        raise ErrorFila("se esperaba un objeto")
+
+    isbn = _texto(crudo, 'isbn', obligatorio=True)
+    datos = None
+    if _texto(crudo, 'nombre'):
+        datos = {
+            'nombre': _texto(crudo, 'nombre'),
+            'autor': _texto(crudo, 'autor', obligatorio=True),
+            'ilustrador': _texto(crudo, 'ilustrador') or None,
+            'sinopsis': str(crudo.get('sinopsis') or '').strip() or None,
+            'costo': _precio(crudo, 'costo'),
+            'precio_venta': _precio(crudo, 'precio_venta'),
+            'editorial': _texto(crudo, 'editorial', obligatorio=True),
+            'editorial_telefono': _texto(crudo, 'editorial_telefono'),
+        }
+
+    existencias = []
+    if isinstance(crudo.get('stock'), dict):
+        existencias = [(_entero(bodega, 'bodega'), _entero(cantidad, 'cantidad')) for bodega, cantidad in crudo['stock'].items()]
+    elif _texto(crudo, 'bodega'):
+        existencias = [(_entero(crudo['bodega'], 'bodega'), _entero(crudo.get('cantidad'), 'cantidad'))]
+    if any(cantidad < 0 for _, cantidad in existencias):
+        raise ErrorFila("'cantidad' no puede ser negativa")
+    if datos is None and not existencias:
+        raise ErrorFila("la fila no trae datos del libro ni stock")
+    return isbn, datos, existencias
+
+
+# --- Escritura por bloque ---
+
+class Importador:
+    """
+    Guarda bloques de filas ya validadas. Conserva entre bloques solo los
+    mapas de editoriales (nombre -> id) y de bodegas existentes.
+    """
+
+    def __init__(self, entradas=False):
+        self.entradas = entradas
+        self.editoriales = {}
+        for editorial_id, nombre in Editorial.objects.order_by('-id').values_list('id', 'nombre'):
+            self.editoriales[nombre] = editorial_id  # Con nombres repetidos gana la más antigua
+        self.bodegas = set(Bodega.objects.values_list('id', flat=True))
+
+    def _resolver_editoriales(self, libros):
+        nuevas = {}
+        for datos in libros.values():
+            if datos['editorial'] not in self.editoriales:
+                nuevas.setdefault(datos['editorial'], datos['editorial_telefono'])
+        creadas = Editorial.objects.bulk_create(
+            [Editorial(nombre=nombre, telefono=telefono) for nombre, telefono in nuevas.items()]
+        )
+        return {editorial.nombre: editorial.id for editorial in creadas}
+
+    @escritura_serializada
+    def guardar(self, libros, existencias):
+        """
+        `libros`: {isbn: datos}; `existencias`: {(isbn, bodega_id): cantidad}.
+        Devuelve (editoriales nuevas, libros, filas de stock, movimientos, [isbn sin libro]).
+        Se puede repetir entero (escritura_serializada): nada cambia fuera de la BD hasta el final.
+        """
+        with transaction.atomic():
+            nuevas = self._resolver_editoriales(libros)
+            editoriales = {**self.editoriales, **nuevas}
+            Libro.objects.bulk_create(
+                [
+                    Libro(isbn=isbn, editorial_id=editoriales[datos['editorial']],
+                          **{campo: datos[campo] for campo in CAMPOS_LIBRO})
+                    for isbn, datos in libros.items()
+                ],
+                update_conflicts=True, unique_fields=['isbn'], update_fields=[*CAMPOS_LIBRO, 'editorial'],
+            )
+            isbns = set(libros) | {isbn for isbn, _ in existencias}
+            ids = dict(Libro.objects.filter(isbn__in=isbns).values_list('isbn', 'id'))
+
+            if libros:
+                # Lo que hacen las señales de Libro al guardar uno: resumen en 0 e índice de búsqueda
+                libro_ids = [ids[isbn] for isbn in libros]
+                ResumenStockLibro.objects.bulk_create(
+                    [ResumenStockLibro(libro_id=libro_id, total=0) for libro_id in libro_ids], ignore_conflicts=True,
+                )
+                indexar_libros(libro_ids)
+                invalidar_catalogo()
+
+            sin_libro = sorted({isbn for isbn, _ in existencias if isbn not in ids})
+            stock = {(ids[isbn], bodega_id): cantidad for (isbn, bodega_id), cantidad in existencias.items() if isbn in ids}
+            movimientos = self._guardar_stock(stock)
+        self.editoriales.update(nuevas)
+        return len(nuevas), len(libros), len(stock), len(movimientos), sin_libro
+
+    def _guardar_stock(self, stock):
+        if not stock:
+            return []
+        if self.entradas:
+            return registrar_movimientos(
+                MovimientoInventario(libro_id=libro_id, bodega_id=bodega_id, tipo='ENTRADA', cantidad=cantidad)
+                for (libro_id, bodega_id), cantidad in stock.items()
+            )
+        actuales = {
+            (libro_id, bodega_id): cantidad
+            for libro_id, bodega_id, cantidad in
+            Stock.objects.filter(libro_id__in={libro_id for libro_id, _ in stock}).values_list('libro_id', 'bodega_id', 'cantidad')
+        }
+        cambios = {clave: cantidad for clave, cantidad in stock.items() if actuales.get(clave) != cantidad}
+        Stock.objects.bulk_create(
+            [Stock(libro_id=libro_id, bodega_id=bodega_id, cantidad=cantidad) for (libro_id, bodega_id), cantidad in cambios.items()],
+            update_conflicts=True, unique_fields=['libro', 'bodega'], update_fields=['cantidad'],
+        )
+        # Stock ya quedó escrito: el libro mayor y los resúmenes reciben solo la diferencia
+        return registrar_movimientos(
+            (
+                MovimientoInventario(libro_id=libro_id, bodega_id=bodega_id, tipo='AJUSTE',
+                                     cantidad=cantidad - actuales.get((libro_id, bodega_id), 0))
+                for (libro_id, bodega_id), cantidad in cambios.items()
+            ),
+            actualizar_stock=False,
+        )
+
+
+def importar(archivo, formato, entradas=False, tamano_bloque=TAMANO_BLOQUE, progreso=None):
+    """
+    Importa un archivo de texto (CSV o JSON Lines) por bloques. `progreso(resumen)`
+    se llama después de cada bloque. Las filas con errores se saltan y se cuentan.
+    Devuelve un ResumenImportacion.
+    """
+    resumen = ResumenImportacion()
+    importador = Importador(entradas=entradas)
+    libros, existencias = {}, {}
+
+    def guardar_bloque():
+        nuevas, num_libros, num_stock, num_movimientos, sin_libro = importador.guardar(libros, existencias)
+        resumen.editoriales_nuevas += nuevas
+        resumen.libros += num_libros
+        resumen.stock += num_stock
+        resumen.movimientos += num_movimientos
+        for isbn in sin_libro:
+            resumen.error(None, f"isbn {isbn}: stock de un libro que no existe")
+        libros.clear()
+        existencias.clear()
+        # Con DEBUG=True cada consulta queda en connection.queries (hasta 9000, y las
+        # de bulk_create traen el bloque entero); Django solo lo vacía por request
+        reset_queries()
+        if progreso:
+            progreso(resumen)
+
+    filas_en_bloque = 0
+    for numero, crudo in leer_filas(archivo, formato):
+        resumen.filas += 1
+        try:
+            isbn, datos, filas_stock = normalizar(crudo)
+            for bodega_id, _ in filas_stock:
+                if bodega_id not in importador.bodegas:
+                    raise ErrorFila(f"no existe la bodega {bodega_id}")
+        except ErrorFila as error:
+            resumen.error(numero, str(error))
+            continue
+        # Dentro del bloque, la última fila de un mismo isbn (o isbn y bodega) gana
+        if datos is not None:
+            libros[isbn] = datos
+        for bodega_id, cantidad in filas_stock:
+            existencias[(isbn, bodega_id)] = cantidad
+        filas_en_bloque += 1
+        if filas_en_bloque >= tamano_bloque:
+            guardar_bloque()
+            filas_en_bloque = 0
+    if libros or existencias:
+        guardar_bloque()
+    return resumen
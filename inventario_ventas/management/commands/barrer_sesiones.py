@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from inventario_ventas.sesiones import TAMANO_LOTE, barrer_sesiones_expiradas, barrer_carritos_abandonados
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra sesiones expiradas y líneas de carrito abandonadas en lotes pequeños "
+        "(alternativa a clearsessions que no bloquea SQLite). Pensado para cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+        parser.add_argument('--pausa', type=float, default=0.05, help="Segundos de espera entre lotes.")
+        parser.add_argument('--maximo', type=int, default=None, help="Máximo de filas a borrar por ejecución.")
+
+    def handle(self, *args, **options):
+        parametros = {clave: options[clave] for clave in ('lote', 'pausa', 'maximo')}
+        sesiones = barrer_sesiones_expiradas(**parametros)
+        lineas = barrer_carritos_abandonados(**parametros)
+        self.stdout.write(self.style.SUCCESS(f"{sesiones} sesiones expiradas y {lineas} líneas de carrito borradas."))
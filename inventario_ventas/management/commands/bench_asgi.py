@@ -0,0 +1,134 @@
+import json
+import multiprocessing
+import platform
+import sqlite3
+import sys
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from inventario_ventas import servidores
+from inventario_ventas.almacen_carrito import nombre_cookie
+from inventario_ventas.datos_sinteticos import generar
+from inventario_ventas.models import Libro
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara WSGI y ASGI (vistas síncronas y async) en el catálogo, el detalle de libro y el carrito: "
+        "peticiones por segundo, latencias p50/p99, memoria y hilos. Llama a la aplicación de Django "
+        "directamente (sin servidor) sobre una BD de prueba en disco; cada modo corre en su propio proceso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modos', default=','.join(servidores.MODOS),
+                            help="Modos a medir, separados por comas: " + ', '.join(servidores.MODOS) + '.')
+        parser.add_argument('--peticiones', type=int, default=2000)
+        parser.add_argument('--concurrencia', type=int, default=32,
+                            help="Peticiones a la vez (hilos con WSGI, tareas con ASGI).")
+        parser.add_argument('--libros', type=int, default=2000, help="Tamaño del catálogo sintético.")
+        parser.add_argument('--sin-cache', action='store_true',
+                            help="Sin la caché de páginas del catálogo: cada visita consulta la BD.")
+        parser.add_argument('--archivo-bd', default='/tmp/bench_asgi.sqlite3',
+                            help="BD de prueba en disco (los procesos la comparten).")
+        parser.add_argument('--salida', help="Archivo donde escribir el JSON.")
+        parser.add_argument('--json', action='store_true', help="Escribe solo el JSON en la salida estándar.")
+
+    # --- Datos ---
+
+    def _preparar(self, options):
+        num_libros = options['libros']
+        generar(editoriales=max(5, num_libros // 100), libros=num_libros, clientes=100, ventas=num_libros)
+        libros = list(
+            Libro.objects.filter(resumen_stock__total__gte=10).order_by('id').values_list('id', flat=True)[:50]
+        )
+        termino = Libro.objects.values_list('nombre', flat=True).first().split()[0]
+
+        # Un carrito con tres libros: la cookie se manda en todas las peticiones
+        cliente = Client()
+        for libro_id in libros[:3]:
+            cliente.post(reverse('carrito_add', args=[libro_id]), {'cantidad': 1})
+        cookie = '; '.join(f'{nombre}={morsel.value}' for nombre, morsel in cliente.cookies.items())
+        if nombre_cookie() not in cliente.cookies:
+            raise CommandError("No se pudo armar el carrito de prueba.")
+        cache.clear()
+        segunda_pagina = cliente.get(reverse('catalogo_libros')).context['pagina'].siguiente
+        cache.clear()
+
+        # Mezcla de visitas: sobre todo catálogo y detalle, algo de carrito
+        catalogo = reverse('catalogo_libros')
+        mezcla = [
+            catalogo, catalogo, f'{catalogo}?q={termino}', f'{catalogo}?cursor={segunda_pagina}',
+            *(reverse('detalle_libro', args=[libro_id]) for libro_id in libros[:4]),
+            reverse('carrito_detail'),
+        ]
+        rutas = [mezcla[numero % len(mezcla)] for numero in range(options['peticiones'])]
+        return rutas, cookie
+
+    # --- Ejecución ---
+
+    def _medir(self, modo, rutas, cookie, options):
+        # Un proceso nuevo por modo: memoria e hilos sin lo que dejó el modo anterior
+        contexto = multiprocessing.get_context('spawn')
+        with contexto.Pool(1, initializer=django.setup) as pool:
+            return pool.apply(servidores.medir_modo, (
+                connection.settings_dict['NAME'], modo, rutas, options['concurrencia'], cookie, options['sin_cache'],
+            ))
+
+    def handle(self, *args, **options):
+        self.solo_json = options['json']
+        modos = [modo.strip() for modo in options['modos'].split(',') if modo.strip()]
+        desconocidos = set(modos) - set(servidores.MODOS)
+        if desconocidos:
+            raise CommandError(f"Modos desconocidos: {', '.join(sorted(desconocidos))}")
+
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = options['archivo_bd']
+        nombre_original = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        resultados = []
+        try:
+            rutas, cookie = self._preparar(options)
+            connection.close()
+            for modo in modos:
+                resultado = self._medir(modo, rutas, cookie, options)
+                resultados.append(resultado)
+                self._mostrar(resultado)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        informe = {
+            'fecha': timezone.now().isoformat(),
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'plataforma': sys.platform,
+            },
+            'parametros': {clave: options[clave] for clave in ('peticiones', 'concurrencia', 'libros', 'sin_cache')},
+            'resultados': resultados,
+        }
+        texto = json.dumps(informe, ensure_ascii=False, indent=2)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto)
+            if not self.solo_json:
+                self.stdout.write(self.style.SUCCESS(f"Resultados en {options['salida']}"))
+        if self.solo_json:
+            self.stdout.write(texto)
+
+    def _mostrar(self, fila):
+        if self.solo_json:
+            return
+        self.stdout.write(
+            f"  {fila['modo']:<10} {fila['peticiones_por_segundo']:8.1f} pet/s | p50 {fila['ms_p50']:8.2f} ms"
+            f" | p99 {fila['ms_p99']:8.2f} ms | memoria {fila['memoria_max_mb']:6.1f} MB"
+            f" | hilos {fila['hilos_max']:3d} | errores {fila['errores']}"
+        )
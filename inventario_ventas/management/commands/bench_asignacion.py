@@ -0,0 +1,49 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventario_ventas.asignacion import asignar, StockInsuficiente
+
+
+class Command(BaseCommand):
+    help = "Mide el motor de asignación de bodegas con órdenes y bodegas sintéticas (en memoria)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, default=300)
+        parser.add_argument('--bodegas', type=int, default=2000)
+        parser.add_argument('--densidad', type=float, default=0.05,
+                            help="Probabilidad de que una bodega tenga un libro dado.")
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['semilla'])
+        num_lineas, num_bodegas = options['lineas'], options['bodegas']
+
+        lineas = {libro_id: aleatorio.randint(1, 5) for libro_id in range(1, num_lineas + 1)}
+        candidatos = {}
+        for libro_id in lineas:
+            candidatos[libro_id] = [
+                (bodega_id, aleatorio.randint(1, 10))
+                for bodega_id in range(1, num_bodegas + 1)
+                if aleatorio.random() < options['densidad']
+            ]
+        num_candidatos = sum(len(opciones) for opciones in candidatos.values())
+        self.stdout.write(f"{num_lineas} líneas, {num_bodegas} bodegas, {num_candidatos} filas candidatas")
+
+        for politica in ('menos_bodegas', 'mayor_primero', 'principal_primero'):
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                try:
+                    asignaciones = asignar(lineas, candidatos, politica, bodega_principal=1)
+                except StockInsuficiente as e:
+                    asignaciones = []
+                    self.stdout.write(self.style.WARNING(f"{politica}: {len(e.faltantes)} libros sin stock suficiente"))
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            bodegas_usadas = len({bodega_id for _, bodega_id, _ in asignaciones})
+            self.stdout.write(
+                f"{politica:<18} mejor {min(tiempos):8.2f} ms | mediana {sorted(tiempos)[len(tiempos) // 2]:8.2f} ms"
+                f" | {bodegas_usadas} bodegas usadas"
+            )
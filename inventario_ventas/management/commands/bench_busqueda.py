@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventario_ventas.models import Libro
+from inventario_ventas.busqueda import filtrar_por_like, filtrar_por_busqueda, fts_disponible
+
+
+class Command(BaseCommand):
+    help = "Compara el tiempo de la búsqueda con LIKE (icontains) contra el índice FTS5."
+
+    def add_arguments(self, parser):
+        parser.add_argument('consultas', nargs='*', default=['dragon', 'dragón', 'mar', 'el nino', 'cocodrilo'])
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def _medir(self, filtro, consulta, repeticiones):
+        queryset = Libro.objects.order_by('nombre', 'id')
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            resultados = list(filtro(queryset, consulta).values_list('id', flat=True))
+        return (time.perf_counter() - inicio) * 1000 / repeticiones, len(resultados)
+
+    def handle(self, *args, **options):
+        if not fts_disponible():
+            self.stdout.write(self.style.WARNING("FTS5 solo está disponible en SQLite."))
+            return
+
+        repeticiones = options['repeticiones']
+        self.stdout.write(f"{Libro.objects.count()} libros, {repeticiones} repeticiones por consulta\n")
+        self.stdout.write(f"{'consulta':<20} {'LIKE ms':>10} {'res':>6} {'FTS5 ms':>10} {'res':>6}")
+        for consulta in options['consultas']:
+            ms_like, n_like = self._medir(filtrar_por_like, consulta, repeticiones)
+            ms_fts, n_fts = self._medir(filtrar_por_busqueda, consulta, repeticiones)
+            self.stdout.write(f"{consulta:<20} {ms_like:>10.2f} {n_like:>6} {ms_fts:>10.2f} {n_fts:>6}")
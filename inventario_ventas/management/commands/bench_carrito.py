@@ -0,0 +1,78 @@
+import time
+
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from inventario_ventas.almacen_carrito import ALMACENES
+from inventario_ventas.carrito import Carrito
+from inventario_ventas.middleware import CarritoMiddleware
+from inventario_ventas.models import Libro
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara los almacenes del carrito (cookie, cache, tabla, sesion) simulando clientes que "
+        "añaden, cambian y quitan libros. Todo se ejecuta en una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, default=20, help="Libros distintos por carrito.")
+        parser.add_argument('--clientes', type=int, default=20)
+        parser.add_argument('almacenes', nargs='*', default=list(ALMACENES))
+
+    def _cliente(self, libros):
+        """Secuencia de operaciones de un cliente, cada una en su propio request."""
+        for libro in libros:
+            yield lambda carrito, libro=libro: carrito.add(libro, cantidad=1)
+        for libro in libros:
+            yield lambda carrito, libro=libro: carrito.set_qty(libro.id, 3)
+        for libro in libros[::2]:
+            yield lambda carrito, libro=libro: carrito.remove(libro)
+        yield lambda carrito: len(carrito)
+
+    def _medir(self, libros, clientes):
+        fabrica = RequestFactory()
+        operacion = None
+
+        def vista(request):
+            operacion(Carrito(request))
+            return HttpResponse()
+
+        cadena = SessionMiddleware(CarritoMiddleware(vista))
+        tiempo, consultas, operaciones, bytes_cookie = 0.0, 0, 0, 0
+        for _ in range(clientes):
+            cookies = {}
+            for operacion in self._cliente(libros):
+                request = fabrica.post('/carrito/')
+                request.COOKIES = dict(cookies)
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    response = cadena(request)
+                    tiempo += time.perf_counter() - inicio
+                consultas += len(capturadas)
+                operaciones += 1
+                for nombre, morsel in response.cookies.items():
+                    bytes_cookie = max(bytes_cookie, len(morsel.OutputString()))
+                    if morsel['max-age'] == 0:
+                        cookies.pop(nombre, None)
+                    else:
+                        cookies[nombre] = morsel.value
+        return tiempo * 1000 / operaciones, consultas / operaciones, bytes_cookie
+
+    def handle(self, *args, **options):
+        libros = list(Libro.objects.order_by('id')[:options['lineas']])
+        if not libros:
+            self.stdout.write(self.style.WARNING("No hay libros en la base de datos."))
+            return
+
+        self.stdout.write(f"{options['clientes']} clientes, {len(libros)} libros por carrito")
+        self.stdout.write(f"{'almacén':<8} {'ms/op':>8} {'consultas/op':>13} {'cookie máx (bytes)':>19}")
+        for nombre in options['almacenes']:
+            with transaction.atomic(), override_settings(CARRITO_ALMACEN=nombre):
+                ms, consultas, bytes_cookie = self._medir(libros, options['clientes'])
+                transaction.set_rollback(True)
+            self.stdout.write(f"{nombre:<8} {ms:>8.3f} {consultas:>13.2f} {bytes_cookie:>19}")
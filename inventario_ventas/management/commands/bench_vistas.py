@@ -0,0 +1,160 @@
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from inventario_ventas.datos_sinteticos import generar
+from inventario_ventas.models import Libro
+from inventario_ventas.perfilado import RegistroConsultas
+
+DATOS_CHECKOUT = {'nombre': 'Ana', 'apellido': 'Pérez', 'telefono': '5550000000', 'direccion': 'Calle 1'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide las vistas principales con el cliente de pruebas sobre una base de datos de prueba "
+        "llenada con datos sintéticos de varios tamaños. Con --json o --salida el resultado queda "
+        "en JSON para comparar entre ejecuciones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='1000,10000',
+                            help="Número de libros de cada conjunto de datos, separados por comas.")
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--salida', help="Archivo donde escribir el JSON.")
+        parser.add_argument('--json', action='store_true', help="Escribe solo el JSON en la salida estándar.")
+        parser.add_argument('--archivo-bd', help="Base de datos de prueba en disco (por defecto, en memoria).")
+
+    # --- Escenarios: (preparación sin medir, petición medida) ---
+
+    def _escenarios(self, libros, termino, usuario):
+        cliente = Client()
+        cliente_staff = Client()
+        cliente_staff.force_login(usuario)
+        en_carrito = []
+
+        def carrito_lleno():
+            nuevo = Client()
+            for libro_id in libros[:3]:
+                nuevo.post(reverse('carrito_add', args=[libro_id]), {'cantidad': 1})
+            return nuevo
+
+        def agregar():
+            libro_id = libros[len(en_carrito) % len(libros)]
+            en_carrito.append(libro_id)
+            return cliente.post(reverse('carrito_add', args=[libro_id]), {'cantidad': 1})
+
+        return {
+            'catalogo': (cache.clear, lambda _: cliente.get(reverse('catalogo_libros'))),
+            'catalogo_busqueda': (cache.clear, lambda _: cliente.get(reverse('catalogo_libros'), {'q': termino})),
+            'catalogo_en_cache': (None, lambda _: cliente.get(reverse('catalogo_libros'))),
+            'detalle': (cache.clear, lambda _: cliente.get(reverse('detalle_libro', args=[libros[0]]))),
+            'carrito_add': (None, lambda _: agregar()),
+            'carrito_update': (None, lambda _: cliente.post(
+                reverse('carrito_update_quantity', args=[en_carrito[0]]), {'cantidad': 2})),
+            'checkout': (carrito_lleno, lambda nuevo: nuevo.post(reverse('orden_checkout'), DATOS_CHECKOUT)),
+            'dashboard': (None, lambda _: cliente_staff.get(reverse('dashboard_ventas'))),
+        }
+
+    def _medir(self, preparar, peticion, repeticiones):
+        # Una vuelta sin medir (plantillas compiladas, conexiones, caché del escenario)
+        peticion(preparar() if preparar else None)
+        tiempos, consultas = [], []
+        for _ in range(repeticiones):
+            contexto = preparar() if preparar else None
+            registro = RegistroConsultas()
+            with registro.capturar():
+                inicio = time.perf_counter()
+                respuesta = peticion(contexto)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code >= 400:
+                raise RuntimeError(f"Respuesta {respuesta.status_code}")
+            consultas.append(registro.total)
+        tiempos.sort()
+        return {
+            'ms_min': round(tiempos[0], 3),
+            'ms_mediana': round(statistics.median(tiempos), 3),
+            'ms_p95': round(tiempos[max(0, int(len(tiempos) * 0.95) - 1)], 3),
+            'ms_media': round(statistics.fmean(tiempos), 3),
+            'consultas': int(statistics.median(consultas)),
+            'consultas_max': max(consultas),
+        }
+
+    def _conjunto(self, num_libros, repeticiones):
+        call_command('flush', interactive=False, verbosity=0)
+        inicio = time.perf_counter()
+        creados = generar(
+            editoriales=max(5, num_libros // 100), libros=num_libros, bodegas=10, stock_por_libro=3,
+            clientes=max(100, num_libros // 2), ventas=num_libros * 2,
+        )
+        segundos_carga = time.perf_counter() - inicio
+
+        # Libros con stock de sobra para que carrito y checkout no se ajusten
+        libros = list(
+            Libro.objects.filter(resumen_stock__total__gte=50).order_by('id').values_list('id', flat=True)[:200]
+        )
+        termino = Libro.objects.values_list('nombre', flat=True).first().split()[0]
+        usuario = User.objects.create_superuser('bench', 'bench@example.com', 'bench')
+
+        escenarios = {}
+        for nombre, (preparar, peticion) in self._escenarios(libros, termino, usuario).items():
+            escenarios[nombre] = self._medir(preparar, peticion, repeticiones)
+            if not self.solo_json:
+                fila = escenarios[nombre]
+                self.stdout.write(
+                    f"  {nombre:<20} mediana {fila['ms_mediana']:8.2f} ms | p95 {fila['ms_p95']:8.2f} ms"
+                    f" | {fila['consultas']:3d} consultas"
+                )
+        return {'datos': creados, 'segundos_carga': round(segundos_carga, 2), 'escenarios': escenarios}
+
+    def handle(self, *args, **options):
+        self.solo_json = options['json']
+        tamanos = [int(tamano) for tamano in options['tamanos'].split(',') if tamano.strip()]
+
+        if options['archivo_bd']:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = options['archivo_bd']
+        nombre_original = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        resultados = []
+        try:
+            for num_libros in tamanos:
+                if not self.solo_json:
+                    self.stdout.write(f"{num_libros} libros:")
+                resultados.append({'libros': num_libros, **self._conjunto(num_libros, options['repeticiones'])})
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        informe = {
+            'fecha': timezone.now().isoformat(),
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'plataforma': sys.platform,
+            },
+            'repeticiones': options['repeticiones'],
+            'resultados': resultados,
+        }
+        texto = json.dumps(informe, ensure_ascii=False, indent=2)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto)
+            if not self.solo_json:
+                self.stdout.write(self.style.SUCCESS(f"Resultados en {options['salida']}"))
+        if self.solo_json:
+            self.stdout.write(texto)
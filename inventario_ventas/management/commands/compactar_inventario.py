@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from inventario_ventas.stock import compactar_libro_mayor
+
+
+class Command(BaseCommand):
+    help = "Escribe una nueva generación de snapshots del libro mayor de inventario (y opcionalmente purga movimientos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--purgar', action='store_true',
+            help="Elimina los movimientos y snapshots antiguos ya cubiertos por la nueva generación "
+                 "(menos los de ventas confirmadas, que se necesitan para cancelarlas).",
+        )
+
+    def handle(self, *args, **options):
+        hasta, num_snapshots, purgados = compactar_libro_mayor(purgar=options['purgar'])
+        if not num_snapshots:
+            self.stdout.write(f"Sin movimientos nuevos desde el movimiento #{hasta}.")
+            return
+        mensaje = f"Snapshot hasta el movimiento #{hasta}: {num_snapshots} filas."
+        if options['purgar']:
+            mensaje += f" {purgados} registros purgados."
+        self.stdout.write(self.style.SUCCESS(mensaje))
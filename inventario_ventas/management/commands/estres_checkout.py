@@ -0,0 +1,168 @@
+import json
+import multiprocessing
+import platform
+import sqlite3
+import sys
+import time
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from inventario_ventas import estres
+from inventario_ventas.datos_sinteticos import generar
+from inventario_ventas.models import Bodega, Libro, Stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de estrés del flujo carrito_add -> checkout -> confirmar con muchos compradores a la vez "
+        "peleándose pocas unidades. Informa rendimiento, latencias p50/p99, errores 'database is locked' "
+        "y unidades sobrevendidas. Sin --url usa una BD de prueba en disco (no toca la de desarrollo)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compradores', type=int, default=200)
+        parser.add_argument('--concurrencia', type=int, default=16, help="Hilos (en cada proceso).")
+        parser.add_argument('--modo', choices=('hilos', 'procesos'), default='hilos')
+        parser.add_argument('--procesos', type=int, default=4, help="Procesos en --modo procesos.")
+        parser.add_argument('--calientes', type=int, default=3, help="Libros por los que se pelean.")
+        parser.add_argument('--stock', type=int, default=20, help="Unidades iniciales de cada libro caliente.")
+        parser.add_argument('--unidades', type=int, default=1, help="Unidades que pide cada comprador.")
+        parser.add_argument('--sin-confirmar', action='store_true', help="Solo carrito_add y checkout.")
+        parser.add_argument('--archivo-bd', default='/tmp/estres_checkout.sqlite3',
+                            help="BD de prueba en disco (los procesos la comparten).")
+        parser.add_argument('--url', help="Servidor ya arrancado (p. ej. http://127.0.0.1:8000); requiere --libros.")
+        parser.add_argument('--libros', help="Ids de los libros a comprar con --url, separados por comas.")
+        parser.add_argument('--salida', help="Archivo donde escribir el JSON.")
+        parser.add_argument('--json', action='store_true', help="Escribe solo el JSON en la salida estándar.")
+
+    # --- Datos ---
+
+    def _preparar(self, options):
+        generar(editoriales=5, libros=200, bodegas=3, clientes=50, ventas=100)
+        bodegas = list(Bodega.objects.order_by('id')[:2])
+        libros = []
+        for i in range(options['calientes']):
+            libro = Libro.objects.create(
+                editorial_id=Libro.objects.values_list('editorial_id', flat=True).first(),
+                nombre=f"Libro caliente {i + 1}", autor="Estrés", costo=100, precio_venta=200,
+            )
+            # El stock se reparte en dos bodegas para que la asignación tenga que elegir
+            mitad = options['stock'] // 2
+            Stock.objects.create(libro=libro, bodega=bodegas[0], cantidad=options['stock'] - mitad)
+            if mitad:
+                Stock.objects.create(libro=libro, bodega=bodegas[1], cantidad=mitad)
+            libros.append(libro.id)
+        cache.clear()
+        stock_inicial = dict(
+            Stock.objects.filter(libro_id__in=libros).values_list('libro_id').annotate(total=Sum('cantidad'))
+        )
+        return libros, stock_inicial
+
+    # --- Ejecución ---
+
+    def _en_procesos(self, options, libros):
+        num_procesos = options['procesos']
+        reparto = [options['compradores'] // num_procesos + (i < options['compradores'] % num_procesos)
+                   for i in range(num_procesos)]
+        # Todos los procesos arrancan a la vez cuando terminen de cargar Django
+        inicio = time.time() + 2
+        contexto = multiprocessing.get_context('spawn')
+        with contexto.Pool(num_procesos, initializer=django.setup) as pool:
+            partes = pool.starmap(estres.proceso_compradores, [
+                (connection.settings_dict['NAME'], cantidad, libros, options['unidades'],
+                 options['concurrencia'], not options['sin_confirmar'], inicio)
+                for cantidad in reparto if cantidad
+            ])
+        return [resultado for parte in partes for resultado in parte], time.time() - inicio
+
+    def _correr(self, options, libros):
+        if options['modo'] == 'procesos':
+            return self._en_procesos(options, libros)
+        inicio = time.perf_counter()
+        resultados = estres.ejecutar_compradores(
+            options['compradores'], libros, options['unidades'], options['concurrencia'],
+            url=options['url'], confirmar=not options['sin_confirmar'],
+        )
+        return resultados, time.perf_counter() - inicio
+
+    def handle(self, *args, **options):
+        self.solo_json = options['json']
+        if options['url']:
+            if not options['libros']:
+                raise CommandError("Con --url hay que indicar --libros.")
+            if options['modo'] == 'procesos':
+                raise CommandError("Con --url usa --concurrencia (hilos); el servidor ya tiene sus procesos.")
+            libros = [int(libro_id) for libro_id in options['libros'].split(',') if libro_id.strip()]
+            resultados, segundos = self._correr(options, libros)
+            # La confirmación va por el ORM: settings debe apuntar a la misma BD que el servidor
+            informe = {'url': options['url'], **estres.resumir(resultados, segundos)}
+        else:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = options['archivo_bd']
+            nombre_original = connection.settings_dict['NAME']
+            setup_test_environment()
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                libros, stock_inicial = self._preparar(options)
+                connection.close()  # Los hilos y procesos abren sus propias conexiones
+                resultados, segundos = self._correr(options, libros)
+                informe = {
+                    'modo': options['modo'],
+                    **estres.resumir(resultados, segundos),
+                    'sobreventa': estres.sobreventa(libros, stock_inicial),
+                }
+            finally:
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+                teardown_test_environment()
+
+        informe = {
+            'fecha': timezone.now().isoformat(),
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'plataforma': sys.platform,
+            },
+            'parametros': {clave: options[clave] for clave in (
+                'compradores', 'concurrencia', 'modo', 'procesos', 'calientes', 'stock', 'unidades', 'sin_confirmar',
+            )},
+            **informe,
+        }
+        self._mostrar(informe)
+
+        texto = json.dumps(informe, ensure_ascii=False, indent=2)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto)
+            if not self.solo_json:
+                self.stdout.write(self.style.SUCCESS(f"Resultados en {options['salida']}"))
+        if self.solo_json:
+            self.stdout.write(texto)
+
+    def _mostrar(self, informe):
+        if self.solo_json:
+            return
+        self.stdout.write(
+            f"{informe['compradores']} compradores en {informe['segundos']} s "
+            f"({informe['flujos_por_segundo']} flujos/s) | flujo p50 {informe['ms_flujo_p50']} ms, "
+            f"p99 {informe['ms_flujo_p99']} ms"
+        )
+        for paso, fila in informe['latencias'].items():
+            self.stdout.write(f"  {paso:<12} p50 {fila['ms_p50']:8.2f} ms | p99 {fila['ms_p99']:8.2f} ms | max {fila['ms_max']:8.2f} ms")
+        self.stdout.write(f"  resultados: {informe['resultados']}")
+        if informe['bloqueos_por_paso']:
+            self.stdout.write(self.style.WARNING(f"  'database is locked' por paso: {informe['bloqueos_por_paso']}"))
+        for error in informe['errores']:
+            self.stdout.write(self.style.WARNING(f"  {error}"))
+        if 'sobreventa' in informe:
+            sobreventa = informe['sobreventa']
+            estilo = self.style.ERROR if sobreventa['unidades_de_mas'] or sobreventa['unidades_en_negativo'] else self.style.SUCCESS
+            self.stdout.write(estilo(
+                f"  sobreventa: {sobreventa['unidades_de_mas']} unidades de más, "
+                f"{sobreventa['unidades_en_negativo']} en negativo en Stock"
+            ))
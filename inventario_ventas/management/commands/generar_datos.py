@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventario_ventas.datos_sinteticos import generar
+
+
+class Command(BaseCommand):
+    help = (
+        "Inserta datos sintéticos en bloque (editoriales, libros, bodegas, stock, clientes y ventas) "
+        "y reconstruye resúmenes e índice de búsqueda. Se suma a los datos existentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--editoriales', type=int, default=20)
+        parser.add_argument('--libros', type=int, default=1000)
+        parser.add_argument('--bodegas', type=int, default=5)
+        parser.add_argument('--stock-por-libro', type=int, default=2, help="Bodegas con stock de cada libro.")
+        parser.add_argument('--clientes', type=int, default=500)
+        parser.add_argument('--ventas', type=int, default=2000)
+        parser.add_argument('--lineas-por-venta', type=int, default=3, help="Máximo de líneas por venta.")
+        parser.add_argument('--dias', type=int, default=90, help="Las ventas se reparten en los últimos N días.")
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        parametros = {
+            clave: options[clave]
+            for clave in ('editoriales', 'libros', 'bodegas', 'stock_por_libro', 'clientes', 'ventas',
+                          'lineas_por_venta', 'dias', 'semilla')
+        }
+        inicio = time.perf_counter()
+        creados = generar(**parametros)
+        segundos = time.perf_counter() - inicio
+        detalle = ', '.join(f"{cantidad} {modelo}" for modelo, cantidad in creados.items())
+        self.stdout.write(self.style.SUCCESS(f"Creados en {segundos:.1f} s: {detalle}."))
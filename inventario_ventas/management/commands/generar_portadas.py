@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from inventario_ventas.models import Libro
+from inventario_ventas.portadas import generar_derivados
+
+
+class Command(BaseCommand):
+    help = "Genera (o regenera) los derivados WebP/JPEG de todas las portadas usando varios procesos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=None,
+                            help="Número de procesos (por defecto, uno por CPU).")
+
+    def handle(self, *args, **options):
+        nombres = sorted(set(
+            Libro.objects.exclude(portada='').exclude(portada__isnull=True).values_list('portada', flat=True)
+        ))
+        media_root = str(settings.MEDIA_ROOT)
+        inicio = time.perf_counter()
+        escritos, errores = 0, 0
+
+        with ProcessPoolExecutor(max_workers=options['procesos']) as pool:
+            futuros = {pool.submit(generar_derivados, media_root, nombre): nombre for nombre in nombres}
+            for futuro in as_completed(futuros):
+                try:
+                    escritos += futuro.result()
+                except OSError as e:
+                    errores += 1
+                    self.stderr.write(f"{futuros[futuro]}: {e}")
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(nombres)} portadas, {escritos} derivados en {segundos:.1f}s ({errores} errores)."
+        ))
@@ -0,0 +1,67 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario_ventas.importacion import TAMANO_BLOQUE, formato_de, importar
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa libros, editoriales y stock por bodega desde un CSV o JSON Lines (ver "
+        "inventario_ventas/importacion.py para las columnas). Lee el archivo por bloques con memoria "
+        "constante, hace upsert por isbn y deja las diferencias de stock en el libro mayor. "
+        "Con '-' lee de la entrada estándar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo, o '-' para la entrada estándar.")
+        parser.add_argument('--formato', choices=('csv', 'jsonl'), help="Por defecto, según la extensión.")
+        parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help="Filas por transacción.")
+        parser.add_argument('--entradas', action='store_true',
+                            help="Las cantidades se suman como ENTRADA en vez de fijar el conteo de la bodega.")
+        parser.add_argument('--json', action='store_true', help="Escribe solo el resumen en JSON.")
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or formato_de(options['archivo'])
+        if formato is None:
+            raise CommandError("No se reconoce el formato por la extensión; usa --formato csv|jsonl.")
+        if options['bloque'] < 1:
+            raise CommandError("--bloque debe ser mayor que 0.")
+        self.solo_json = options['json']
+
+        if options['archivo'] == '-':
+            resumen = self._importar(sys.stdin, formato, options)
+        else:
+            try:
+                # utf-8-sig: los CSV exportados desde Excel empiezan con BOM
+                with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                    resumen = self._importar(archivo, formato, options)
+            except OSError as error:
+                raise CommandError(f"No se pudo leer el archivo: {error}")
+
+        if self.solo_json:
+            self.stdout.write(json.dumps({
+                **resumen.como_dict(),
+                'primeros_errores': [{'fila': fila, 'error': mensaje} for fila, mensaje in resumen.errores],
+            }, ensure_ascii=False, indent=2))
+            return
+        for fila, mensaje in resumen.errores:
+            self.stdout.write(self.style.WARNING(f"  fila {fila or '?'}: {mensaje}"))
+        datos = resumen.como_dict()
+        self.stdout.write(self.style.SUCCESS(
+            f"{datos['filas']} filas en {datos['segundos']} s ({datos['filas_por_segundo']} filas/s): "
+            f"{datos['libros']} libros, {datos['editoriales_nuevas']} editoriales nuevas, "
+            f"{datos['stock']} filas de stock, {datos['movimientos']} movimientos, {datos['errores']} errores."
+        ))
+
+    def _importar(self, archivo, formato, options):
+        return importar(
+            archivo, formato, entradas=options['entradas'], tamano_bloque=options['bloque'],
+            progreso=None if self.solo_json else self._progreso,
+        )
+
+    def _progreso(self, resumen):
+        self.stdout.write(
+            f"  {resumen.filas} filas | {resumen.filas_por_segundo:,.0f} filas/s | {resumen.num_errores} errores"
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from inventario_ventas.almacenamiento import es_nombre_inmutable
+from inventario_ventas.models import Libro
+from inventario_ventas.portadas import generar_derivados, derivados_existen
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia las portadas con nombre antiguo (portadas/<slug>.png) a su nombre por hash de "
+        "contenido y actualiza los libros. Los archivos originales no se borran."
+    )
+
+    def handle(self, *args, **options):
+        campo = Libro._meta.get_field('portada')
+        storage = campo.storage
+        migradas, repetidas = 0, 0
+
+        for libro_id, nombre in Libro.objects.exclude(portada='').exclude(portada__isnull=True).values_list('id', 'portada').iterator():
+            if es_nombre_inmutable(nombre):
+                continue
+            with storage.open(nombre, 'rb') as archivo:
+                nuevo = storage.save(campo.generate_filename(None, nombre.rsplit('/', 1)[-1]), archivo)
+            if derivados_existen(storage.location, nuevo):
+                repetidas += 1
+            else:
+                generar_derivados(storage.location, nuevo)
+            # update() no dispara señales: los derivados ya se generaron arriba
+            Libro.objects.filter(pk=libro_id).update(portada=nuevo)
+            migradas += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{migradas} portadas migradas ({repetidas} ya existían con el mismo contenido)."))
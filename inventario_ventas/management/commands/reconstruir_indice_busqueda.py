@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventario_ventas.busqueda import fts_disponible, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de texto completo (FTS5) del catálogo."
+
+    def handle(self, *args, **options):
+        if not fts_disponible():
+            self.stdout.write(self.style.WARNING("La base de datos no es SQLite: no hay índice FTS5 que reconstruir."))
+            return
+        total = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda reconstruido: {total} libros."))
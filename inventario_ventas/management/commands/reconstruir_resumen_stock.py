@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from inventario_ventas.stock import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = "Reconstruye las tablas de resumen de stock (por libro y por bodega) a partir de Stock."
+
+    def handle(self, *args, **options):
+        num_libros, num_bodegas = reconstruir_resumenes()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resumen reconstruido: {num_libros} libros, {num_bodegas} bodegas."
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from inventario_ventas.reportes import reconstruir_resumen_ventas
+
+
+class Command(BaseCommand):
+    help = "Recalcula los resúmenes de ventas por día y por hora a partir de la tabla Venta."
+
+    def handle(self, *args, **options):
+        filas_dia, filas_hora = reconstruir_resumen_ventas()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes reconstruidos: {filas_dia} filas por día, {filas_hora} filas por hora."
+        ))
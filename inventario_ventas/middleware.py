@@ -0,0 +1,31 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
+class CarritoMiddleware:
+    """
+    Escribe en la respuesta la cookie del carrito cuando el almacén lo pide
+    (contenido firmado o token nuevo). Ver almacen_carrito.py.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Con ASGI y vistas async, sin pasar por un hilo (solo escribe cabeceras)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._actualizar(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._actualizar(request, await self.get_response(request))
+
+    def _actualizar(self, request, response):
+        almacen = getattr(request, '_carrito_almacen', None)
+        if almacen is not None:
+            almacen.actualizar_respuesta(response)
+        return response
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def poblar_resumenes(apps, schema_editor):
+    # Carga inicial de los resúmenes con el stock que ya existe
+    Stock = apps.get_model('inventario_ventas', 'Stock')
+    ResumenStockLibro = apps.get_model('inventario_ventas', 'ResumenStockLibro')
+    ResumenStockBodega = apps.get_model('inventario_ventas', 'ResumenStockBodega')
+
+    ResumenStockLibro.objects.bulk_create(
+        ResumenStockLibro(libro_id=fila['libro_id'], total=fila['total'] or 0)
+        for fila in Stock.objects.values('libro_id').annotate(total=Sum('cantidad')).order_by()
+    )
+    ResumenStockBodega.objects.bulk_create(
+        ResumenStockBodega(bodega_id=fila['bodega_id'], total=fila['total'] or 0)
+        for fila in Stock.objects.values('bodega_id').annotate(total=Sum('cantidad')).order_by()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenStockBodega',
+            fields=[
+                ('bodega', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_stock', serialize=False, to='inventario_ventas.bodega', verbose_name='Bodega')),
+                ('total', models.IntegerField(default=0, verbose_name='Stock Total')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Stock por Bodega',
+                'verbose_name_plural': 'Resumen de Stock por Bodega',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenStockLibro',
+            fields=[
+                ('libro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_stock', serialize=False, to='inventario_ventas.libro', verbose_name='Libro')),
+                ('total', models.IntegerField(db_index=True, default=0, verbose_name='Stock Total')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Stock por Libro',
+                'verbose_name_plural': 'Resumen de Stock por Libro',
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
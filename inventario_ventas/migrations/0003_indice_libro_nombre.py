@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0002_resumen_stock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['nombre', 'id'], name='libro_nombre_id_idx'),
+        ),
+    ]
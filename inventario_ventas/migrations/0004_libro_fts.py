@@ -0,0 +1,36 @@
+from django.db import migrations
+
+TABLA_FTS = 'inventario_ventas_libro_fts'
+
+
+def crear_indice_fts(apps, schema_editor):
+    # FTS5 solo existe en SQLite; en otros motores la búsqueda usa LIKE
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5('
+        'nombre, autor, ilustrador, editorial, sinopsis, '
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO {TABLA_FTS}(rowid, nombre, autor, ilustrador, editorial, sinopsis) '
+        "SELECT l.id, l.nombre, l.autor, COALESCE(l.ilustrador, ''), e.nombre, COALESCE(l.sinopsis, '') "
+        'FROM inventario_ventas_libro l JOIN inventario_ventas_editorial e ON e.id = l.editorial_id'
+    )
+
+
+def eliminar_indice_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {TABLA_FTS}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0003_indice_libro_nombre'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_fts, eliminar_indice_fts),
+    ]
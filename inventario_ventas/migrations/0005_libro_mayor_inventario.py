@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def snapshot_inicial(apps, schema_editor):
+    # Generación 0: el stock actual es el punto de partida del libro mayor
+    Stock = apps.get_model('inventario_ventas', 'Stock')
+    SnapshotInventario = apps.get_model('inventario_ventas', 'SnapshotInventario')
+    SnapshotInventario.objects.bulk_create(
+        SnapshotInventario(libro_id=libro_id, bodega_id=bodega_id, cantidad=cantidad, hasta_movimiento=0)
+        for libro_id, bodega_id, cantidad in Stock.objects.values_list('libro_id', 'bodega_id', 'cantidad')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0004_libro_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('ENTRADA', 'Entrada de Mercancía'), ('VENTA', 'Venta Confirmada'), ('CANCELACION', 'Cancelación de Venta'), ('AJUSTE', 'Ajuste de Inventario')], max_length=20, verbose_name='Tipo de Movimiento')),
+                ('cantidad', models.IntegerField(verbose_name='Cantidad')),
+                ('fecha_hora', models.DateTimeField(auto_now_add=True, verbose_name='Fecha y Hora')),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario_ventas.bodega', verbose_name='Bodega')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario_ventas.libro', verbose_name='Libro')),
+                ('venta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventario_ventas.venta', verbose_name='Venta')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Inventario',
+                'verbose_name_plural': 'Movimientos de Inventario',
+                'indexes': [models.Index(fields=['libro', 'bodega', 'id'], name='movimiento_libro_bodega_idx'), models.Index(fields=['venta', 'tipo'], name='movimiento_venta_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotInventario',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('cantidad', models.IntegerField(verbose_name='Cantidad')),
+                ('hasta_movimiento', models.BigIntegerField(verbose_name='Hasta Movimiento #')),
+                ('fecha_hora', models.DateTimeField(auto_now_add=True, verbose_name='Fecha y Hora')),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario_ventas.bodega', verbose_name='Bodega')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario_ventas.libro', verbose_name='Libro')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Inventario',
+                'verbose_name_plural': 'Snapshots de Inventario',
+                'indexes': [models.Index(fields=['hasta_movimiento', 'libro', 'bodega'], name='snapshot_generacion_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0005_libro_mayor_inventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenVentasDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('id_tienda', models.IntegerField(default=0, verbose_name='Tienda')),
+                ('id_staff', models.IntegerField(default=0, verbose_name='Vendedor')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente de Confirmación'), ('CONFIRMADA', 'Confirmada y Procesada'), ('CANCELADA', 'Cancelada')], max_length=20, verbose_name='Estado')),
+                ('num_ventas', models.IntegerField(default=0, verbose_name='Número de Ventas')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total Vendido')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Ventas por Día',
+                'verbose_name_plural': 'Resumen de Ventas por Día',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'id_tienda', 'id_staff', 'estado'), name='resumen_dia_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenVentasHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField(verbose_name='Hora')),
+                ('id_tienda', models.IntegerField(default=0, verbose_name='Tienda')),
+                ('id_staff', models.IntegerField(default=0, verbose_name='Vendedor')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente de Confirmación'), ('CONFIRMADA', 'Confirmada y Procesada'), ('CANCELADA', 'Cancelada')], max_length=20, verbose_name='Estado')),
+                ('num_ventas', models.IntegerField(default=0, verbose_name='Número de Ventas')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total Vendido')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Ventas por Hora',
+                'verbose_name_plural': 'Resumen de Ventas por Hora',
+                'constraints': [models.UniqueConstraint(fields=('hora', 'id_tienda', 'id_staff', 'estado'), name='resumen_hora_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def poblar(apps, schema_editor):
+    Libro = apps.get_model('inventario_ventas', 'Libro')
+    ResumenStockLibro = apps.get_model('inventario_ventas', 'ResumenStockLibro')
+    DetalleVenta = apps.get_model('inventario_ventas', 'DetalleVenta')
+    VentasLibro = apps.get_model('inventario_ventas', 'VentasLibro')
+
+    # Los libros sin stock también necesitan su fila de resumen (total=0)
+    # para aparecer en la lista de bajo inventario.
+    ResumenStockLibro.objects.bulk_create(
+        (ResumenStockLibro(libro_id=libro_id, total=0) for libro_id in Libro.objects.values_list('id', flat=True)),
+        ignore_conflicts=True,
+    )
+    VentasLibro.objects.bulk_create(
+        VentasLibro(libro_id=fila['libro_id'], unidades=fila['unidades'])
+        for fila in DetalleVenta.objects.filter(venta__estado='CONFIRMADA')
+        .values('libro_id').annotate(unidades=Sum('cantidad')).order_by()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0006_resumen_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentasLibro',
+            fields=[
+                ('libro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ventas_totales', serialize=False, to='inventario_ventas.libro', verbose_name='Libro')),
+                ('unidades', models.IntegerField(db_index=True, default=0, verbose_name='Unidades Vendidas')),
+            ],
+            options={
+                'verbose_name': 'Ventas por Libro',
+                'verbose_name_plural': 'Ventas por Libro',
+            },
+        ),
+        migrations.CreateModel(
+            name='VentasLibroDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('unidades', models.IntegerField(default=0, verbose_name='Unidades Vendidas')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario_ventas.libro', verbose_name='Libro')),
+            ],
+            options={
+                'verbose_name': 'Ventas por Libro y Día',
+                'verbose_name_plural': 'Ventas por Libro y Día',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'libro'), name='ventas_libro_dia_unico')],
+            },
+        ),
+        migrations.RunPython(poblar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:17
+
+import inventario_ventas.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0007_libros_mas_vendidos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='libro',
+            name='portada',
+            field=models.ImageField(blank=True, null=True, storage=inventario_ventas.almacenamiento.AlmacenamientoPorContenido(), upload_to='portadas/'),
+        ),
+    ]
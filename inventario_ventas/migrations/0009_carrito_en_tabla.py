@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0008_portada_por_contenido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LineaCarrito',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('carrito', models.CharField(max_length=40, verbose_name='Carrito')),
+                ('cantidad', models.IntegerField(verbose_name='Cantidad')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Precio Unitario')),
+                ('actualizado', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario_ventas.libro', verbose_name='Libro')),
+            ],
+            options={
+                'verbose_name': 'Línea de Carrito',
+                'verbose_name_plural': 'Líneas de Carrito',
+                'indexes': [models.Index(fields=['actualizado'], name='linea_carrito_actualizado_idx')],
+                'constraints': [models.UniqueConstraint(fields=('carrito', 'libro'), name='linea_carrito_unica')],
+            },
+        ),
+    ]
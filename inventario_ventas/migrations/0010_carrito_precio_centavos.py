@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def copiar_precios(apps, schema_editor):
+    from inventario_ventas.dinero import Dinero
+    LineaCarrito = apps.get_model('inventario_ventas', 'LineaCarrito')
+    for linea in LineaCarrito.objects.only('id', 'precio').iterator():
+        LineaCarrito.objects.filter(pk=linea.pk).update(precio_centavos=Dinero.desde_decimal(linea.precio).centavos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0009_carrito_en_tabla'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lineacarrito',
+            name='precio_centavos',
+            field=models.IntegerField(default=0, verbose_name='Precio Unitario (centavos)'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copiar_precios, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='lineacarrito',
+            name='precio',
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0010_carrito_precio_centavos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detalleventa',
+            name='libro',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='inventario_ventas.libro', verbose_name='Libro Vendido'),
+        ),
+        migrations.AlterField(
+            model_name='venta',
+            name='cliente',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventario_ventas.cliente', verbose_name='Cliente'),
+        ),
+        migrations.AddIndex(
+            model_name='detalleventa',
+            index=models.Index(fields=['libro', 'venta', 'cantidad'], name='detalle_libro_venta_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha_hora', 'estado'], name='venta_fecha_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['estado', 'fecha_hora'], name='venta_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['cliente', 'precio_total'], name='venta_cliente_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaslibrodia',
+            index=models.Index(fields=['fecha', 'libro', 'unidades'], name='ventas_libro_dia_fecha_idx'),
+        ),
+    ]
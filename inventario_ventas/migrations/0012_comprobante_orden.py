@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0011_indices_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComprobanteOrden',
+            fields=[
+                ('venta', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='comprobante', serialize=False, to='inventario_ventas.venta', verbose_name='Venta')),
+                ('datos', models.JSONField(verbose_name='Datos de la Orden')),
+            ],
+            options={
+                'verbose_name': 'Comprobante de Orden',
+                'verbose_name_plural': 'Comprobantes de Orden',
+            },
+        ),
+    ]
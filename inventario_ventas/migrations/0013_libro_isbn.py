@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0012_comprobante_orden'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='isbn',
+            field=models.CharField(blank=True, max_length=20, null=True, unique=True, verbose_name='ISBN'),
+        ),
+    ]
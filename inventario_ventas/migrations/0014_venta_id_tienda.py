@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:42
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def poblar_tienda(apps, schema_editor):
+    # Ventas existentes: la tienda actual de su vendedor (es la que usaban los resúmenes)
+    Venta = apps.get_model('inventario_ventas', 'Venta')
+    Staff = apps.get_model('inventario_ventas', 'Staff')
+    Venta.objects.filter(staff__isnull=False).update(
+        id_tienda=Coalesce(Subquery(Staff.objects.filter(pk=OuterRef('staff_id')).values('tienda_id')[:1]), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario_ventas', '0013_libro_isbn'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='id_tienda',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Tienda'),
+        ),
+        migrations.RunPython(poblar_tienda, migrations.RunPython.noop),
+    ]
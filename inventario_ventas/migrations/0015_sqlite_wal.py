@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def activar_wal(apps, schema_editor):
+    # journal_mode queda guardado en el archivo de la BD: basta con cambiarlo una vez
+    # (ver basedatos.py). No se puede cambiar dentro de una transacción.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('PRAGMA journal_mode = WAL')
+
+
+def desactivar_wal(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('PRAGMA journal_mode = DELETE')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('inventario_ventas', '0014_venta_id_tienda'),
+    ]
+
+    operations = [
+        migrations.RunPython(activar_wal, desactivar_wal),
+    ]
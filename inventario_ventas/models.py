@@ -1,8 +1,15 @@
 
 # Create your models here.
 
-from django.db import models
-from django.db.models import Sum, F
+from collections import namedtuple
+
+from django.db import models, transaction
+from django.db.models import Sum, F, IntegerField
+from django.db.models.functions import Coalesce, Cast, Round
+
+from .almacenamiento import AlmacenamientoPorContenido
+from .dinero import Dinero
+from .basedatos import escritura_serializada
 
 # --- 1. Modelos de Entidades de Soporte (Maestros) ---
 
@@ -68,6 +75,8 @@ class Libro(models.Model):
     # on_delete=models.PROTECT evita que se elimine una editorial si tiene libros asociados
     editorial = models.ForeignKey(Editorial, on_delete=models.PROTECT, verbose_name="Editorial", null=False)
     nombre = models.CharField(max_length=40, verbose_name="Título", null=False)
+    # Clave natural para las cargas masivas (ver importacion.py); opcional en el admin
+    isbn = models.CharField(max_length=20, unique=True, null=True, blank=True, verbose_name="ISBN")
     autor = models.CharField(max_length=40, verbose_name="Autor", null=False)
     ilustrador = models.CharField(max_length=40, verbose_name="Ilustrador", null=True, blank=True)
     # Usar DecimalField para dinero en lugar de INT
@@ -76,19 +85,37 @@ class Libro(models.Model):
     # BinaryField para BLOB de la imagen (podrías usar ImageField si configuras almacenamiento)
     portada = models.ImageField(
             upload_to= 'portadas/', #Las imágenes se guardarán en media/portadas/
+            # Nombre = hash del contenido: deduplica y permite caché 'immutable'
+            storage=AlmacenamientoPorContenido(),
             blank=True, 
             null=True)
     sinopsis = models.TextField(verbose_name='Sinópsis del Libro', null = True, blank = True)
 
+    class Meta:
+        indexes = [
+            # Orden y cursor de la paginación del catálogo
+            models.Index(fields=['nombre', 'id'], name='libro_nombre_id_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Para detectar una portada nueva y generar sus derivados (ver signals.py)
+        instancia._portada_original = instancia.__dict__.get('portada')
+        return instancia
     
     # Propiedad calculada para mostrar el stock total en el admin/vistas
     @property
     def stock_total(self):
-        # Suma la cantidad de stock a través de la relación inversa 'stock_set'
-        return self.stock_set.aggregate(total=Sum('cantidad'))['total'] or 0
+        # Lee el total desnormalizado (una búsqueda por PK) en lugar de
+        # sumar 'stock_set' en cada acceso. Sin fila de resumen = sin stock.
+        try:
+            return self.resumen_stock.total
+        except ResumenStockLibro.DoesNotExist:
+            return 0
 
 class Stock(models.Model):
     # Relación N:M, usa las FK como claves para garantizar unicidad (unique_together)
@@ -101,6 +128,45 @@ class Stock(models.Model):
         unique_together = ('libro', 'bodega')
         verbose_name_plural = "Stock"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Guardamos los valores leídos para que las señales puedan calcular
+        # el delta exacto al guardar/eliminar (ver signals.py)
+        instancia._original = (
+            instancia.__dict__.get('libro_id'),
+            instancia.__dict__.get('bodega_id'),
+            instancia.__dict__.get('cantidad'),
+        )
+        return instancia
+
+
+# --- 3b. Resúmenes de Stock (desnormalizados) ---
+# Se actualizan de forma incremental desde las señales de Stock y se pueden
+# reconstruir con: python manage.py reconstruir_resumen_stock
+
+class ResumenStockLibro(models.Model):
+    libro = models.OneToOneField(Libro, on_delete=models.CASCADE, primary_key=True, related_name='resumen_stock', verbose_name="Libro")
+    total = models.IntegerField(default=0, db_index=True, verbose_name="Stock Total")
+
+    class Meta:
+        verbose_name = "Resumen de Stock por Libro"
+        verbose_name_plural = "Resumen de Stock por Libro"
+
+    def __str__(self):
+        return f"{self.libro_id}: {self.total} uds"
+
+class ResumenStockBodega(models.Model):
+    bodega = models.OneToOneField(Bodega, on_delete=models.CASCADE, primary_key=True, related_name='resumen_stock', verbose_name="Bodega")
+    total = models.IntegerField(default=0, verbose_name="Stock Total")
+
+    class Meta:
+        verbose_name = "Resumen de Stock por Bodega"
+        verbose_name_plural = "Resumen de Stock por Bodega"
+
+    def __str__(self):
+        return f"Bodega {self.bodega_id}: {self.total} uds"
+
 
 # --- 4. Modelos de Transacción (Ventas) ---
 
@@ -112,8 +178,12 @@ class Venta(models.Model):
         ('CANCELADA', 'Cancelada'),]
 
     id = models.AutoField(primary_key=True)
-    cliente = models.ForeignKey('Cliente', on_delete=models.SET_NULL, verbose_name="Cliente", null=True)
+    # Sin índice propio: lo cubre venta_cliente_total_idx (cliente, precio_total)
+    cliente = models.ForeignKey('Cliente', on_delete=models.SET_NULL, verbose_name="Cliente", null=True, db_index=False)
     staff = models.ForeignKey('Staff', on_delete=models.SET_NULL, verbose_name="Vendedor", null=True)
+    # Tienda del vendedor al registrar la venta (0 = sin tienda). Es la clave de su
+    # cubeta en los resúmenes: si el staff cambia de tienda, sus ventas viejas no se mueven
+    id_tienda = models.IntegerField(default=0, editable=False, verbose_name="Tienda")
     # Este campo DEBE coincidir con la suma de los detalles para auditoría
     precio_total = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Total de Venta", null=False)
     # auto_now_add es el equivalente a DEFAULT(NOW) en la base de datos
@@ -128,31 +198,67 @@ class Venta(models.Model):
         verbose_name="Estado de la Venta"
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Estado leído de la BD: evita un SELECT extra en save() para detectar transiciones
+        instancia._estado_original = instancia.__dict__.get('estado')
+        # Valores que definen su "cubeta" en los resúmenes de ventas (ver reportes.py)
+        instancia._original = (
+            instancia.__dict__.get('fecha_hora'),
+            instancia.__dict__.get('staff_id'),
+            instancia.__dict__.get('id_tienda'),
+            instancia.__dict__.get('estado'),
+            instancia.__dict__.get('precio_total'),
+        )
+        return instancia
+
+    @escritura_serializada
     def save(self, *args, **kwargs):
-        # 1. Si la venta se acaba de cambiar a CONFIRMADA, descontamos stock.
-        # Solo descontamos si el estado PREVIO era 'PENDIENTE'.
-        if self.pk:
-            venta_previa = Venta.objects.get(pk=self.pk)
-            
-            if venta_previa.estado == 'PENDIENTE' and self.estado == 'CONFIRMADA':
-                
-                # Descuento atómico de stock
-                with transaction.atomic():
-                    bodega_principal = Bodega.objects.get(id=1) # Asumimos Bodega ID 1
-                    
-                    for detalle in self.detalleventa_set.all():
-                        Stock.objects.create(
-                            libro=detalle.libro,
-                            bodega=bodega_principal,
-                            cantidad=-detalle.cantidad, # CANTIDAD NEGATIVA para restar
-                            nota=f"Venta confirmada #{self.id}"
-                        )
-                print(f"✅ Stock descontado para la Venta #{self.id}")
-
-        super().save(*args, **kwargs) # Llama al método save original
+        # Las transiciones de estado se registran en el libro mayor de inventario:
+        #   PENDIENTE -> CONFIRMADA: movimientos VENTA (descuentan stock)
+        #   CONFIRMADA -> CANCELADA: movimientos CANCELACION (devuelven el stock)
+        # Todo son INSERTs en bloque; no se lee ni reescribe cada fila de Stock.
+        # Una venta nueva todavía no tiene líneas: se crea PENDIENTE y se confirma
+        # después de guardarlas (así lo hace VentaAdmin.save_related).
+        from .stock import registrar_venta_confirmada, registrar_venta_cancelada
+
+        estado_previo = getattr(self, '_estado_original', None)
+        cubeta_previa = getattr(self, '_original', None)
+        if cubeta_previa is None or cubeta_previa[1] != self.staff_id:
+            # Venta nueva o con otro vendedor: toma la tienda actual del vendedor
+            self.id_tienda = (
+                Staff.objects.filter(pk=self.staff_id).values_list('tienda_id', flat=True).first() or 0
+                if self.staff_id else 0
+            )
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'id_tienda'}
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs) # Llama al método save original
+
+                if estado_previo == 'PENDIENTE' and self.estado == 'CONFIRMADA':
+                    registrar_venta_confirmada(self)
+                elif estado_previo == 'CONFIRMADA' and self.estado == 'CANCELADA':
+                    registrar_venta_cancelada(self)
+        except Exception:
+            # La señal post_save ya movió _original a la cubeta nueva, pero lo que
+            # sumó a los resúmenes se deshizo con la transacción: la venta sigue
+            # en su cubeta anterior (p.ej. el admin reintenta con el estado previo)
+            self._original = cubeta_previa
+            raise
+        self._estado_original = self.estado
 
     class Meta:
         verbose_name_plural = "Ventas"
+        indexes = [
+            # Filtros por rango de fecha (admin, reportes), con el estado dentro del índice
+            models.Index(fields=['fecha_hora', 'estado'], name='venta_fecha_estado_idx'),
+            # Ventas de un estado en un rango de fechas (p.ej. pendientes de la semana)
+            models.Index(fields=['estado', 'fecha_hora'], name='venta_estado_fecha_idx'),
+            # Gasto por cliente sin leer la tabla (índice cubriente para el GROUP BY)
+            models.Index(fields=['cliente', 'precio_total'], name='venta_cliente_total_idx'),
+        ]
 
     def __str__(self):
         return f"Venta #{self.id} - Total: {self.precio_total}"
@@ -160,17 +266,20 @@ class Venta(models.Model):
     # Método para calcular el total de la venta (útil antes de guardar)
     @property
     def total_calculado(self):
+        # Suma en centavos enteros dentro de la BD (SQLite guarda los DecimalField
+        # como REAL, así que sumar precio * cantidad acumula error de redondeo).
         # Usamos Coalesce para tratar valores NULL (de inlines vacíos) como 0 antes de la multiplicación
-        return self.detalleventa_set.aggregate(
+        return Dinero(self.detalleventa_set.aggregate(
             total=Sum(
-                Coalesce(F('cantidad'), 0) * Coalesce(F('precio'), 0) # <<< ¡Corrección clave aquí!
+                Coalesce(F('cantidad'), 0) * Cast(Round(Coalesce(F('precio'), 0) * 100), IntegerField())
             )
-        )['total'] or 0
+        )['total'] or 0)
 
 class DetalleVenta(models.Model):
     id = models.AutoField(primary_key=True)
     venta = models.ForeignKey(Venta, on_delete=models.CASCADE, verbose_name="Venta", null=False)
-    libro = models.ForeignKey(Libro, on_delete=models.PROTECT, verbose_name="Libro Vendido", null=False)
+    # Sin índice propio: lo cubre detalle_libro_venta_idx (libro, venta, cantidad)
+    libro = models.ForeignKey(Libro, on_delete=models.PROTECT, verbose_name="Libro Vendido", null=False, db_index=False)
     cantidad = models.IntegerField(verbose_name="Cantidad", null=False)
     precio = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Precio Unitario Vendido", null=False)
     fecha_hora = models.DateTimeField(auto_now_add=True, verbose_name="Fecha y Hora de Registro", null=False)
@@ -178,6 +287,10 @@ class DetalleVenta(models.Model):
     class Meta:
         verbose_name = "Detalle de Venta"
         verbose_name_plural = "Detalle de Ventas"
+        indexes = [
+            # Unidades por libro (GROUP BY libro) sin leer la tabla; con venta para el JOIN por estado
+            models.Index(fields=['libro', 'venta', 'cantidad'], name='detalle_libro_venta_idx'),
+        ]
 
     def __str__(self):
         return f"Venta {self.venta.id} | {self.libro.nombre} ({self.cantidad} uds)"
@@ -187,11 +300,213 @@ class DetalleVenta(models.Model):
     def total_linea(self):
         # Si la cantidad o el precio es None (está vacío en el formulario), se usa 0.
         cantidad = self.cantidad if self.cantidad is not None else 0
-        precio = self.precio if self.precio is not None else 0
-        
-        # Además, aseguramos que el tipo de datos sea Decimal/entero para la multiplicación
-        # (Aunque deberían serlo, es buena práctica)
         try:
-            return cantidad * precio
-        except TypeError:
-            return 0.00
+            return Dinero.desde_decimal(self.precio) * int(cantidad)
+        except (TypeError, ValueError, ArithmeticError):
+            return Dinero(0)
+
+
+# --- 4a. Comprobante de la Orden (foto del checkout) ---
+# Lo que el cliente pidió, tal como se vio en el checkout: títulos, cantidades,
+# precios, total y datos de contacto, en una sola fila por venta (la clave es
+# la misma venta). La confirmación, el mensaje de WhatsApp y la vista previa
+# del admin se arman con una búsqueda por PK, sin JOIN con DetalleVenta ni
+# Libro. No se modifica: si luego cambia un libro o la venta, el comprobante
+# sigue diciendo lo que se pidió.
+
+LineaComprobante = namedtuple('LineaComprobante', ['libro_id', 'titulo', 'cantidad', 'precio', 'total_linea'])
+
+
+class ComprobanteOrden(models.Model):
+    VERSION = 1
+
+    venta = models.OneToOneField(Venta, on_delete=models.CASCADE, primary_key=True, related_name='comprobante', verbose_name="Venta")
+    # {'v': 1, 'fecha': iso, 'contacto': {...}, 'lineas': [[libro_id, titulo, cantidad, centavos], ...], 'total': centavos}
+    datos = models.JSONField(verbose_name="Datos de la Orden")
+
+    class Meta:
+        verbose_name = "Comprobante de Orden"
+        verbose_name_plural = "Comprobantes de Orden"
+
+    def __str__(self):
+        return f"Comprobante de la Venta #{self.venta_id}"
+
+    @classmethod
+    def armar(cls, venta, lineas, contacto):
+        """`lineas`: [(libro, cantidad, precio Dinero)], como las de checkout.validar_carrito."""
+        return cls(venta=venta, datos={
+            'v': cls.VERSION,
+            'fecha': venta.fecha_hora.isoformat(),
+            'contacto': dict(contacto or {}),
+            'lineas': [[libro.id, libro.nombre, cantidad, precio.centavos] for libro, cantidad, precio in lineas],
+            'total': sum(precio.centavos * cantidad for _, cantidad, precio in lineas),
+        })
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("El comprobante de una orden no se modifica.")
+        kwargs['force_insert'] = True
+        super().save(*args, **kwargs)
+
+    @property
+    def contacto(self):
+        return self.datos.get('contacto', {})
+
+    @property
+    def lineas(self):
+        return [
+            LineaComprobante(libro_id, titulo, cantidad, Dinero(centavos), Dinero(centavos) * cantidad)
+            for libro_id, titulo, cantidad, centavos in self.datos['lineas']
+        ]
+
+    @property
+    def total(self):
+        return Dinero(self.datos['total'])
+
+    @property
+    def unidades(self):
+        return sum(cantidad for _, _, cantidad, _ in self.datos['lineas'])
+
+
+# --- 4b. Resúmenes de Ventas (pre-agregados) ---
+# Totales por día/hora, tienda, vendedor y estado. Se mantienen desde las
+# señales de Venta y se reconstruyen con: python manage.py reconstruir_resumen_ventas
+# id_tienda / id_staff = 0 significa "sin asignar" (no usamos FK con NULL porque
+# SQLite no trata los NULL como iguales en las restricciones únicas).
+
+class ResumenVentasDia(models.Model):
+    fecha = models.DateField(verbose_name="Fecha")
+    id_tienda = models.IntegerField(default=0, verbose_name="Tienda")
+    id_staff = models.IntegerField(default=0, verbose_name="Vendedor")
+    estado = models.CharField(max_length=20, choices=Venta.ESTADO_CHOICES, verbose_name="Estado")
+    num_ventas = models.IntegerField(default=0, verbose_name="Número de Ventas")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Total Vendido")
+
+    class Meta:
+        verbose_name = "Resumen de Ventas por Día"
+        verbose_name_plural = "Resumen de Ventas por Día"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'id_tienda', 'id_staff', 'estado'], name='resumen_dia_unico'),
+        ]
+
+class ResumenVentasHora(models.Model):
+    hora = models.DateTimeField(verbose_name="Hora")  # Inicio de la hora (hora local)
+    id_tienda = models.IntegerField(default=0, verbose_name="Tienda")
+    id_staff = models.IntegerField(default=0, verbose_name="Vendedor")
+    estado = models.CharField(max_length=20, choices=Venta.ESTADO_CHOICES, verbose_name="Estado")
+    num_ventas = models.IntegerField(default=0, verbose_name="Número de Ventas")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Total Vendido")
+
+    class Meta:
+        verbose_name = "Resumen de Ventas por Hora"
+        verbose_name_plural = "Resumen de Ventas por Hora"
+        constraints = [
+            models.UniqueConstraint(fields=['hora', 'id_tienda', 'id_staff', 'estado'], name='resumen_hora_unico'),
+        ]
+
+
+# --- 4c. Libros Más Vendidos (mantenido al confirmar/cancelar ventas) ---
+
+class VentasLibro(models.Model):
+    # Unidades vendidas (ventas CONFIRMADAS) de todos los tiempos
+    libro = models.OneToOneField(Libro, on_delete=models.CASCADE, primary_key=True, related_name='ventas_totales', verbose_name="Libro")
+    unidades = models.IntegerField(default=0, db_index=True, verbose_name="Unidades Vendidas")
+
+    class Meta:
+        verbose_name = "Ventas por Libro"
+        verbose_name_plural = "Ventas por Libro"
+
+class VentasLibroDia(models.Model):
+    # Unidades vendidas por día: base de las ventanas móviles (últimos N días)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, verbose_name="Libro")
+    fecha = models.DateField(verbose_name="Fecha")
+    unidades = models.IntegerField(default=0, verbose_name="Unidades Vendidas")
+
+    class Meta:
+        verbose_name = "Ventas por Libro y Día"
+        verbose_name_plural = "Ventas por Libro y Día"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'libro'], name='ventas_libro_dia_unico'),
+        ]
+        indexes = [
+            # Ventana de los últimos N días: rango sobre fecha y suma de unidades sin leer la tabla
+            # (con solo la restricción única SQLite prefiere recorrer el índice de libro entero)
+            models.Index(fields=['fecha', 'libro', 'unidades'], name='ventas_libro_dia_fecha_idx'),
+        ]
+
+
+# --- 5. Libro Mayor de Inventario ---
+# Registro de solo-anexado de todos los cambios de stock. El stock de un libro
+# en una bodega es "último snapshot + movimientos posteriores". Stock y los
+# resúmenes son cachés derivados de este registro (ver stock.py).
+
+class MovimientoInventario(models.Model):
+
+    TIPO_CHOICES = [
+        ('ENTRADA', 'Entrada de Mercancía'),
+        ('VENTA', 'Venta Confirmada'),
+        ('CANCELACION', 'Cancelación de Venta'),
+        ('AJUSTE', 'Ajuste de Inventario'),]
+
+    id = models.BigAutoField(primary_key=True)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, verbose_name="Libro", null=False)
+    bodega = models.ForeignKey(Bodega, on_delete=models.CASCADE, verbose_name="Bodega", null=False)
+    # Venta que originó el movimiento (solo VENTA/CANCELACION)
+    venta = models.ForeignKey(Venta, on_delete=models.SET_NULL, verbose_name="Venta", null=True, blank=True)
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name="Tipo de Movimiento")
+    # Positivo = entra stock, negativo = sale stock
+    cantidad = models.IntegerField(verbose_name="Cantidad", null=False)
+    fecha_hora = models.DateTimeField(auto_now_add=True, verbose_name="Fecha y Hora", null=False)
+
+    class Meta:
+        verbose_name = "Movimiento de Inventario"
+        verbose_name_plural = "Movimientos de Inventario"
+        indexes = [
+            models.Index(fields=['libro', 'bodega', 'id'], name='movimiento_libro_bodega_idx'),
+            models.Index(fields=['venta', 'tipo'], name='movimiento_venta_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} | {self.libro_id} @ Bodega {self.bodega_id}: {self.cantidad:+d}"
+
+class SnapshotInventario(models.Model):
+    # Cada compactación escribe una "generación" de snapshots con el mismo
+    # 'hasta_movimiento': el stock acumulado hasta ese id de movimiento (incluido).
+    id = models.BigAutoField(primary_key=True)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, verbose_name="Libro", null=False)
+    bodega = models.ForeignKey(Bodega, on_delete=models.CASCADE, verbose_name="Bodega", null=False)
+    cantidad = models.IntegerField(verbose_name="Cantidad", null=False)
+    hasta_movimiento = models.BigIntegerField(verbose_name="Hasta Movimiento #", null=False)
+    fecha_hora = models.DateTimeField(auto_now_add=True, verbose_name="Fecha y Hora", null=False)
+
+    class Meta:
+        verbose_name = "Snapshot de Inventario"
+        verbose_name_plural = "Snapshots de Inventario"
+        indexes = [
+            models.Index(fields=['hasta_movimiento', 'libro', 'bodega'], name='snapshot_generacion_idx'),
+        ]
+
+# --- Carrito en tabla propia (backend 'tabla' de almacen_carrito.py) ---
+
+class LineaCarrito(models.Model):
+    # Una fila por libro en el carrito; 'carrito' es el token aleatorio de la
+    # cookie del cliente. Cada cambio toca solo su fila (no hay sesión que reescribir).
+    id = models.BigAutoField(primary_key=True)
+    carrito = models.CharField(max_length=40, verbose_name="Carrito", null=False)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, verbose_name="Libro", null=False)
+    cantidad = models.IntegerField(verbose_name="Cantidad", null=False)
+    precio_centavos = models.IntegerField(verbose_name="Precio Unitario (centavos)", null=False)
+    actualizado = models.DateTimeField(auto_now=True, verbose_name="Actualizado", null=False)
+
+    class Meta:
+        verbose_name = "Línea de Carrito"
+        verbose_name_plural = "Líneas de Carrito"
+        constraints = [
+            models.UniqueConstraint(fields=['carrito', 'libro'], name='linea_carrito_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['actualizado'], name='linea_carrito_actualizado_idx'),
+        ]
+
+    def __str__(self):
+        return f"Carrito {self.carrito[:8]}: {self.cantidad} x Libro {self.libro_id}"
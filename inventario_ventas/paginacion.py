@@ -0,0 +1,150 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+# Paginación por clave (keyset) sobre (campo, id): (nombre, id) en el catálogo
+# y (relevancia, id) en las búsquedas.
+# En lugar de OFFSET, cada página filtra "después de" o "antes de" la última
+# clave vista, así la página 500 cuesta lo mismo que la primera.
+
+SIGUIENTE = 's'
+ANTERIOR = 'a'
+
+
+# Tipo del valor de cada campo de orden admitido en un cursor
+TIPOS_CAMPO = {'nombre': (str,), 'relevancia': (float, int)}
+
+
+def codificar_cursor(direccion, campo, valor, pk):
+    """Convierte (dirección, campo, valor, id) en un token opaco apto para la URL."""
+    crudo = json.dumps([direccion, campo, valor, pk], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(crudo.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token, campo='nombre'):
+    """
+    Devuelve (dirección, valor, id) o None si el token no es válido o es de
+    otro orden (p.ej. un cursor del catálogo usado en una búsqueda).
+    """
+    if not token:
+        return None
+    try:
+        relleno = '=' * (-len(token) % 4)
+        direccion, campo_cursor, valor, pk = json.loads(base64.urlsafe_b64decode(token + relleno))
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if (
+        direccion not in (SIGUIENTE, ANTERIOR) or campo_cursor != campo
+        or not isinstance(valor, TIPOS_CAMPO[campo]) or isinstance(valor, bool)
+        or not isinstance(pk, int) or isinstance(pk, bool)
+    ):
+        return None
+    return direccion, valor, pk
+
+
+class PaginaPorClave:
+    """Resultado de una página: objetos + tokens para avanzar/retroceder."""
+
+    def __init__(self, objetos, siguiente=None, anterior=None):
+        self.objetos = objetos
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def tiene_otras_paginas(self):
+        return bool(self.siguiente or self.anterior)
+
+
+def _consulta_pagina(queryset, cursor, por_pagina, campo):
+    """Dirección y consulta (sin ejecutar) de la página que empieza en `cursor`."""
+    if cursor is None:
+        return SIGUIENTE, queryset.order_by(campo, 'id')[:por_pagina + 1]
+    direccion, valor, pk = cursor
+    if direccion == SIGUIENTE:
+        return direccion, (
+            queryset.filter(Q(**{f'{campo}__gt': valor}) | Q(**{campo: valor, 'id__gt': pk}))
+            .order_by(campo, 'id')[:por_pagina + 1]
+        )
+    return direccion, (
+        queryset.filter(Q(**{f'{campo}__lt': valor}) | Q(**{campo: valor, 'id__lt': pk}))
+        .order_by(f'-{campo}', '-id')[:por_pagina + 1]
+    )
+
+
+def paginar_por_clave(queryset, token, por_pagina, campo='nombre'):
+    """
+    Pagina `queryset` ordenado por (campo, id) a partir del cursor `token`.
+    `campo` es 'nombre' o una anotación 'relevancia' (ver busqueda.relevancia).
+    Se pide una fila extra para saber si hay más páginas sin hacer COUNT(*).
+    """
+    cursor = decodificar_cursor(token, campo)
+    direccion, consulta = _consulta_pagina(queryset, cursor, por_pagina, campo)
+    return _armar_pagina(list(consulta), direccion, cursor, por_pagina, campo)
+
+
+async def apaginar_por_clave(queryset, token, por_pagina, campo='nombre'):
+    """Versión async de paginar_por_clave (para las vistas async de views.py)."""
+    cursor = decodificar_cursor(token, campo)
+    direccion, consulta = _consulta_pagina(queryset, cursor, por_pagina, campo)
+    filas = [fila async for fila in consulta.aiterator(chunk_size=por_pagina + 1)]
+    return _armar_pagina(filas, direccion, cursor, por_pagina, campo)
+
+
+def _armar_pagina(filas, direccion, cursor, por_pagina, campo):
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if direccion == ANTERIOR:
+        filas.reverse()
+
+    if not filas:
+        return PaginaPorClave([])
+
+    primero, ultimo = filas[0], filas[-1]
+    despues = codificar_cursor(SIGUIENTE, campo, getattr(ultimo, campo), ultimo.id)
+    antes = codificar_cursor(ANTERIOR, campo, getattr(primero, campo), primero.id)
+    if direccion == SIGUIENTE:
+        siguiente = despues if hay_mas else None
+        anterior = antes if cursor is not None else None
+    else:
+        siguiente = despues
+        anterior = antes if hay_mas else None
+
+    return PaginaPorClave(filas, siguiente=siguiente, anterior=anterior)
+
+
+def conteo_en_cache(queryset, clave, timeout=300):
+    """
+    Total de resultados guardado en la caché durante `timeout` segundos.
+    Es un valor aproximado (puede ir atrasado unos minutos), pero evita un
+    COUNT(*) por cada visita al catálogo.
+    """
+    clave_cache = _clave_conteo(clave)
+    total = cache.get(clave_cache)
+    if total is None:
+        total = queryset.count()
+        cache.set(clave_cache, total, timeout)
+    return total
+
+
+async def aconteo_en_cache(queryset, clave, timeout=300):
+    """Versión async de conteo_en_cache."""
+    clave_cache = _clave_conteo(clave)
+    total = await cache.aget(clave_cache)
+    if total is None:
+        total = (await queryset.aaggregate(total=Count('id')))['total']
+        await cache.aset(clave_cache, total, timeout)
+    return total
+
+
+def _clave_conteo(clave):
+    return 'catalogo:conteo:' + hashlib.md5(clave.encode('utf-8')).hexdigest()
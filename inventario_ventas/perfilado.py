@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+# Perfilado de SQL por request.
+# RegistroConsultas se engancha a cada conexión con execute_wrapper y anota
+# cada sentencia con su duración. PerfilSQLMiddleware lo usa en cada request
+# (si settings.PERFIL_SQL está activo) y deja el resultado en:
+#   - cabeceras X-SQL-Consultas, X-SQL-Tiempo-ms, X-SQL-Repetida
+#   - los últimos requests, visibles en /debug/sql/ (solo staff)
+# presupuesto_consultas() es el equivalente para tests: falla si un bloque
+# ejecuta más consultas de las permitidas y muestra cuáles fueron.
+
+NUM_LENTAS = 5
+NUM_REQUESTS_GUARDADOS = 100
+
+
+class RegistroConsultas:
+    def __init__(self):
+        self.consultas = []  # [(sql, segundos)]
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((sql, time.perf_counter() - inicio))
+
+    @contextmanager
+    def capturar(self):
+        # Las conexiones se abren bajo demanda: nos enganchamos a todas las configuradas
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(self))
+            yield self
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    @property
+    def tiempo_ms(self):
+        return sum(segundos for _, segundos in self.consultas) * 1000
+
+    def mas_lentas(self, n=NUM_LENTAS):
+        return sorted(self.consultas, key=lambda consulta: consulta[1], reverse=True)[:n]
+
+    def mas_repetida(self):
+        # El SQL llega con %s en vez de valores: la misma sentencia repetida N veces suele ser un N+1
+        if not self.consultas:
+            return None, 0
+        return Counter(sql for sql, _ in self.consultas).most_common(1)[0]
+
+    def resumen(self):
+        sql_repetida, veces = self.mas_repetida()
+        return {
+            'consultas': self.total,
+            'tiempo_ms': round(self.tiempo_ms, 2),
+            'mas_lentas': [{'sql': sql, 'ms': round(segundos * 1000, 2)} for sql, segundos in self.mas_lentas()],
+            'mas_repetida': {'sql': sql_repetida, 'veces': veces} if veces > 1 else None,
+        }
+
+
+# Últimos requests perfilados (por proceso), para la vista de depuración
+_recientes = deque(maxlen=NUM_REQUESTS_GUARDADOS)
+_candado = threading.Lock()
+
+
+def perfiles_recientes():
+    with _candado:
+        return list(reversed(_recientes))
+
+
+def perfil_activo():
+    return getattr(settings, 'PERFIL_SQL', settings.DEBUG)
+
+
+class PerfilSQLMiddleware:
+    """Mide las consultas de cada request. Va al principio de MIDDLEWARE para contar también las de sesión/auth."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not perfil_activo():
+            return self.get_response(request)
+
+        registro = RegistroConsultas()
+        with registro.capturar():
+            inicio = time.perf_counter()
+            response = self.get_response(request)
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+        return self._anotar(request, response, registro, duracion_ms)
+
+    async def __acall__(self, request):
+        if not perfil_activo():
+            return await self.get_response(request)
+
+        # Las consultas async corren en el hilo de sync_to_async del request y las
+        # conexiones son por hilo: el registro se engancha en ese hilo
+        registro = RegistroConsultas()
+        pila = await sync_to_async(self._enganchar)(registro)
+        try:
+            inicio = time.perf_counter()
+            response = await self.get_response(request)
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+        finally:
+            await sync_to_async(pila.close)()
+        return self._anotar(request, response, registro, duracion_ms)
+
+    @staticmethod
+    def _enganchar(registro):
+        pila = ExitStack()
+        pila.enter_context(registro.capturar())
+        return pila
+
+    def _anotar(self, request, response, registro, duracion_ms):
+        resumen = registro.resumen()
+        response['X-SQL-Consultas'] = str(resumen['consultas'])
+        response['X-SQL-Tiempo-ms'] = f"{resumen['tiempo_ms']:.2f}"
+        if resumen['mas_repetida']:
+            response['X-SQL-Repetida'] = str(resumen['mas_repetida']['veces'])
+
+        match = getattr(request, 'resolver_match', None)
+        with _candado:
+            _recientes.append({
+                'metodo': request.method,
+                'ruta': request.get_full_path(),
+                'vista': match.url_name if match else None,
+                'status': response.status_code,
+                'duracion_ms': round(duracion_ms, 2),
+                **resumen,
+            })
+        return response
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+@contextmanager
+def presupuesto_consultas(maximo, nombre=''):
+    """
+    Para tests: falla si el bloque ejecuta más de `maximo` consultas.
+        with presupuesto_consultas(3, 'catalogo_libros'):
+            self.client.get(reverse('catalogo_libros'))
+    """
+    registro = RegistroConsultas()
+    with registro.capturar():
+        yield registro
+    if registro.total > maximo:
+        detalle = '\n'.join(f"  {i}. {sql}" for i, (sql, _) in enumerate(registro.consultas, 1))
+        raise PresupuestoExcedido(
+            f"{nombre or 'Bloque'}: {registro.total} consultas (presupuesto: {maximo})\n{detalle}"
+        )
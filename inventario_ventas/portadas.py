@@ -0,0 +1,91 @@
+import hashlib
+import os
+
+from PIL import Image
+
+# Derivados de las portadas: varias anchuras en WebP y en JPEG (respaldo para
+# navegadores sin WebP). Se generan al subir una portada (señal de Libro), se
+# borran cuando ningún libro usa ya esa portada y se pueden reconstruir todos
+# con: python manage.py generar_portadas
+#
+# portadas/foo.png -> portadas/derivados/foo-200-<firma>.webp, portadas/derivados/foo-200-<firma>.jpg, ...
+#
+# La <firma> resume cómo se generó el derivado (formato, opciones y
+# VERSION_DERIVADOS): como se sirven con Cache-Control: immutable, cambiar la
+# calidad o el redimensionado debe cambiar el nombre. Después de un cambio así
+# hay que correr generar_portadas; mientras tanto se muestra el original.
+
+# 80px: miniatura del admin (se muestra a 50px), 200px: rejilla del catálogo,
+# 400px: página de detalle
+ANCHOS = (80, 200, 400)
+FORMATOS = (('webp', 'WEBP', {'quality': 80, 'method': 6}), ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}))
+CARPETA_DERIVADOS = 'derivados'
+# Subir al cambiar algo que no está en FORMATOS (p.ej. el filtro de _aplanar o de resize)
+VERSION_DERIVADOS = 1
+
+
+def firma_derivado(extension):
+    """8 caracteres hexadecimales que cambian si cambian las opciones del formato."""
+    formato, opciones = next((formato, opciones) for ext, formato, opciones in FORMATOS if ext == extension)
+    crudo = repr((VERSION_DERIVADOS, formato, sorted(opciones.items())))
+    return hashlib.sha256(crudo.encode()).hexdigest()[:8]
+
+
+def nombre_derivado(nombre, ancho, extension):
+    """Nombre (relativo a MEDIA_ROOT) del derivado de la portada `nombre`."""
+    carpeta, archivo = os.path.split(nombre)
+    base, _ = os.path.splitext(archivo)
+    derivado = f'{base}-{ancho}-{firma_derivado(extension)}.{extension}'
+    return '/'.join(parte for parte in (carpeta, CARPETA_DERIVADOS, derivado) if parte)
+
+
+def nombres_derivados(nombre):
+    return [nombre_derivado(nombre, ancho, extension) for ancho in ANCHOS for extension, _, _ in FORMATOS]
+
+
+def derivados_existen(media_root, nombre):
+    # Un solo stat: si existe el derivado más pequeño asumimos que existen todos
+    return os.path.exists(os.path.join(media_root, nombre_derivado(nombre, ANCHOS[0], FORMATOS[0][0])))
+
+
+def _aplanar(imagen):
+    """Convierte a RGB sobre fondo blanco (JPEG no admite transparencia)."""
+    if imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.split()[-1])
+        return fondo
+    return imagen.convert('RGB')
+
+
+def generar_derivados(media_root, nombre):
+    """
+    Genera todos los derivados de una portada. Trabaja solo con rutas del
+    sistema de archivos (sin ORM) para poder ejecutarse en otro proceso.
+    Devuelve el número de archivos escritos.
+    """
+    ruta_original = os.path.join(media_root, nombre)
+    escritos = 0
+    with Image.open(ruta_original) as original:
+        original.load()
+        imagen = _aplanar(original)
+
+    for ancho in ANCHOS:
+        copia = imagen.copy()
+        if copia.width > ancho:
+            alto = round(copia.height * ancho / copia.width)
+            copia = copia.resize((ancho, alto), Image.LANCZOS)
+        for extension, formato, opciones in FORMATOS:
+            destino = os.path.join(media_root, nombre_derivado(nombre, ancho, extension))
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            copia.save(destino, formato, **opciones)
+            escritos += 1
+    return escritos
+
+
+def eliminar_derivados(media_root, nombre):
+    for derivado in nombres_derivados(nombre):
+        try:
+            os.remove(os.path.join(media_root, derivado))
+        except FileNotFoundError:
+            pass
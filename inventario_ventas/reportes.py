@@ -0,0 +1,242 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum, Count, F, Value, DecimalField
+from django.db.models.functions import Coalesce, TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import (
+    Cliente, Venta, DetalleVenta, ResumenVentasDia, ResumenVentasHora,
+    ResumenStockLibro, VentasLibro, VentasLibroDia,
+)
+
+# Resúmenes de ventas pre-agregados (por día y por hora).
+# Cada Venta suma 1 venta y su precio_total a una "cubeta"
+# (periodo, tienda, vendedor, estado). Las señales de Venta mueven la venta
+# entre cubetas cuando cambia; el dashboard y los reportes leen de aquí.
+
+CERO = Decimal('0.00')
+
+
+def _cubetas(fecha_hora, id_tienda, id_staff, estado):
+    local = timezone.localtime(fecha_hora) if timezone.is_aware(fecha_hora) else fecha_hora
+    hora = local.replace(minute=0, second=0, microsecond=0)
+    return (
+        (ResumenVentasDia, {'fecha': local.date(), 'id_tienda': id_tienda, 'id_staff': id_staff, 'estado': estado}),
+        (ResumenVentasHora, {'hora': hora, 'id_tienda': id_tienda, 'id_staff': id_staff, 'estado': estado}),
+    )
+
+
+def aplicar_cambios(cambios):
+    """
+    `cambios`: lista de (fecha_hora, id_tienda, staff_id, estado, num_ventas, total).
+    Suma cada cambio en sus cubetas de día y hora con INSERT OR IGNORE + UPDATE,
+    sin leer las filas.
+    """
+    acumulado = defaultdict(lambda: [0, CERO])
+    for fecha_hora, id_tienda, staff_id, estado, num_ventas, total in cambios:
+        for modelo, clave in _cubetas(fecha_hora, id_tienda or 0, staff_id or 0, estado):
+            fila = acumulado[(modelo, tuple(clave.items()))]
+            fila[0] += num_ventas
+            fila[1] += Decimal(total or 0)
+
+    with transaction.atomic():
+        for (modelo, clave), (num_ventas, total) in acumulado.items():
+            if not num_ventas and not total:
+                continue
+            clave = dict(clave)
+            modelo.objects.bulk_create([modelo(**clave)], ignore_conflicts=True)
+            modelo.objects.filter(**clave).update(
+                num_ventas=F('num_ventas') + num_ventas,
+                total=F('total') + Value(total, output_field=DecimalField()),
+            )
+
+
+def total_vendido(desde, hasta=None, estados=None, **filtros):
+    """
+    Total y número de ventas desde la fecha `desde` (incluida) hasta `hasta`
+    (excluida), leído del resumen diario. `filtros` admite id_tienda / id_staff.
+    Las ventas de un día son total_vendido(dia, dia + timedelta(days=1)).
+    """
+    # Rango semiabierto [desde, hasta): lo mismo para fechas que para fechas/horas,
+    # y el índice sobre 'fecha' se recorre como un solo rango
+    consulta = ResumenVentasDia.objects.filter(fecha__gte=desde, **filtros)
+    if hasta is not None:
+        consulta = consulta.filter(fecha__lt=hasta)
+    if estados:
+        consulta = consulta.filter(estado__in=estados)
+    return consulta.aggregate(
+        total=Coalesce(Sum('total'), Value(CERO), output_field=DecimalField()),
+        num_ventas=Coalesce(Sum('num_ventas'), 0),
+    )
+
+
+def ventas_por_periodo(desde, hasta, por_hora=False, agrupar=('estado',)):
+    """
+    Serie de ventas por día (o por hora) en [desde, hasta), agrupada
+    además por los campos de `agrupar` (estado, id_tienda, id_staff).
+    """
+    if por_hora:
+        consulta = ResumenVentasHora.objects.filter(hora__gte=desde, hora__lt=hasta)
+        periodo = 'hora'
+    else:
+        consulta = ResumenVentasDia.objects.filter(fecha__gte=desde, fecha__lt=hasta)
+        periodo = 'fecha'
+    return (
+        consulta.values(periodo, *agrupar)
+        .annotate(num_ventas=Sum('num_ventas'), total=Sum('total'))
+        .order_by(periodo, *agrupar)
+    )
+
+
+# --- Libros más vendidos y bajo inventario ---
+
+def registrar_unidades_vendidas(unidades, fecha):
+    """
+    Suma `unidades` ({libro_id: unidades}, negativas al cancelar) al total
+    histórico y al del día `fecha`. Se llama al confirmar/cancelar una venta.
+    """
+    from .stock import _sumar_deltas  # stock.py importa este módulo
+
+    unidades = {libro_id: cantidad for libro_id, cantidad in unidades.items() if cantidad}
+    if not unidades:
+        return
+    with transaction.atomic():
+        VentasLibro.objects.bulk_create(
+            [VentasLibro(libro_id=libro_id) for libro_id in unidades], ignore_conflicts=True,
+        )
+        VentasLibroDia.objects.bulk_create(
+            [VentasLibroDia(libro_id=libro_id, fecha=fecha) for libro_id in unidades], ignore_conflicts=True,
+        )
+        # Un UPDATE ... CASE por tabla (por lote), no uno por libro
+        _sumar_deltas(VentasLibro, ('libro_id',), 'unidades', unidades)
+        _sumar_deltas(
+            VentasLibroDia, ('libro_id', 'fecha'), 'unidades',
+            {(libro_id, fecha): cantidad for libro_id, cantidad in unidades.items()},
+        )
+
+
+def libros_mas_vendidos(limite=10, dias=None):
+    """
+    Top de libros por unidades vendidas. Sin `dias` lee el total histórico
+    (índice sobre 'unidades'); con `dias` suma solo las filas diarias de la
+    ventana (últimos N días, hoy incluido).
+    Devuelve dicts con 'libro_id', 'libro__nombre' y 'cantidad_vendida'.
+    """
+    if dias is None:
+        consulta = VentasLibro.objects.filter(unidades__gt=0).annotate(cantidad_vendida=F('unidades'))
+    else:
+        hoy = timezone.localdate()
+        # Rango cerrado por los dos lados [desde, mañana): sin estadísticas (ANALYZE)
+        # SQLite solo prefiere el índice de fecha si el rango está acotado
+        consulta = (
+            VentasLibroDia.objects.filter(fecha__gte=hoy - timedelta(days=dias - 1), fecha__lt=hoy + timedelta(days=1))
+            .values('libro_id')
+            .annotate(cantidad_vendida=Sum('unidades'))
+            .filter(cantidad_vendida__gt=0)
+        )
+    return consulta.values('libro_id', 'libro__nombre', 'cantidad_vendida').order_by('-cantidad_vendida', 'libro_id')[:limite]
+
+
+def clientes_top(limite=5):
+    """
+    Clientes con mayor gasto (suma de precio_total de sus ventas). El GROUP BY
+    se resuelve con el índice (cliente, precio_total) de Venta, sin recorrer
+    la tabla de clientes; los clientes se traen después con un IN.
+    """
+    gastos = list(
+        Venta.objects.filter(cliente__isnull=False)
+        .values('cliente_id')
+        .annotate(gasto_total=Sum('precio_total'))
+        .order_by('-gasto_total', 'cliente_id')[:limite]
+    )
+    clientes = Cliente.objects.in_bulk(fila['cliente_id'] for fila in gastos)
+    top = []
+    for fila in gastos:
+        cliente = clientes[fila['cliente_id']]
+        cliente.gasto_total = fila['gasto_total']
+        top.append(cliente)
+    return top
+
+
+def umbral_bajo_stock():
+    return getattr(settings, 'INVENTARIO_UMBRAL_BAJO_STOCK', 20)
+
+
+def libros_bajo_stock(umbral=None, limite=50):
+    """Libros con stock total menor al umbral, del resumen de stock (índice sobre 'total')."""
+    umbral = umbral_bajo_stock() if umbral is None else umbral
+    return (
+        ResumenStockLibro.objects.filter(total__lt=umbral)
+        .order_by('total', 'libro_id')
+        .values('libro_id', nombre=F('libro__nombre'), total_stock=F('total'))[:limite]
+    )
+
+
+def contar_bajo_stock(umbral=None):
+    umbral = umbral_bajo_stock() if umbral is None else umbral
+    return ResumenStockLibro.objects.filter(total__lt=umbral).count()
+
+
+def reconstruir_resumen_ventas():
+    """
+    Recalcula los resúmenes de ventas (día/hora) desde Venta y los de libros
+    más vendidos desde las ventas confirmadas (GROUP BY en la BD).
+    Devuelve (filas_dia, filas_hora).
+    """
+    base = Venta.objects.annotate(
+        tienda=F('id_tienda'),
+        vendedor=Coalesce(F('staff_id'), 0),
+    )
+
+    def agregados(truncar):
+        return (
+            base.annotate(periodo=truncar)
+            .values('periodo', 'tienda', 'vendedor', 'estado')
+            .annotate(num=Count('id'), suma=Sum('precio_total'))
+            .order_by()
+            .iterator()
+        )
+
+    confirmadas = DetalleVenta.objects.filter(venta__estado='CONFIRMADA')
+
+    with transaction.atomic():
+        ResumenVentasDia.objects.all().delete()
+        ResumenVentasHora.objects.all().delete()
+        VentasLibro.objects.all().delete()
+        VentasLibroDia.objects.all().delete()
+        VentasLibro.objects.bulk_create(
+            (
+                VentasLibro(libro_id=fila['libro_id'], unidades=fila['unidades'])
+                for fila in confirmadas.values('libro_id').annotate(unidades=Sum('cantidad')).order_by().iterator()
+            ),
+            batch_size=1000,
+        )
+        VentasLibroDia.objects.bulk_create(
+            (
+                VentasLibroDia(libro_id=fila['libro_id'], fecha=fila['fecha'], unidades=fila['unidades'])
+                for fila in confirmadas.annotate(fecha=TruncDate('venta__fecha_hora'))
+                .values('libro_id', 'fecha').annotate(unidades=Sum('cantidad')).order_by().iterator()
+            ),
+            batch_size=1000,
+        )
+        dias = ResumenVentasDia.objects.bulk_create(
+            (
+                ResumenVentasDia(fecha=fila['periodo'], id_tienda=fila['tienda'], id_staff=fila['vendedor'],
+                                 estado=fila['estado'], num_ventas=fila['num'], total=fila['suma'] or CERO)
+                for fila in agregados(TruncDate('fecha_hora'))
+            ),
+            batch_size=1000,
+        )
+        horas = ResumenVentasHora.objects.bulk_create(
+            (
+                ResumenVentasHora(hora=fila['periodo'], id_tienda=fila['tienda'], id_staff=fila['vendedor'],
+                                  estado=fila['estado'], num_ventas=fila['num'], total=fila['suma'] or CERO)
+                for fila in agregados(TruncHour('fecha_hora'))
+            ),
+            batch_size=1000,
+        )
+    return len(dias), len(horas)
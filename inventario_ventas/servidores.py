@@ -0,0 +1,187 @@
+import asyncio
+import io
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+
+from .estres import percentil
+
+# Comparación WSGI / ASGI de las páginas de lectura (catálogo, detalle, carrito).
+# No hace falta un servidor instalado: se llama directamente a la aplicación
+# de Django (WSGIHandler en un pool de hilos, como gunicorn con gthread, o
+# ASGIHandler con tareas de asyncio, como uvicorn), así que se mide Django y
+# no el servidor. Cada modo corre en un proceso nuevo (spawn) para que la
+# memoria y los hilos sean solo suyos.
+#
+#   wsgi       vistas síncronas con WSGIHandler
+#   asgi       vistas async (CATALOGO_VISTAS_ASYNC) con ASGIHandler
+#   asgi_sync  vistas síncronas con ASGIHandler (cada una pasa por un hilo)
+
+MODOS = {
+    'wsgi': ('wsgi', False),
+    'asgi': ('asgi', True),
+    'asgi_sync': ('asgi', False),
+}
+HOST = 'testserver'
+
+
+def _partes(ruta):
+    partes = urlsplit(ruta)
+    return partes.path, partes.query
+
+
+# --- WSGI ---
+
+def _peticion_wsgi(aplicacion, ruta, cookie):
+    path, query = _partes(ruta)
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': HOST,
+        'REMOTE_ADDR': '127.0.0.1', 'HTTP_COOKIE': cookie,
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    estado = []
+    inicio = time.perf_counter()
+    cuerpo = aplicacion(environ, lambda status, cabeceras, exc_info=None: estado.append(int(status[:3])))
+    try:
+        b''.join(cuerpo)
+    finally:
+        cuerpo.close()
+    return estado[0], (time.perf_counter() - inicio) * 1000
+
+
+def _correr_wsgi(rutas, concurrencia, cookie):
+    from django.core.handlers.wsgi import WSGIHandler
+
+    aplicacion = WSGIHandler()
+
+    def peticion(ruta):
+        # Cada hilo abre su conexión y la reutiliza (CONN_MAX_AGE), como un servidor con hilos
+        return _peticion_wsgi(aplicacion, ruta, cookie)
+
+    for ruta in dict.fromkeys(rutas):  # Calentamiento (plantillas, conexiones, caché)
+        _peticion_wsgi(aplicacion, ruta, cookie)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concurrencia) as pool:
+        resultados = list(pool.map(peticion, rutas))
+    return resultados, time.perf_counter() - inicio
+
+
+# --- ASGI ---
+
+async def _peticion_asgi(aplicacion, ruta, cookie):
+    path, query = _partes(ruta)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', HOST.encode()), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000), 'server': (HOST, 80),
+    }
+    enviado = False
+
+    async def receive():
+        nonlocal enviado
+        if not enviado:
+            enviado = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Django escucha una desconexión mientras responde: el cliente nunca se va
+        await asyncio.Future()
+
+    estado = []
+
+    async def send(mensaje):
+        if mensaje['type'] == 'http.response.start':
+            estado.append(mensaje['status'])
+
+    inicio = time.perf_counter()
+    await aplicacion(scope, receive, send)
+    return estado[0], (time.perf_counter() - inicio) * 1000
+
+
+def _correr_asgi(rutas, concurrencia, cookie):
+    from django.core.handlers.asgi import ASGIHandler
+
+    aplicacion = ASGIHandler()
+
+    async def principal():
+        for ruta in dict.fromkeys(rutas):
+            await _peticion_asgi(aplicacion, ruta, cookie)
+        pendientes = iter(enumerate(rutas))
+        resultados = [None] * len(rutas)
+
+        async def trabajador():
+            # Como un servidor ASGI: `concurrencia` peticiones abiertas a la vez
+            for numero, ruta in pendientes:
+                resultados[numero] = await _peticion_asgi(aplicacion, ruta, cookie)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        return resultados, time.perf_counter() - inicio
+
+    return asyncio.run(principal())
+
+
+# --- Proceso de cada modo ---
+
+class _ContadorHilos(threading.Thread):
+    """Anota el máximo de hilos vivos mientras corre la prueba."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.maximo = threading.active_count()
+        self.parar = threading.Event()
+
+    def run(self):
+        while not self.parar.wait(0.01):
+            self.maximo = max(self.maximo, threading.active_count())
+
+
+def _memoria_mb():
+    # ru_maxrss viene en KiB en Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def medir_modo(archivo_bd, modo, rutas, concurrencia, cookie, sin_cache):
+    """
+    Punto de entrada del proceso hijo (pool con initializer=django.setup).
+    Las URLs se importan después de fijar CATALOGO_VISTAS_ASYNC.
+    """
+    from django.test.utils import setup_test_environment
+
+    interfaz, vistas_async = MODOS[modo]
+    setup_test_environment()  # DEBUG=False y 'testserver' en ALLOWED_HOSTS
+    connections['default'].settings_dict['NAME'] = archivo_bd
+    settings.PERFIL_SQL = False
+    settings.CATALOGO_VISTAS_ASYNC = vistas_async
+    if sin_cache:
+        settings.CATALOGO_CACHE_SEGUNDOS = 0  # cada visita consulta la BD y renderiza
+
+    memoria_inicial = _memoria_mb()
+    contador = _ContadorHilos()
+    contador.start()
+    correr = _correr_wsgi if interfaz == 'wsgi' else _correr_asgi
+    try:
+        resultados, segundos = correr(rutas, concurrencia, cookie)
+    finally:
+        contador.parar.set()
+        contador.join()
+
+    tiempos = [ms for _, ms in resultados]
+    return {
+        'modo': modo,
+        'peticiones': len(resultados),
+        'errores': sum(1 for estado, _ in resultados if estado >= 400),
+        'segundos': round(segundos, 3),
+        'peticiones_por_segundo': round(len(resultados) / segundos, 1),
+        'ms_p50': round(percentil(tiempos, 50), 2),
+        'ms_p99': round(percentil(tiempos, 99), 2),
+        'memoria_inicial_mb': memoria_inicial,
+        'memoria_max_mb': _memoria_mb(),
+        'hilos_max': contador.maximo,
+    }
@@ -0,0 +1,69 @@
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends import db
+from django.utils import timezone
+
+from .almacen_carrito import edad_cookie
+from .basedatos import escritura_serializada
+from .models import LineaCarrito
+
+# Barrido incremental de datos vencidos. `clearsessions` de Django borra todas
+# las sesiones expiradas con un solo DELETE, que en SQLite bloquea la base
+# entera mientras dura. Aquí se borra en lotes pequeños (cada uno en su propia
+# transacción corta, con autocommit) y con una pausa entre lotes para que los
+# requests que esperan el bloqueo de escritura puedan pasar.
+
+TAMANO_LOTE = 500
+
+
+class SessionStore(db.SessionStore):
+    """
+    Sesiones en la BD (SESSION_ENGINE = 'inventario_ventas.sesiones') con las
+    escrituras en la misma fila que el checkout (ver basedatos.py): guardar la
+    sesión es la escritura más frecuente y, sin fila, compite con las demás
+    por el candado de SQLite.
+    """
+    save = escritura_serializada(db.SessionStore.save)
+    delete = escritura_serializada(db.SessionStore.delete)
+
+
+def modelo_sesion():
+    """Modelo de sesiones del SESSION_ENGINE actual, o None si no usa la BD."""
+    engine = import_module(settings.SESSION_ENGINE)
+    obtener = getattr(engine.SessionStore, 'get_model_class', None)
+    return obtener() if obtener else None
+
+
+def _borrar_en_lotes(consulta, campo, lote, pausa, maximo):
+    borradas = 0
+    while maximo is None or borradas < maximo:
+        tamano = lote if maximo is None else min(lote, maximo - borradas)
+        claves = list(consulta.order_by().values_list(campo, flat=True)[:tamano])
+        if not claves:
+            break
+        n, _ = consulta.model.objects.filter(**{f'{campo}__in': claves}).delete()
+        borradas += n
+        if len(claves) < tamano:
+            break
+        if pausa:
+            time.sleep(pausa)
+    return borradas
+
+
+def barrer_sesiones_expiradas(lote=TAMANO_LOTE, pausa=0.05, maximo=None):
+    """Borra sesiones con expire_date vencida. Devuelve cuántas se borraron."""
+    modelo = modelo_sesion()
+    if modelo is None:
+        return 0
+    vencidas = modelo.objects.filter(expire_date__lt=timezone.now())
+    return _borrar_en_lotes(vencidas, 'pk', lote, pausa, maximo)
+
+
+def barrer_carritos_abandonados(lote=TAMANO_LOTE, pausa=0.05, maximo=None):
+    """Borra líneas de carrito (almacén 'tabla') sin cambios desde que venció su cookie."""
+    limite = timezone.now() - timedelta(seconds=edad_cookie())
+    abandonadas = LineaCarrito.objects.filter(actualizado__lt=limite)
+    return _borrar_en_lotes(abandonadas, 'id', lote, pausa, maximo)
@@ -0,0 +1,166 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.db.models import QuerySet
+from django.dispatch import receiver
+
+from .models import Stock, Libro, Editorial, Bodega, MovimientoInventario, Venta, ResumenStockLibro
+from .stock import aplicar_deltas_resumen, registrar_movimientos
+from .busqueda import indexar_libros, desindexar_libro
+from .reportes import aplicar_cambios
+from .portadas import generar_derivados, derivados_existen, eliminar_derivados
+from .cache_catalogo import invalidar_catalogo
+
+logger = logging.getLogger(__name__)
+
+
+# --- Libro mayor y resúmenes de stock ---
+# Un cambio hecho directamente sobre Stock (admin, shell) ya está escrito en la
+# tabla: solo lo anotamos en el libro mayor y propagamos el delta a los resúmenes.
+
+def _movimientos_por_delta(deltas, tipo):
+    return [
+        MovimientoInventario(libro_id=libro_id, bodega_id=bodega_id, tipo=tipo, cantidad=delta)
+        for (libro_id, bodega_id), delta in deltas.items()
+    ]
+
+
+@receiver(post_save, sender=Stock)
+def stock_guardado(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        # loaddata: los resúmenes se reconstruyen con el comando de gestión
+        return
+
+    deltas = {}
+    original = None if created else getattr(instance, '_original', None)
+    if original is not None:
+        libro_id, bodega_id, cantidad = original
+        deltas[(libro_id, bodega_id)] = -(cantidad or 0)
+    elif not created:
+        # Instancia sin valores originales (p.ej. construida a mano con pk):
+        # no podemos calcular el delta con seguridad.
+        return
+
+    clave = (instance.libro_id, instance.bodega_id)
+    deltas[clave] = deltas.get(clave, 0) + instance.cantidad
+    registrar_movimientos(_movimientos_por_delta(deltas, 'ENTRADA' if created else 'AJUSTE'), actualizar_stock=False)
+
+    instance._original = (instance.libro_id, instance.bodega_id, instance.cantidad)
+
+
+@receiver(post_delete, sender=Stock)
+def stock_eliminado(sender, instance, origin=None, **kwargs):
+    libro_id, bodega_id, cantidad = getattr(
+        instance, '_original', (instance.libro_id, instance.bodega_id, instance.cantidad)
+    )
+    deltas = {(libro_id, bodega_id): -(cantidad or 0)}
+
+    modelo_origen = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if modelo_origen in (Libro, Bodega):
+        # Borrado en cascada: el libro/bodega (y su historial) también desaparece
+        aplicar_deltas_resumen(deltas)
+    else:
+        registrar_movimientos(_movimientos_por_delta(deltas, 'AJUSTE'), actualizar_stock=False)
+
+
+# --- Sincronización del índice de búsqueda (FTS5) ---
+
+@receiver(post_save, sender=Libro)
+def libro_guardado(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        # Fila de resumen en 0 para que el libro aparezca en "bajo inventario"
+        ResumenStockLibro.objects.bulk_create([ResumenStockLibro(libro=instance, total=0)], ignore_conflicts=True)
+    indexar_libros([instance.pk])
+
+    # Portada nueva o reemplazada: generamos miniaturas y WebP (salvo que ya
+    # existan porque la misma imagen se subió antes para otro libro) y
+    # borramos los de la portada anterior si ya nadie la usa
+    portada = instance.portada
+    anterior = getattr(instance, '_portada_original', None)
+    if (portada.name or None) != (anterior or None):
+        if portada and not derivados_existen(portada.storage.location, portada.name):
+            try:
+                generar_derivados(portada.storage.location, portada.name)
+            except OSError:
+                logger.exception("No se pudieron generar los derivados de %s", portada.name)
+        if anterior:
+            _borrar_derivados_sin_uso(anterior)
+        instance._portada_original = portada.name
+
+
+@receiver(post_delete, sender=Libro)
+def libro_eliminado(sender, instance, **kwargs):
+    desindexar_libro(instance.pk)
+    if instance.portada:
+        _borrar_derivados_sin_uso(instance.portada.name)
+
+
+def _borrar_derivados_sin_uso(nombre):
+    # Después del commit: si la transacción se deshace, la portada sigue en uso.
+    # Los archivos se comparten entre libros con la misma imagen (el nombre es
+    # el hash del contenido), así que solo se borran si ningún libro la usa.
+    ubicacion = Libro._meta.get_field('portada').storage.location
+
+    def borrar():
+        if not Libro.objects.filter(portada=nombre).exists():
+            eliminar_derivados(ubicacion, nombre)
+    transaction.on_commit(borrar)
+
+
+@receiver(post_save, sender=Editorial)
+def editorial_guardada(sender, instance, created, raw=False, **kwargs):
+    # El nombre de la editorial forma parte del documento indexado
+    if raw or created:
+        return
+    indexar_libros(instance.libro_set.values_list('id', flat=True))
+
+
+# --- Caché de páginas del catálogo ---
+# Los cambios de stock invalidan desde stock.aplicar_deltas_resumen (por ahí
+# pasan el admin, las ventas y las cargas en bloque).
+
+@receiver(post_save, sender=Libro)
+@receiver(post_delete, sender=Libro)
+@receiver(post_save, sender=Editorial)
+@receiver(post_delete, sender=Editorial)
+def catalogo_modificado(sender, **kwargs):
+    invalidar_catalogo()
+
+
+# --- Resúmenes de ventas (día/hora) ---
+
+@receiver(post_save, sender=Venta)
+def venta_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    actual = (instance.fecha_hora, instance.staff_id, instance.id_tienda, instance.estado, instance.precio_total)
+    original = None if created else getattr(instance, '_original', None)
+    if original == actual:
+        return
+
+    cambios = []
+    if original is not None:
+        # Sacamos la venta de su cubeta anterior (con la tienda que tenía, no la actual del staff)
+        fecha_hora, staff_id, id_tienda, estado, precio_total = original
+        cambios.append((fecha_hora, id_tienda, staff_id, estado, -1, -(precio_total or 0)))
+    elif not created:
+        # Sin valores originales no sabemos de qué cubeta salió
+        return
+    fecha_hora, staff_id, id_tienda, estado, precio_total = actual
+    cambios.append((fecha_hora, id_tienda, staff_id, estado, 1, precio_total or 0))
+    aplicar_cambios(cambios)
+
+    instance._original = actual
+
+
+@receiver(post_delete, sender=Venta)
+def venta_eliminada(sender, instance, **kwargs):
+    fecha_hora, staff_id, id_tienda, estado, precio_total = getattr(
+        instance, '_original',
+        (instance.fecha_hora, instance.staff_id, instance.id_tienda, instance.estado, instance.precio_total),
+    )
+    aplicar_cambios([(fecha_hora, id_tienda, staff_id, estado, -1, -(precio_total or 0))])
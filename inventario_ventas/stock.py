@@ -0,0 +1,252 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Sum, F, Q, Case, When, Value, IntegerField, Max
+
+from .models import (
+    Libro, Stock, ResumenStockLibro, ResumenStockBodega,
+    MovimientoInventario, SnapshotInventario,
+)
+from .asignacion import asignar_venta
+from .reportes import registrar_unidades_vendidas
+from .cache_catalogo import invalidar_catalogo
+from .basedatos import escritura_serializada
+
+# Máximo de claves por sentencia UPDATE ... CASE (SQLite limita la
+# profundidad de las expresiones a 1000 y el OR se anida en el parser).
+TAMANO_LOTE = 200
+# Claves por WHERE ... IN (...) (por debajo del límite de variables de SQLite)
+TAMANO_LOTE_IN = 5000
+
+
+def _sumar_deltas(modelo, campos_clave, campo, deltas):
+    """
+    Suma `deltas` ({clave: delta}) a `campo` con un UPDATE por lote:
+    UPDATE ... SET campo = campo + CASE WHEN clave=... THEN delta ... END
+    No lee las filas antes (no hay lectura-modificación-escritura).
+    """
+    claves = [clave for clave, delta in deltas.items() if delta]
+    if len(campos_clave) == 1 and len(claves) > TAMANO_LOTE:
+        # Cargas en bloque (miles de claves): armar el CASE cuesta más que la
+        # sentencia. Un UPDATE ... WHERE clave IN (...) por cada valor de delta
+        # (en una carga se repiten mucho).
+        por_delta = defaultdict(list)
+        for clave in claves:
+            por_delta[deltas[clave]].append(clave)
+        for delta, grupo in por_delta.items():
+            for inicio in range(0, len(grupo), TAMANO_LOTE_IN):
+                modelo.objects.filter(**{f'{campos_clave[0]}__in': grupo[inicio:inicio + TAMANO_LOTE_IN]}).update(
+                    **{campo: F(campo) + delta}
+                )
+        return
+    for inicio in range(0, len(claves), TAMANO_LOTE):
+        filtro = Q()
+        condiciones = []
+        for clave in claves[inicio:inicio + TAMANO_LOTE]:
+            valores = clave if isinstance(clave, tuple) else (clave,)
+            condicion = Q(**dict(zip(campos_clave, valores)))
+            filtro |= condicion
+            condiciones.append(When(condicion, then=Value(deltas[clave])))
+        modelo.objects.filter(filtro).update(**{
+            campo: F(campo) + Case(*condiciones, default=Value(0), output_field=IntegerField())
+        })
+
+
+def aplicar_deltas_resumen(deltas):
+    """
+    Aplica cambios de stock a las tablas de resumen.
+    `deltas` es un dict {(libro_id, bodega_id): cantidad_a_sumar}.
+    Solo se crean filas nuevas para deltas positivos: un delta negativo sin
+    fila ocurre al borrar en cascada un Libro/Bodega, cuyo resumen ya se fue.
+    """
+    por_libro = defaultdict(int)
+    por_bodega = defaultdict(int)
+    for (libro_id, bodega_id), delta in deltas.items():
+        por_libro[libro_id] += delta
+        por_bodega[bodega_id] += delta
+
+    with transaction.atomic():
+        # INSERT OR IGNORE de las filas que falten, luego un UPDATE por lote
+        ResumenStockLibro.objects.bulk_create(
+            [ResumenStockLibro(libro_id=libro_id, total=0) for libro_id, delta in por_libro.items() if delta > 0],
+            ignore_conflicts=True,
+        )
+        ResumenStockBodega.objects.bulk_create(
+            [ResumenStockBodega(bodega_id=bodega_id, total=0) for bodega_id, delta in por_bodega.items() if delta > 0],
+            ignore_conflicts=True,
+        )
+        _sumar_deltas(ResumenStockLibro, ('libro_id',), 'total', por_libro)
+        _sumar_deltas(ResumenStockBodega, ('bodega_id',), 'total', por_bodega)
+        if any(por_libro.values()):
+            invalidar_catalogo()
+
+
+def reconstruir_resumenes():
+    """
+    Recalcula por completo los resúmenes a partir de la tabla Stock.
+    Útil después de cargas masivas (bulk_create/update no disparan señales).
+    Devuelve (num_libros, num_bodegas).
+    """
+    # Todos los libros, incluso sin filas de Stock (total 0 -> lista de bajo inventario)
+    totales_libro = Libro.objects.values(libro_id=F('id')).annotate(total=Sum('stock__cantidad')).order_by()
+    totales_bodega = Stock.objects.values('bodega_id').annotate(total=Sum('cantidad')).order_by()
+
+    with transaction.atomic():
+        ResumenStockLibro.objects.all().delete()
+        ResumenStockBodega.objects.all().delete()
+        libros = ResumenStockLibro.objects.bulk_create(
+            ResumenStockLibro(libro_id=fila['libro_id'], total=fila['total'] or 0)
+            for fila in totales_libro
+        )
+        bodegas = ResumenStockBodega.objects.bulk_create(
+            ResumenStockBodega(bodega_id=fila['bodega_id'], total=fila['total'] or 0)
+            for fila in totales_bodega
+        )
+        invalidar_catalogo()
+    return len(libros), len(bodegas)
+
+
+# --- Libro mayor de inventario ---
+
+def registrar_movimientos(movimientos, actualizar_stock=True):
+    """
+    Inserta en bloque una lista de MovimientoInventario (sin guardar) y
+    propaga sus deltas a Stock y a los resúmenes.
+    `actualizar_stock=False` se usa cuando el cambio ya se escribió en Stock
+    (p.ej. un guardado desde el admin) y solo falta dejarlo en el registro.
+    """
+    movimientos = [movimiento for movimiento in movimientos if movimiento.cantidad]
+    if not movimientos:
+        return []
+
+    deltas = defaultdict(int)
+    for movimiento in movimientos:
+        deltas[(movimiento.libro_id, movimiento.bodega_id)] += movimiento.cantidad
+
+    _guardar_movimientos(movimientos, deltas, actualizar_stock)
+    return movimientos
+
+
+@escritura_serializada
+def _guardar_movimientos(movimientos, deltas, actualizar_stock):
+    # Separado de registrar_movimientos para que un reintento reciba la lista ya armada
+    with transaction.atomic():
+        MovimientoInventario.objects.bulk_create(movimientos)
+        if actualizar_stock:
+            # bulk_create/update no disparan las señales de Stock a propósito:
+            # los resúmenes se actualizan una sola vez más abajo.
+            Stock.objects.bulk_create(
+                [Stock(libro_id=libro_id, bodega_id=bodega_id, cantidad=0) for libro_id, bodega_id in deltas],
+                ignore_conflicts=True,
+            )
+            _sumar_deltas(Stock, ('libro_id', 'bodega_id'), 'cantidad', deltas)
+        aplicar_deltas_resumen(deltas)
+
+
+def registrar_venta_confirmada(venta, politica=None):
+    """
+    Descuenta del inventario todas las líneas de la venta (movimientos VENTA).
+    Las bodegas las elige el motor de asignación; lanza StockInsuficiente
+    si la orden no se puede surtir.
+    """
+    asignaciones = asignar_venta(venta, politica)
+    movimientos = registrar_movimientos(
+        MovimientoInventario(
+            libro_id=libro_id, bodega_id=bodega_id, venta=venta,
+            tipo='VENTA', cantidad=-cantidad,
+        )
+        for libro_id, bodega_id, cantidad in asignaciones
+    )
+    _actualizar_mas_vendidos(venta, movimientos)
+    return movimientos
+
+
+def _actualizar_mas_vendidos(venta, movimientos):
+    # Un movimiento VENTA de -3 son 3 unidades vendidas; una CANCELACION de +3 las resta
+    unidades = defaultdict(int)
+    for movimiento in movimientos:
+        unidades[movimiento.libro_id] -= movimiento.cantidad
+    registrar_unidades_vendidas(unidades, timezone.localtime(venta.fecha_hora).date())
+
+
+def registrar_venta_cancelada(venta):
+    """Revierte lo que la venta descontó, bodega por bodega (movimientos CANCELACION)."""
+    pendientes = (
+        MovimientoInventario.objects
+        .filter(venta=venta, tipo__in=('VENTA', 'CANCELACION'))
+        .values('libro_id', 'bodega_id')
+        .annotate(neto=Sum('cantidad'))
+        .order_by()
+    )
+    movimientos = registrar_movimientos(
+        MovimientoInventario(
+            libro_id=fila['libro_id'], bodega_id=fila['bodega_id'], venta=venta,
+            tipo='CANCELACION', cantidad=-fila['neto'],
+        )
+        for fila in pendientes
+    )
+    _actualizar_mas_vendidos(venta, movimientos)
+    return movimientos
+
+
+def ultima_generacion():
+    """Id de movimiento hasta el que llega la última generación de snapshots (0 si no hay)."""
+    return SnapshotInventario.objects.aggregate(ultima=Max('hasta_movimiento'))['ultima'] or 0
+
+
+def stock_segun_libro_mayor(libro_id, bodega_id=None):
+    """Stock calculado como último snapshot + movimientos posteriores."""
+    generacion = ultima_generacion()
+    snapshots = SnapshotInventario.objects.filter(hasta_movimiento=generacion, libro_id=libro_id)
+    movimientos = MovimientoInventario.objects.filter(libro_id=libro_id, id__gt=generacion)
+    if bodega_id is not None:
+        snapshots = snapshots.filter(bodega_id=bodega_id)
+        movimientos = movimientos.filter(bodega_id=bodega_id)
+    base = snapshots.aggregate(total=Sum('cantidad'))['total'] or 0
+    return base + (movimientos.aggregate(total=Sum('cantidad'))['total'] or 0)
+
+
+def compactar_libro_mayor(purgar=False):
+    """
+    Escribe una nueva generación de snapshots (generación anterior + movimientos
+    desde entonces). Con `purgar=True` borra los movimientos y snapshots que
+    quedan cubiertos por la nueva generación, salvo los de ventas CONFIRMADAS:
+    registrar_venta_cancelada arma la devolución con ellos.
+    Devuelve (hasta_movimiento, num_snapshots, num_movimientos_purgados).
+    """
+    with transaction.atomic():
+        anterior = ultima_generacion()
+        hasta = MovimientoInventario.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+        if hasta <= anterior:
+            return anterior, 0, 0
+
+        acumulado = defaultdict(int)
+        for fila in SnapshotInventario.objects.filter(hasta_movimiento=anterior).values('libro_id', 'bodega_id', 'cantidad'):
+            acumulado[(fila['libro_id'], fila['bodega_id'])] += fila['cantidad']
+        nuevos = (
+            MovimientoInventario.objects
+            .filter(id__gt=anterior, id__lte=hasta)
+            .values('libro_id', 'bodega_id')
+            .annotate(neto=Sum('cantidad'))
+            .order_by()
+        )
+        for fila in nuevos:
+            acumulado[(fila['libro_id'], fila['bodega_id'])] += fila['neto']
+
+        snapshots = SnapshotInventario.objects.bulk_create(
+            (
+                SnapshotInventario(libro_id=libro_id, bodega_id=bodega_id, cantidad=cantidad, hasta_movimiento=hasta)
+                for (libro_id, bodega_id), cantidad in acumulado.items()
+            ),
+            batch_size=1000,
+        )
+
+        purgados = 0
+        if purgar:
+            # Los que se quedan tienen id <= hasta: ya están en el snapshot y no se cuentan dos veces
+            purgados, _ = (
+                MovimientoInventario.objects.filter(id__lte=hasta).exclude(venta__estado='CONFIRMADA').delete()
+            )
+            SnapshotInventario.objects.filter(hasta_movimiento__lt=hasta).delete()
+    return hasta, len(snapshots), purgados
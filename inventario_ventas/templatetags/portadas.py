@@ -0,0 +1,51 @@
+from django import template
+from django.utils.html import format_html
+
+from ..portadas import ANCHOS, nombre_derivado, derivados_existen
+
+register = template.Library()
+
+
+def _derivados_disponibles(portada):
+    return derivados_existen(portada.storage.location, portada.name)
+
+
+def _srcset(portada, extension, anchos):
+    return ', '.join(
+        f"{portada.storage.url(nombre_derivado(portada.name, ancho, extension))} {ancho}w"
+        for ancho in anchos
+    )
+
+
+@register.simple_tag
+def portada_img(portada, alt='', clase='', sizes='200px', max_ancho=None):
+    """
+    <picture> con srcset en WebP y JPEG para una portada.
+    Si aún no hay derivados, devuelve el <img> con el original.
+    `max_ancho` limita los anchos ofrecidos (p.ej. 80 para miniaturas).
+    """
+    if not portada:
+        return ''
+    if not _derivados_disponibles(portada):
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', portada.url, alt, clase)
+
+    anchos = [ancho for ancho in ANCHOS if max_ancho is None or ancho <= int(max_ancho)] or [ANCHOS[0]]
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(portada, 'webp', anchos), sizes,
+        portada.storage.url(nombre_derivado(portada.name, anchos[-1], 'jpg')),
+        _srcset(portada, 'jpg', anchos), sizes, alt, clase,
+    )
+
+
+@register.simple_tag
+def portada_miniatura_url(portada, ancho=ANCHOS[0], extension='webp'):
+    """URL de un derivado concreto (o del original si no hay derivados)."""
+    if not portada:
+        return ''
+    if not _derivados_disponibles(portada):
+        return portada.url
+    return portada.storage.url(nombre_derivado(portada.name, int(ancho), extension))
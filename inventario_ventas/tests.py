@@ -1,3 +1,1529 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import importlib
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, OperationalError
+from django.http import Http404
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from .models import (
+    Editorial, Bodega, Libro, Stock, Venta, DetalleVenta, MovimientoInventario,
+    Staff, Cliente, ResumenStockLibro, ResumenStockBodega, ResumenVentasDia, VentasLibroDia, Tienda, LineaCarrito,
+    SnapshotInventario,
+)
+from .asignacion import asignar, StockInsuficiente
+from .basedatos import configurar_conexion, escritura_serializada
+from .busqueda import TABLA_FTS, filtrar_por_busqueda
+from .cache_catalogo import MARCADOR_CSRF, version_catalogo
+from .datos_sinteticos import generar
+from . import estres
+from .dinero import Dinero
+from .importacion import importar
+from .paginacion import codificar_cursor, paginar_por_clave
+from .perfilado import presupuesto_consultas, PresupuestoExcedido
+from .reportes import libros_mas_vendidos, libros_bajo_stock, contar_bajo_stock
+from .almacen_carrito import ALMACENES, CLAVE_SESION, nombre_cookie
+from .almacenamiento import es_nombre_inmutable
+from .sesiones import barrer_sesiones_expiradas, barrer_carritos_abandonados
+from .portadas import derivados_existen, nombres_derivados, nombre_derivado
+from .stock import compactar_libro_mayor, stock_segun_libro_mayor
+from .views import (
+    CatalogoLibrosView, CatalogoLibrosAsyncView, DetalleLibroPublicoAsyncView, carrito_detail_async, servir_media,
+)
+from libreria_project import urls as urls_proyecto
+
+
+class AsignacionTests(TestCase):
+    """Motor de asignación de bodegas (asignacion.py)."""
+
+    def test_menos_bodegas_prefiere_una_bodega_que_cubre_todo(self):
+        lineas = {1: 2, 2: 3}
+        candidatos = {
+            1: [(10, 5), (20, 2)],
+            2: [(10, 1), (20, 3)],
+        }
+        asignaciones = asignar(lineas, candidatos, 'menos_bodegas')
+        self.assertEqual({bodega_id for _, bodega_id, _ in asignaciones}, {20})
+        self.assertEqual(sorted(asignaciones), [(1, 20, 2), (2, 20, 3)])
+
+    def test_mayor_primero_vacia_la_bodega_con_mas_stock(self):
+        asignaciones = asignar({1: 6}, {1: [(10, 2), (20, 5)]}, 'mayor_primero')
+        self.assertEqual(asignaciones, [(1, 20, 5), (1, 10, 1)])
+
+    def test_principal_primero(self):
+        asignaciones = asignar({1: 3}, {1: [(10, 2), (20, 5)]}, 'principal_primero', bodega_principal=10)
+        self.assertEqual(asignaciones, [(1, 10, 2), (1, 20, 1)])
+
+    def test_stock_insuficiente(self):
+        for politica in ('menos_bodegas', 'mayor_primero', 'principal_primero'):
+            with self.assertRaises(StockInsuficiente) as contexto:
+                asignar({1: 4, 2: 1}, {1: [(10, 3)]}, politica)
+            self.assertEqual(contexto.exception.faltantes, {1: 1, 2: 1})
+
+    def test_politica_desconocida(self):
+        with self.assertRaises(ValueError):
+            asignar({1: 1}, {1: [(10, 1)]}, 'al_azar')
+
+
+class ConfirmacionVentaTests(TestCase):
+    """Confirmar/cancelar una Venta descuenta y devuelve stock entre varias bodegas."""
+
+    def setUp(self):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        self.libro = Libro.objects.create(editorial=editorial, nombre="Libro", autor="Autor", costo=10, precio_venta=20)
+        self.bodega_a = Bodega.objects.create(nota="A")
+        self.bodega_b = Bodega.objects.create(nota="B")
+        Stock.objects.create(libro=self.libro, bodega=self.bodega_a, cantidad=2)
+        Stock.objects.create(libro=self.libro, bodega=self.bodega_b, cantidad=3)
+        self.venta = Venta.objects.create(precio_total=80)
+        DetalleVenta.objects.create(venta=self.venta, libro=self.libro, cantidad=4, precio=20)
+
+    def _stock(self, bodega):
+        return Stock.objects.get(libro=self.libro, bodega=bodega).cantidad
+
+    def test_confirmar_y_cancelar(self):
+        self.venta.estado = 'CONFIRMADA'
+        with self.settings(INVENTARIO_POLITICA_ASIGNACION='mayor_primero'):
+            self.venta.save()
+
+        self.assertEqual(self._stock(self.bodega_a), 1)
+        self.assertEqual(self._stock(self.bodega_b), 0)
+        self.assertEqual(Libro.objects.get(pk=self.libro.pk).stock_total, 1)
+        self.assertEqual(MovimientoInventario.objects.filter(venta=self.venta, tipo='VENTA').count(), 2)
+
+        self.venta.estado = 'CANCELADA'
+        self.venta.save()
+        self.assertEqual(self._stock(self.bodega_a), 2)
+        self.assertEqual(self._stock(self.bodega_b), 3)
+        self.assertEqual(Libro.objects.get(pk=self.libro.pk).stock_total, 5)
+
+    def test_cancelar_despues_de_purgar_el_libro_mayor(self):
+        self.venta.estado = 'CONFIRMADA'
+        self.venta.save()
+        compactar_libro_mayor(purgar=True)
+        self.assertEqual(MovimientoInventario.objects.filter(venta=self.venta, tipo='VENTA').count(), 2)
+
+        self.venta.estado = 'CANCELADA'
+        self.venta.save()
+        self.assertEqual(self._stock(self.bodega_a) + self._stock(self.bodega_b), 5)
+        self.assertEqual(Libro.objects.get(pk=self.libro.pk).stock_total, 5)
+        self.assertEqual(stock_segun_libro_mayor(self.libro.pk), 5)
+
+    def test_confirmar_sin_stock_no_cambia_nada(self):
+        DetalleVenta.objects.create(venta=self.venta, libro=self.libro, cantidad=2, precio=20)
+        self.venta.estado = 'CONFIRMADA'
+        with self.assertRaises(StockInsuficiente):
+            self.venta.save()
+        self.assertEqual(Venta.objects.get(pk=self.venta.pk).estado, 'PENDIENTE')
+        self.assertEqual(self._stock(self.bodega_a) + self._stock(self.bodega_b), 5)
+
+        # Como hace el admin: se guarda de nuevo con el estado anterior
+        self.venta.estado = 'PENDIENTE'
+        self.venta.save()
+        self.assertEqual(
+            list(ResumenVentasDia.objects.filter(num_ventas__gt=0).values_list('estado', 'num_ventas')),
+            [('PENDIENTE', 1)],
+        )
+        self.assertFalse(ResumenVentasDia.objects.exclude(num_ventas__gte=0).exists())
+
+
+class LibroMayorTests(TestCase):
+    """El último snapshot más los movimientos posteriores reproducen Stock."""
+
+    def setUp(self):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        self.libros = [
+            Libro.objects.create(editorial=editorial, nombre=f"Libro {i}", autor="Autor", costo=10, precio_venta=20)
+            for i in range(3)
+        ]
+        self.bodegas = [Bodega.objects.create(nota=nota) for nota in "AB"]
+        for i, libro in enumerate(self.libros):
+            for j, bodega in enumerate(self.bodegas):
+                Stock.objects.create(libro=libro, bodega=bodega, cantidad=4 + i + j)
+
+    def assertCuadraConStock(self):
+        for libro in self.libros:
+            for bodega in self.bodegas:
+                stock = Stock.objects.filter(libro=libro, bodega=bodega).values_list('cantidad', flat=True).first() or 0
+                self.assertEqual(stock_segun_libro_mayor(libro.pk, bodega.pk), stock, (libro.nombre, bodega.nota))
+            total = sum(Stock.objects.filter(libro=libro).values_list('cantidad', flat=True))
+            self.assertEqual(stock_segun_libro_mayor(libro.pk), total, libro.nombre)
+
+    def _mover(self):
+        # Ajuste, alta, baja y una venta confirmada y otra cancelada
+        stock = Stock.objects.get(libro=self.libros[0], bodega=self.bodegas[0])
+        stock.cantidad -= 2
+        stock.save()
+        Stock.objects.filter(libro=self.libros[1], bodega=self.bodegas[1]).get().delete()
+        Stock.objects.create(libro=self.libros[1], bodega=self.bodegas[1], cantidad=1)
+        for estado in ('CONFIRMADA', 'CANCELADA'):
+            venta = Venta.objects.create(precio_total=60)
+            DetalleVenta.objects.create(venta=venta, libro=self.libros[2], cantidad=3, precio=20)
+            venta.estado = 'CONFIRMADA'
+            venta.save()
+            if estado == 'CANCELADA':
+                venta.estado = estado
+                venta.save()
+
+    def test_snapshot_mas_movimientos_posteriores(self):
+        hasta, num_snapshots, _ = compactar_libro_mayor()
+        self.assertEqual(num_snapshots, len(self.libros) * len(self.bodegas))
+        self.assertCuadraConStock()
+
+        self._mover()
+        self.assertGreater(MovimientoInventario.objects.filter(id__gt=hasta).count(), 0)
+        self.assertCuadraConStock()
+
+        # Una segunda generación parte de la anterior; sin movimientos nuevos no escribe nada
+        compactar_libro_mayor()
+        self.assertCuadraConStock()
+        self.assertEqual(compactar_libro_mayor()[1], 0)
+
+    def test_snapshot_purgado_mas_movimientos_posteriores(self):
+        compactar_libro_mayor(purgar=True)
+        self._mover()
+        hasta, _, purgados = compactar_libro_mayor(purgar=True)
+        self.assertGreater(purgados, 0)
+        self.assertEqual(list(SnapshotInventario.objects.values_list('hasta_movimiento', flat=True).distinct()), [hasta])
+        self._mover()
+        self.assertCuadraConStock()
+
+
+class DerivadosPortadaTests(TestCase):
+    """Los derivados de una portada se borran cuando ningún libro la usa."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        ajuste = self.settings(MEDIA_ROOT=media.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+
+    def _imagen(self, color):
+        contenido = io.BytesIO()
+        Image.new('RGB', (500, 750), color).save(contenido, 'PNG')
+        return SimpleUploadedFile('portada.png', contenido.getvalue())
+
+    def _libro(self, color):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Libro.objects.create(
+                editorial=self.editorial, nombre="Libro", autor="Autor", costo=10, precio_venta=20,
+                portada=self._imagen(color),
+            )
+
+    def _existen(self, nombre):
+        return derivados_existen(self.media_root, nombre)
+
+    def test_reemplazar_y_eliminar(self):
+        libro = self._libro('red')
+        copia = self._libro('red')  # Misma imagen: mismo archivo y mismos derivados
+        roja = libro.portada.name
+        self.assertEqual(copia.portada.name, roja)
+
+        libro = Libro.objects.get(pk=libro.pk)
+        libro.portada = self._imagen('blue')
+        with self.captureOnCommitCallbacks(execute=True):
+            libro.save()
+        self.assertTrue(self._existen(libro.portada.name))
+        self.assertTrue(self._existen(roja))  # La sigue usando la copia
+
+        with self.captureOnCommitCallbacks(execute=True):
+            copia.delete()
+        self.assertFalse(any(
+            os.path.exists(os.path.join(self.media_root, nombre)) for nombre in nombres_derivados(roja)
+        ))
+        self.assertTrue(self._existen(libro.portada.name))
+
+
+class VentaAdminTests(TestCase):
+    """Confirmar desde el admin descuenta las líneas tal como quedan en el mismo envío."""
+
+    def setUp(self):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        self.libro = Libro.objects.create(editorial=editorial, nombre="Libro", autor="Autor", costo=10, precio_venta=20)
+        self.otro = Libro.objects.create(editorial=editorial, nombre="Otro", autor="Autor", costo=10, precio_venta=20)
+        bodega = Bodega.objects.create(nota="A")
+        Stock.objects.create(libro=self.libro, bodega=bodega, cantidad=5)
+        Stock.objects.create(libro=self.otro, bodega=bodega, cantidad=5)
+        self.cliente = Cliente.objects.create(nombre="Ana", apellido="Pérez", telefono="555")
+        self.staff = Staff.objects.create(nombre="Luis", apellido="Gómez")
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+
+    def _enviar(self, url, estado, lineas, existentes=()):
+        # lineas: [(libro, cantidad)]; existentes: DetalleVenta ya guardados (van primero)
+        datos = {
+            'cliente': self.cliente.pk,
+            'staff': self.staff.pk,
+            'estado': estado,
+            'detalleventa_set-TOTAL_FORMS': len(existentes) + len(lineas),
+            'detalleventa_set-INITIAL_FORMS': len(existentes),
+            'detalleventa_set-MIN_NUM_FORMS': 0,
+            'detalleventa_set-MAX_NUM_FORMS': 1000,
+        }
+        filas = [(detalle.id, detalle.libro, detalle.cantidad) for detalle in existentes]
+        filas += [('', libro, cantidad) for libro, cantidad in lineas]
+        for numero, (detalle_id, libro, cantidad) in enumerate(filas):
+            datos.update({
+                f'detalleventa_set-{numero}-id': detalle_id,
+                f'detalleventa_set-{numero}-libro': libro.pk,
+                f'detalleventa_set-{numero}-cantidad': cantidad,
+                f'detalleventa_set-{numero}-precio': '20.00',
+            })
+        return self.client.post(url, datos)
+
+    def test_venta_nueva_confirmada(self):
+        respuesta = self._enviar(reverse('admin:inventario_ventas_venta_add'), 'CONFIRMADA', [(self.libro, 2)])
+        self.assertEqual(respuesta.status_code, 302)
+        venta = Venta.objects.get()
+        self.assertEqual(venta.estado, 'CONFIRMADA')
+        self.assertEqual(Libro.objects.get(pk=self.libro.pk).stock_total, 3)
+        self.assertEqual(MovimientoInventario.objects.filter(venta=venta, tipo='VENTA').count(), 1)
+
+    def test_confirmar_con_lineas_nuevas_en_el_mismo_envio(self):
+        venta = Venta.objects.create(cliente=self.cliente, staff=self.staff, precio_total=20)
+        detalle = DetalleVenta.objects.create(venta=venta, libro=self.libro, cantidad=1, precio=20)
+        url = reverse('admin:inventario_ventas_venta_change', args=[venta.pk])
+        respuesta = self._enviar(url, 'CONFIRMADA', [(self.otro, 2)], existentes=[detalle])
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(Libro.objects.get(pk=self.libro.pk).stock_total, 4)
+        self.assertEqual(Libro.objects.get(pk=self.otro.pk).stock_total, 3)
+
+
+    def test_sin_stock_es_error_del_formulario(self):
+        venta = Venta.objects.create(cliente=self.cliente, staff=self.staff, precio_total=20)
+        url = reverse('admin:inventario_ventas_venta_change', args=[venta.pk])
+        respuesta = self._enviar(url, 'CONFIRMADA', [(self.libro, 9)])
+        self.assertEqual(respuesta.status_code, 200)
+        formset = respuesta.context['inline_admin_formsets'][0].formset
+        self.assertIn("Stock insuficiente", str(formset.non_form_errors()))
+        self.assertEqual(Venta.objects.get(pk=venta.pk).estado, 'PENDIENTE')
+        self.assertFalse(DetalleVenta.objects.exists())
+
+    def test_sin_stock_al_guardar_no_dice_que_se_guardo(self):
+        # El stock se acaba entre la validación del formulario y la confirmación
+        venta = Venta.objects.create(cliente=self.cliente, staff=self.staff, precio_total=20)
+        url = reverse('admin:inventario_ventas_venta_change', args=[venta.pk])
+        with mock.patch('inventario_ventas.admin.asignar_lineas'):
+            respuesta = self._enviar(url, 'CONFIRMADA', [(self.libro, 9)])
+        self.assertRedirects(respuesta, url)
+        mensajes = [str(mensaje) for mensaje in get_messages(respuesta.wsgi_request)]
+        self.assertEqual(len(mensajes), 1)
+        self.assertIn("No se pudo confirmar", mensajes[0])
+        self.assertEqual(Venta.objects.get(pk=venta.pk).estado, 'PENDIENTE')
+        self.assertEqual(DetalleVenta.objects.get(venta=venta).cantidad, 9)
+
+
+
+class AutocompletadoAdminTests(TestCase):
+    """Los FK de los formularios del admin son autocompletados: el HTML no crece con el catálogo."""
+
+    def setUp(self):
+        self.editorial = Editorial.objects.create(nombre="Ediciones Dragón", telefono="555")
+        self.libro = Libro.objects.create(
+            editorial=self.editorial, nombre="El dragón de la isla", autor="Ana Pérez", costo=10, precio_venta=20,
+        )
+        Libro.objects.create(editorial=self.editorial, nombre="Otro", autor="Luis", costo=10, precio_venta=20)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+
+    def _autocompletar(self, termino, modelo='detalleventa', campo='libro'):
+        respuesta = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'inventario_ventas', 'model_name': modelo, 'field_name': campo, 'term': termino,
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        return [resultado['text'] for resultado in respuesta.json()['results']]
+
+    def test_formulario_de_venta_sin_un_option_por_libro(self):
+        url = reverse('admin:inventario_ventas_venta_add')
+        antes = len(self.client.get(url).content)
+        Libro.objects.bulk_create([
+            Libro(editorial=self.editorial, nombre=f"Libro {i}", autor="Autor", costo=10, precio_venta=20)
+            for i in range(200)
+        ])
+        contenido = self.client.get(url).content
+        self.assertEqual(len(contenido), antes)
+        self.assertNotIn(b"Libro 199", contenido)
+
+    def test_autocompletado_de_libro_por_titulo_y_autor(self):
+        # Sin acentos y por prefijo, con el índice FTS5
+        self.assertEqual(self._autocompletar("drago"), [str(self.libro)])
+        self.assertEqual(self._autocompletar("perez"), [str(self.libro)])
+        # El autocompletado no busca por editorial (la lista del admin sí)
+        self.assertEqual(self._autocompletar("ediciones"), [])
+        respuesta = self.client.get(reverse('admin:inventario_ventas_libro_changelist'), {'q': 'ediciones'})
+        self.assertEqual(respuesta.context['cl'].result_count, 2)
+
+    def test_autocompletado_de_bodega_y_cliente(self):
+        bodega = Bodega.objects.create(nota="Central")
+        Cliente.objects.create(nombre="Marta", apellido="Ruiz", telefono="555")
+        self.assertEqual(self._autocompletar("central", 'stock', 'bodega'), [str(bodega)])
+        self.assertEqual(len(self._autocompletar("ruiz", 'venta', 'cliente')), 1)
+
+class ResumenVentasTests(TestCase):
+    """Cubetas de los resúmenes de ventas (señales de Venta, reportes.py)."""
+
+    def _filas(self):
+        return set(ResumenVentasDia.objects.values_list('id_tienda', 'estado', 'num_ventas', 'total'))
+
+    def test_cambio_de_tienda_del_vendedor_no_mueve_sus_ventas(self):
+        tienda_a = Tienda.objects.create(nombre="Centro")
+        tienda_b = Tienda.objects.create(nombre="Norte")
+        staff = Staff.objects.create(nombre="Luis", apellido="Gómez", tienda=tienda_a)
+        venta = Venta.objects.create(staff=staff, precio_total=10)
+
+        staff.tienda = tienda_b
+        staff.save()
+        venta = Venta.objects.get(pk=venta.pk)
+        venta.precio_total = 15
+        venta.save()
+        Venta.objects.create(staff=staff, precio_total=5)
+        self.assertEqual(self._filas(), {
+            (tienda_a.pk, 'PENDIENTE', 1, Decimal('15')), (tienda_b.pk, 'PENDIENTE', 1, Decimal('5')),
+        })
+
+        Venta.objects.get(pk=venta.pk).delete()
+        self.assertEqual(self._filas(), {
+            (tienda_a.pk, 'PENDIENTE', 0, Decimal('0')), (tienda_b.pk, 'PENDIENTE', 1, Decimal('5')),
+        })
+
+
+class MasVendidosTests(TestCase):
+    """Libros más vendidos y bajo inventario (reportes.py), mantenidos al confirmar/cancelar."""
+
+    def setUp(self):
+        self.editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        self.bodega = Bodega.objects.create(nota="A")
+
+    def _venta(self, num_lineas, cantidad=1, stock=10):
+        venta = Venta.objects.create(precio_total=0)
+        for numero in range(num_lineas):
+            libro = Libro.objects.create(
+                editorial=self.editorial, nombre=f"Libro {numero}", autor="Autor", costo=10, precio_venta=20,
+            )
+            Stock.objects.create(libro=libro, bodega=self.bodega, cantidad=stock)
+            DetalleVenta.objects.create(venta=venta, libro=libro, cantidad=cantidad, precio=20)
+        return Venta.objects.get(pk=venta.pk)
+
+    def _consultas(self, venta, estado):
+        venta.estado = estado
+        with CaptureQueriesContext(connection) as capturadas:
+            venta.save()
+        return len(capturadas)
+
+    def test_consultas_no_dependen_del_numero_de_lineas(self):
+        chica, grande = self._venta(5), self._venta(50)
+        self.assertEqual(self._consultas(chica, 'CONFIRMADA'), self._consultas(grande, 'CONFIRMADA'))
+        self.assertEqual(self._consultas(chica, 'CANCELADA'), self._consultas(grande, 'CANCELADA'))
+
+    def test_top_y_bajo_stock(self):
+        venta = self._venta(3, cantidad=2, stock=5)
+        libros = list(Libro.objects.order_by('id'))
+        DetalleVenta.objects.create(venta=venta, libro=libros[1], cantidad=3, precio=20)
+        venta.estado = 'CONFIRMADA'
+        venta.save()
+
+        esperado = [(libros[1].pk, 5), (libros[0].pk, 2), (libros[2].pk, 2)]
+        for top in (libros_mas_vendidos(), libros_mas_vendidos(dias=7)):
+            self.assertEqual([(fila['libro_id'], fila['cantidad_vendida']) for fila in top], esperado)
+        self.assertEqual(VentasLibroDia.objects.get(libro=libros[1]).fecha, timezone.localdate())
+        self.assertEqual([fila['libro_id'] for fila in libros_bajo_stock(umbral=4)], [libros[1].pk, libros[0].pk, libros[2].pk])
+        self.assertEqual(contar_bajo_stock(umbral=1), 1)
+
+        venta.estado = 'CANCELADA'
+        venta.save()
+        self.assertEqual(list(libros_mas_vendidos()), [])
+        self.assertEqual(contar_bajo_stock(umbral=5), 0)
+
+
+class ChangelistAdminTests(TestCase):
+    """Los listados del admin hacen el mismo número de consultas sin importar el tamaño de página."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # bulk_create: sin señales, solo los datos que leen los listados
+        editoriales = Editorial.objects.bulk_create(
+            [Editorial(nombre=f"Editorial {i}", telefono="555") for i in range(5)]
+        )
+        libros = Libro.objects.bulk_create([
+            Libro(editorial=editoriales[i % 5], nombre=f"Libro {i:04d}", autor=f"Autor {i % 7}", costo=10, precio_venta=20)
+            for i in range(1000)
+        ])
+        ResumenStockLibro.objects.bulk_create([ResumenStockLibro(libro=libro, total=i % 30) for i, libro in enumerate(libros)])
+        staff = Staff.objects.bulk_create([Staff(nombre=f"S{i}", apellido="A") for i in range(10)])
+        clientes = Cliente.objects.bulk_create([Cliente(nombre=f"C{i}", apellido="B", telefono="1") for i in range(50)])
+        ventas = Venta.objects.bulk_create([
+            Venta(cliente=clientes[i % 50], staff=staff[i % 10], precio_total=40) for i in range(1000)
+        ])
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(venta=venta, libro=libros[(i + j) % 1000], cantidad=1, precio=20)
+            for i, venta in enumerate(ventas) for j in range(2)
+        ])
+        cls.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _consultas(self, modelo, por_pagina, **parametros):
+        url = reverse(f'admin:inventario_ventas_{modelo._meta.model_name}_changelist')
+        with mock.patch.object(admin.site._registry[modelo], 'list_per_page', por_pagina):
+            with CaptureQueriesContext(connection) as capturadas:
+                respuesta = self.client.get(url, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context['cl'].result_list), por_pagina)
+        return len(capturadas)
+
+    def test_libros_consultas_constantes(self):
+        self.assertEqual(self._consultas(Libro, 100), self._consultas(Libro, 1000))
+
+    def test_ventas_consultas_constantes(self):
+        self.assertEqual(self._consultas(Venta, 100), self._consultas(Venta, 1000))
+
+    def test_columnas_calculadas_ordenables(self):
+        # o=5: 'stock_total_display'; o=-6: 'total_calculado_display' descendente
+        self.assertEqual(self._consultas(Libro, 100, o='5'), self._consultas(Libro, 1000, o='5'))
+        url = reverse('admin:inventario_ventas_venta_changelist')
+        respuesta = self.client.get(url, {'o': '-6'})
+        primera = respuesta.context['cl'].result_list[0]
+        self.assertEqual(primera.total_calculado_centavos, 4000)
+        self.assertEqual(primera.total_calculado, Dinero(4000))
+
+
+class PresupuestoConsultasTests(TestCase):
+    """Máximo de consultas por vista (incluye sesión/auth). Si una falla, el mensaje lista las consultas."""
+
+    PRESUPUESTOS = {
+        'catalogo_libros': 3,
+        'detalle_libro': 2,
+        'carrito_add': 2,
+        'orden_checkout': 18,  # Incluye SAVEPOINT/RELEASE y crear la sesión
+        'orden_confirmada': 5,  # Sesión (leer y guardar) + el comprobante por PK
+        'dashboard_ventas': 10,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        bodega = Bodega.objects.create(nota="A")
+        cls.libros = [
+            Libro.objects.create(editorial=editorial, nombre=f"Libro {i}", autor="Autor", costo=10, precio_venta=20)
+            for i in range(10)
+        ]
+        for libro in cls.libros:
+            Stock.objects.create(libro=libro, bodega=bodega, cantidad=5)
+        cls.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+
+    def setUp(self):
+        # Sin páginas del catálogo en caché: se mide el caso caro
+        cache.clear()
+
+    def _dentro_de_presupuesto(self, nombre, metodo='get', datos=None, **kwargs):
+        with presupuesto_consultas(self.PRESUPUESTOS[nombre], nombre):
+            respuesta = getattr(self.client, metodo)(reverse(nombre, kwargs=kwargs), datos)
+        self.assertLess(respuesta.status_code, 400)
+        return respuesta
+
+    def _llenar_carrito(self, libros):
+        for libro in libros:
+            self.client.post(reverse('carrito_add', kwargs={'libro_id': libro.id}), {'cantidad': 1})
+
+    def test_catalogo(self):
+        self._dentro_de_presupuesto('catalogo_libros')
+
+    def test_detalle(self):
+        self._dentro_de_presupuesto('detalle_libro', pk=self.libros[0].pk)
+
+    def test_carrito_add(self):
+        self._llenar_carrito(self.libros[:3])
+        self._dentro_de_presupuesto('carrito_add', 'post', {'cantidad': 1}, libro_id=self.libros[3].pk)
+
+    def test_checkout_no_depende_del_numero_de_lineas(self):
+        # Mismo presupuesto con 2 y con 10 líneas en el carrito
+        for libros in (self.libros[:2], self.libros):
+            self._llenar_carrito(libros)
+            self._dentro_de_presupuesto('orden_checkout', 'post', {
+                'nombre': 'Ana', 'apellido': 'Pérez', 'telefono': '555', 'direccion': 'Calle 1',
+            })
+
+    def test_confirmacion_sale_del_comprobante(self):
+        # Mismo presupuesto con 2 y con 10 líneas: nada se lee por línea
+        for libros in (self.libros[:2], self.libros):
+            self._llenar_carrito(libros)
+            self.client.post(reverse('orden_checkout'), {
+                'nombre': 'Ana', 'apellido': 'Pérez', 'telefono': '555', 'direccion': 'Calle 1',
+            })
+            respuesta = self._dentro_de_presupuesto('orden_confirmada')
+            venta = Venta.objects.latest('id')
+            self.assertContains(respuesta, f'#{venta.id}<')
+            self.assertContains(respuesta, 'Nombre%3A%20Ana%20P%C3%A9rez')
+            self.assertEqual(venta.comprobante.total, Dinero(2000 * len(libros)))
+            self.assertEqual([linea.titulo for linea in venta.comprobante.lineas], [libro.nombre for libro in libros])
+
+    def test_dashboard(self):
+        self.client.force_login(self.usuario)
+        self._dentro_de_presupuesto('dashboard_ventas')
+
+    def test_presupuesto_excedido(self):
+        with self.assertRaises(PresupuestoExcedido):
+            with presupuesto_consultas(0, 'prueba'):
+                Libro.objects.count()
+
+
+class PlanesConsultaTests(TestCase):
+    """
+    EXPLAIN QUERY PLAN de cada consulta de los caminos calientes: ninguna debe
+    recorrer completa una tabla que crece con el uso. Se permite recorrer un
+    índice en orden si la consulta tiene LIMIT y no ordena aparte (se detiene
+    pronto, como la primera página del catálogo). Si falla, el mensaje muestra
+    la consulta y su plan.
+    """
+
+    TABLAS_GRANDES = {
+        modelo._meta.db_table
+        for modelo in (
+            Libro, Stock, Cliente, Venta, DetalleVenta, MovimientoInventario,
+            ResumenStockLibro, ResumenVentasDia, VentasLibroDia,
+        )
+    }
+    RE_RECORRIDO = re.compile(r'^SCAN (\S+)( USING (COVERING )?INDEX \S+)?$')
+
+    @classmethod
+    def setUpTestData(cls):
+        generar(editoriales=5, libros=200, bodegas=3, clientes=50, ventas=300)
+        cls.libro = Libro.objects.filter(resumen_stock__total__gte=5).order_by('id').first()
+        cls.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+
+    def setUp(self):
+        cache.clear()
+
+    def _plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [fila[3] for fila in cursor.fetchall()]
+
+    def _recorridos_completos(self, sql, plan):
+        ordena_aparte = any(linea.startswith('USE TEMP B-TREE') for linea in plan)
+        malos = []
+        for linea in plan:
+            encontrado = self.RE_RECORRIDO.match(linea)
+            if not encontrado or encontrado.group(1) not in self.TABLAS_GRANDES:
+                continue
+            if encontrado.group(2) and ' LIMIT ' in sql and not ordena_aparte:
+                continue  # índice en orden + LIMIT: lee solo las primeras filas
+            malos.append(linea)
+        return malos
+
+    def assertSinRecorridosCompletos(self, hacer):
+        with CaptureQueriesContext(connection) as capturadas:
+            hacer()
+        errores = []
+        for consulta in capturadas.captured_queries:
+            sql = consulta['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan = self._plan(sql)
+            if self._recorridos_completos(sql, plan):
+                errores.append(f"{sql}\n    " + '\n    '.join(plan))
+        self.assertFalse(errores, 'Recorridos completos de tabla:\n' + '\n'.join(errores))
+
+    def test_catalogo(self):
+        self.assertSinRecorridosCompletos(lambda: self.client.get(reverse('catalogo_libros')))
+        self.assertSinRecorridosCompletos(lambda: self.client.get(reverse('catalogo_libros'), {'q': 'gato'}))
+        self.assertSinRecorridosCompletos(lambda: self.client.get(reverse('detalle_libro', args=[self.libro.id])))
+
+    def test_carrito_y_checkout(self):
+        def comprar():
+            self.client.post(reverse('carrito_add', args=[self.libro.id]), {'cantidad': 1})
+            self.client.get(reverse('carrito_detail'))
+            self.client.post(reverse('orden_checkout'), {
+                'nombre': 'Ana', 'apellido': 'Pérez', 'telefono': '555', 'direccion': 'Calle 1',
+            })
+            self.client.get(reverse('orden_confirmada'))
+        self.assertSinRecorridosCompletos(comprar)
+
+    def test_confirmar_venta(self):
+        venta = Venta.objects.filter(estado='PENDIENTE').first()
+        venta.estado = 'CONFIRMADA'
+        self.assertSinRecorridosCompletos(venta.save)
+
+    def test_dashboard(self):
+        self.client.force_login(self.usuario)
+        self.assertSinRecorridosCompletos(lambda: self.client.get(reverse('dashboard_ventas')))
+
+    def test_admin_ventas_por_fecha(self):
+        # Lo que manda el filtro "Últimos 7 días" del admin: rango semiabierto sobre fecha_hora
+        self.client.force_login(self.usuario)
+        hoy = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.assertSinRecorridosCompletos(lambda: self.client.get(
+            reverse('admin:inventario_ventas_venta_changelist'),
+            {'fecha_hora__gte': str(hoy - timedelta(days=7)), 'fecha_hora__lt': str(hoy + timedelta(days=1))},
+        ))
+
+    def test_detecta_recorrido_completo(self):
+        with self.assertRaises(AssertionError):
+            self.assertSinRecorridosCompletos(lambda: list(Venta.objects.filter(precio_total__gt=0)))
+
+
+class ImportacionTests(TestCase):
+    """Importación masiva de catálogo y stock (importacion.py)."""
+
+    def setUp(self):
+        self.bodega_a = Bodega.objects.create(nota="A")
+        self.bodega_b = Bodega.objects.create(nota="B")
+
+    def _csv(self, *filas):
+        cabecera = 'isbn,nombre,autor,editorial,costo,precio_venta,bodega,cantidad\n'
+        return io.StringIO(cabecera + ''.join(f'{fila}\n' for fila in filas))
+
+    def test_upsert_por_isbn_y_stock_en_el_libro_mayor(self):
+        archivo = self._csv(
+            f'111,Uno,Autora,Norma,10,20,{self.bodega_a.pk},5',
+            f'111,,,,,,{self.bodega_b.pk},2',
+            f'222,Dos,Autor,Norma,10,25,{self.bodega_a.pk},3',
+            f'333,Tres,Autor,Norma,10,abc,{self.bodega_a.pk},1',
+            '444,Cuatro,Autor,Norma,10,20,999,1',
+            f'555,Cinco,Autor,Norma,1e30,20,{self.bodega_a.pk},1',
+            f'666,Seis,Autor,Norma,123456789,20,{self.bodega_a.pk},1',
+            f'777,Siete,Autor,Norma,10,20,{self.bodega_a.pk},{10**30}',
+        )
+        resumen = importar(archivo, 'csv', tamano_bloque=2)
+        self.assertEqual(resumen.num_errores, 5)
+        self.assertFalse(Libro.objects.filter(isbn__in=['555', '666', '777']).exists())
+        self.assertEqual(Editorial.objects.filter(nombre='Norma').count(), 1)
+        libro = Libro.objects.get(isbn='111')
+        self.assertEqual(libro.stock_total, 7)
+        self.assertEqual(MovimientoInventario.objects.filter(libro=libro, tipo='AJUSTE').count(), 2)
+
+        # Reimportar con otro conteo: solo queda la diferencia como ajuste, sin duplicar libros
+        importar(self._csv(f'111,Uno (2a ed.),Autora,Norma,10,22,{self.bodega_a.pk},4'), 'csv')
+        libro.refresh_from_db()
+        self.assertEqual((libro.nombre, libro.precio_venta), ('Uno (2a ed.)', 22))
+        self.assertEqual(Libro.objects.filter(isbn='111').count(), 1)
+        self.assertEqual(Stock.objects.get(libro=libro, bodega=self.bodega_a).cantidad, 4)
+        self.assertEqual(ResumenStockLibro.objects.get(libro=libro).total, 6)
+        self.assertEqual(
+            sum(MovimientoInventario.objects.filter(libro=libro).values_list('cantidad', flat=True)), 6
+        )
+
+    def test_entradas_suman(self):
+        importar(self._csv(f'111,Uno,Autora,Norma,10,20,{self.bodega_a.pk},5'), 'csv')
+        importar(self._csv(f'111,,,,,,{self.bodega_a.pk},5'), 'csv', entradas=True)
+        self.assertEqual(Libro.objects.get(isbn='111').stock_total, 10)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo='ENTRADA').count(), 1)
+
+
+class ExportacionVentasTests(TestCase):
+    """Exportación de líneas de venta por rango de fechas (exportacion.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        cls.libro = Libro.objects.create(
+            editorial=editorial, nombre="Libro, con coma", isbn="111", autor="Autor", costo=10, precio_venta=20,
+        )
+        cliente = Cliente.objects.create(nombre="Ana", apellido="Pérez", telefono="555")
+        cls.venta = Venta.objects.create(cliente=cliente, precio_total=45)
+        DetalleVenta.objects.create(venta=cls.venta, libro=cls.libro, cantidad=2, precio=Decimal('22.50'))
+        vieja = Venta.objects.create(precio_total=20)
+        Venta.objects.filter(pk=vieja.pk).update(fecha_hora=timezone.now() - timedelta(days=30))
+        DetalleVenta.objects.create(venta=vieja, libro=cls.libro, cantidad=1, precio=20)
+        cls.staff = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+
+    def _url(self, **parametros):
+        hoy = timezone.localdate()
+        return reverse('exportar_ventas') + '?' + urlencode({'desde': hoy - timedelta(days=1), 'hasta': hoy, **parametros})
+
+    def test_csv_del_rango(self):
+        self.client.force_login(self.staff)
+        respuesta = self.client.get(self._url())
+        self.assertTrue(respuesta.streaming)
+        filas = list(csv.reader(io.StringIO(b''.join(respuesta.streaming_content).decode())))
+        self.assertEqual(len(filas), 2)  # Encabezado y la línea de la venta de hoy
+        linea = dict(zip(filas[0], filas[1]))
+        self.assertEqual(
+            (linea['venta'], linea['cliente'], linea['libro'], linea['total_linea']),
+            (str(self.venta.pk), 'Ana Pérez', 'Libro, con coma', '45.00'),
+        )
+
+    def test_jsonl_gzip(self):
+        self.client.force_login(self.staff)
+        respuesta = self.client.get(self._url(formato='jsonl', gzip='1', estado='PENDIENTE'))
+        self.assertEqual(respuesta['Content-Type'], 'application/gzip')
+        lineas = gzip.decompress(b''.join(respuesta.streaming_content)).decode().splitlines()
+        self.assertEqual([json.loads(linea)['isbn'] for linea in lineas], ['111'])
+
+    def test_solo_staff_y_fechas_validas(self):
+        self.assertEqual(self.client.get(self._url()).status_code, 302)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(self._url(desde='2030-01-02', hasta='2030-01-01')).status_code, 400)
+
+
+class BaseDatosTests(SimpleTestCase):
+    """PRAGMA por conexión y reintentos del escritor serializado (basedatos.py)."""
+
+    def test_pragmas_de_la_conexion_sin_tocar_el_archivo(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'bd.sqlite3')
+            crudo = sqlite3.connect(ruta)
+            self.addCleanup(crudo.close)
+            configurar_conexion(None, mock.Mock(vendor='sqlite', connection=crudo))
+            valores = {
+                nombre: crudo.execute(f'PRAGMA {nombre}').fetchone()[0]
+                for nombre in ('journal_mode', 'synchronous', 'busy_timeout', 'foreign_keys')
+            }
+            self.assertEqual(valores, {'journal_mode': 'delete', 'synchronous': 1, 'busy_timeout': 5000, 'foreign_keys': 1})
+            self.assertEqual(os.listdir(directorio), ['bd.sqlite3'])
+
+    def test_pragma_persistente_en_settings(self):
+        with self.settings(SQLITE_PRAGMAS={'journal_mode': 'WAL'}):
+            with self.assertRaises(ImproperlyConfigured):
+                configurar_conexion(None, mock.Mock(vendor='sqlite'))
+
+    def _escritura(self, *errores):
+        llamadas = mock.Mock(side_effect=[*errores, 'hecho'])
+        return llamadas, escritura_serializada(llamadas)
+
+    @mock.patch('inventario_ventas.basedatos.time.sleep')
+    def test_reintenta_si_la_bd_esta_bloqueada(self, dormir):
+        llamadas, escribir = self._escritura(OperationalError('database is locked'), OperationalError('database is locked'))
+        self.assertEqual(escribir(), 'hecho')
+        self.assertEqual(llamadas.call_count, 3)
+        self.assertEqual(dormir.call_count, 2)
+
+    @mock.patch('inventario_ventas.basedatos.time.sleep')
+    def test_se_rinde_despues_de_los_reintentos(self, dormir):
+        llamadas, escribir = self._escritura(*[OperationalError('database is locked')] * 3)
+        with self.settings(ESCRITOR_REINTENTOS=2), self.assertRaises(OperationalError):
+            escribir()
+        self.assertEqual(llamadas.call_count, 3)
+
+    @mock.patch('inventario_ventas.basedatos.time.sleep')
+    def test_otros_errores_no_se_reintentan(self, dormir):
+        llamadas, escribir = self._escritura(OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            escribir()
+        self.assertEqual(llamadas.call_count, 1)
+        dormir.assert_not_called()
+
+
+class BusquedaTests(TestCase):
+    """Buscador del catálogo con el índice FTS5 (busqueda.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.editorial = Editorial.objects.create(nombre="Norma", telefono="555")
+        self.bodega = Bodega.objects.create(nota="A")
+
+    def _libro(self, nombre, autor="Autor", sinopsis=None):
+        libro = Libro.objects.create(
+            editorial=self.editorial, nombre=nombre, autor=autor, sinopsis=sinopsis, costo=10, precio_venta=20,
+        )
+        Stock.objects.create(libro=libro, bodega=self.bodega, cantidad=5)
+        return libro
+
+    def _buscar(self, consulta):
+        return set(filtrar_por_busqueda(Libro.objects.all(), consulta).values_list('nombre', flat=True))
+
+    def _indexados(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {TABLA_FTS} ORDER BY rowid')
+            return [fila[0] for fila in cursor.fetchall()]
+
+    def _catalogo(self, **parametros):
+        respuesta = self.client.get(reverse('catalogo_libros'), parametros)
+        return [libro.nombre for libro in respuesta.context['libros']], respuesta.context['pagina']
+
+    def test_sin_acentos_ni_mayusculas_y_por_prefijo(self):
+        self._libro("El Dragón Rojo")
+        self._libro("Cuentos", autor="Ñuñez")
+        self.assertEqual(self._buscar('dragon'), {"El Dragón Rojo"})
+        self.assertEqual(self._buscar('DRAGÓN'), {"El Dragón Rojo"})
+        self.assertEqual(self._buscar('drag'), {"El Dragón Rojo"})
+        self.assertEqual(self._buscar('nunez'), {"Cuentos"})
+        self.assertEqual(self._buscar('rojo drag'), {"El Dragón Rojo"})
+        self.assertEqual(self._buscar('dragon azul'), set())
+
+    def test_indice_sigue_a_libros_y_editoriales(self):
+        libro = self._libro("Gatos")
+        otra = Editorial.objects.create(nombre="Planeta", telefono="555")
+        del_otra = Libro.objects.create(editorial=otra, nombre="Perros", autor="Autor", costo=10, precio_venta=20)
+
+        libro.nombre = "Ratones"
+        libro.save()
+        self.assertEqual(self._buscar('gatos'), set())
+        self.assertEqual(self._buscar('ratones'), {"Ratones"})
+
+        self.editorial.nombre = "Alfaguara"
+        self.editorial.save()
+        self.assertEqual(self._buscar('alfaguara'), {"Ratones"})
+        self.assertEqual(self._buscar('norma'), set())
+
+        libro.delete()
+        self.assertEqual(self._indexados(), [del_otra.pk])
+        Libro.objects.filter(editorial=otra).delete()  # Borrado desde un queryset: también manda post_delete
+        self.assertEqual(self._indexados(), [])
+
+    def test_catalogo_ordena_por_relevancia(self):
+        self._libro("Antología", sinopsis="Incluye un dragón")
+        self._libro("Zoo de dragones")
+        self._libro("Balada", autor="Dragonetti")
+        nombres, _ = self._catalogo(q='dragon')
+        # El título pesa más que el autor y el autor más que la sinopsis
+        self.assertEqual(nombres, ["Zoo de dragones", "Balada", "Antología"])
+
+    def test_paginas_de_una_busqueda(self):
+        for numero in range(5):
+            self._libro(f"Dragón {numero}")  # Mismo bm25: desempata el id
+        self._libro("Otro")
+        with mock.patch.object(CatalogoLibrosView, 'por_pagina', 2):
+            vistos, pagina = self._catalogo(q='dragon')
+            paginas = [vistos]
+            while pagina.siguiente:
+                nombres, pagina = self._catalogo(q='dragon', cursor=pagina.siguiente)
+                paginas.append(nombres)
+            self.assertEqual(paginas, [["Dragón 0", "Dragón 1"], ["Dragón 2", "Dragón 3"], ["Dragón 4"]])
+            self.assertEqual(self._catalogo(q='dragon', cursor=pagina.anterior)[0], ["Dragón 2", "Dragón 3"])
+            # Un cursor del catálogo (por nombre) no sirve en la búsqueda: vuelve a la primera página
+            cursor_nombre = codificar_cursor('s', 'nombre', "Dragón 1", 0)
+            self.assertEqual(self._catalogo(q='dragon', cursor=cursor_nombre)[0], ["Dragón 0", "Dragón 1"])
+
+
+class ServirMediaTests(SimpleTestCase):
+    """Archivos de MEDIA_ROOT con ETag, 304 y Cache-Control (views.servir_media)."""
+
+    INMUTABLE = 'portadas/' + 'a' * 32 + '.png'
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajuste = self.settings(MEDIA_ROOT=media.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        os.makedirs(os.path.join(media.name, 'portadas'))
+        for nombre in (self.INMUTABLE, 'portadas/vieja.png'):
+            with open(os.path.join(media.name, nombre), 'wb') as archivo:
+                archivo.write(b'imagen')
+
+    def _get(self, ruta, **cabeceras):
+        return servir_media(RequestFactory().get('/media/' + ruta, headers=cabeceras), ruta)
+
+    def test_etag_y_304(self):
+        for ruta, cache_control in ((self.INMUTABLE, 'immutable'), ('portadas/vieja.png', 'max-age=3600')):
+            respuesta = self._get(ruta)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(b''.join(respuesta.streaming_content), b'imagen')
+            self.assertIn(cache_control, respuesta['Cache-Control'])
+            etag = respuesta['ETag']
+            respuesta.close()
+
+            respuesta = self._get(ruta, if_none_match=f'"otro", {etag}')
+            self.assertEqual(respuesta.status_code, 304)
+            self.assertEqual(respuesta['ETag'], etag)
+        self.assertEqual(self._get(self.INMUTABLE)['ETag'], '"%s"' % ('a' * 32))
+
+    def test_rechaza_rutas_fuera_de_media(self):
+        for ruta in ('../settings.py', 'portadas/../../manage.py', '/etc/passwd', 'portadas', 'no-existe.png'):
+            with self.assertRaises(Http404):
+                self._get(ruta)
+
+    def test_derivados_cambian_de_nombre_con_sus_opciones(self):
+        nombre = nombre_derivado(self.INMUTABLE, 200, 'webp')
+        self.assertTrue(es_nombre_inmutable(nombre))
+        formatos = (('webp', 'WEBP', {'quality': 60}), ('jpg', 'JPEG', {'quality': 82}))
+        with mock.patch('inventario_ventas.portadas.FORMATOS', formatos):
+            self.assertNotEqual(nombre_derivado(self.INMUTABLE, 200, 'webp'), nombre)
+        with mock.patch('inventario_ventas.portadas.VERSION_DERIVADOS', 2):
+            self.assertNotEqual(nombre_derivado(self.INMUTABLE, 200, 'webp'), nombre)
+
+    def test_solo_se_sirve_en_desarrollo(self):
+        self.addCleanup(importlib.reload, urls_proyecto)
+        for servir in (False, True):
+            with self.settings(SERVIR_MEDIA=servir):
+                nombres = {getattr(patron, 'name', None) for patron in importlib.reload(urls_proyecto).urlpatterns}
+            self.assertEqual('servir_media' in nombres, servir)
+
+
+class SesionesTests(TestCase):
+    """Visitas anónimas sin sesión y barrido por lotes de sesiones/carritos vencidos (sesiones.py)."""
+
+    def test_catalogo_y_detalle_no_crean_sesion(self):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        libro = Libro.objects.create(editorial=editorial, nombre="Libro", autor="Autor", costo=10, precio_venta=20)
+        Stock.objects.create(libro=libro, bodega=Bodega.objects.create(nota="A"), cantidad=5)
+        cache.clear()
+        for _ in range(2):  # Sin caché y desde la caché
+            for url in (reverse('catalogo_libros'), reverse('detalle_libro', args=[libro.pk])):
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertNotIn('sessionid', respuesta.cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def _sesiones(self, vencidas, vigentes):
+        ahora = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'vencida{i}', session_data='', expire_date=ahora - timedelta(days=1)) for i in range(vencidas)]
+            + [Session(session_key=f'vigente{i}', session_data='', expire_date=ahora + timedelta(days=1)) for i in range(vigentes)]
+        )
+
+    def _borrados(self, capturadas):
+        return [consulta['sql'] for consulta in capturadas.captured_queries if consulta['sql'].startswith('DELETE')]
+
+    def test_barrido_por_lotes(self):
+        self._sesiones(vencidas=7, vigentes=2)
+        with CaptureQueriesContext(connection) as capturadas:
+            self.assertEqual(barrer_sesiones_expiradas(lote=3, pausa=0), 7)
+        self.assertEqual(len(self._borrados(capturadas)), 3)  # 3 + 3 + 1
+        self.assertEqual(sorted(Session.objects.values_list('session_key', flat=True)), ['vigente0', 'vigente1'])
+
+    def test_barrido_con_maximo(self):
+        self._sesiones(vencidas=7, vigentes=0)
+        self.assertEqual(barrer_sesiones_expiradas(lote=3, pausa=0, maximo=4), 4)
+        self.assertEqual(Session.objects.count(), 3)
+
+    def test_carritos_abandonados(self):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        libro = Libro.objects.create(editorial=editorial, nombre="Libro", autor="Autor", costo=10, precio_venta=20)
+        LineaCarrito.objects.bulk_create([
+            LineaCarrito(carrito=f'c{i}', libro=libro, cantidad=1, precio_centavos=2000) for i in range(5)
+        ])
+        LineaCarrito.objects.filter(carrito__in=['c0', 'c1', 'c2']).update(actualizado=timezone.now() - timedelta(days=400))
+        self.assertEqual(barrer_carritos_abandonados(lote=2, pausa=0), 3)
+        self.assertEqual(sorted(LineaCarrito.objects.values_list('carrito', flat=True)), ['c3', 'c4'])
+
+
+class CarritoTests(TestCase):
+    """El mismo recorrido del carrito con cada almacén (almacen_carrito.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        bodega = Bodega.objects.create(nota="A")
+        cls.libros = [
+            Libro.objects.create(editorial=editorial, nombre=f"Libro {i}", autor="Autor", costo=10, precio_venta=precio)
+            for i, precio in enumerate((Decimal('20.00'), Decimal('12.50'), Decimal('7.99')))
+        ]
+        for libro in cls.libros:
+            Stock.objects.create(libro=libro, bodega=bodega, cantidad=5)
+
+    def _carrito(self):
+        return self.client.get(reverse('carrito_detail')).context['carrito']
+
+    def _post(self, nombre, libro, **datos):
+        return self.client.post(reverse(nombre, args=[libro.pk]), datos)
+
+    def test_agregar_cambiar_quitar_y_comprar(self):
+        uno, dos, tres = self.libros
+        for almacen in ALMACENES:
+            with self.subTest(almacen=almacen), self.settings(CARRITO_ALMACEN=almacen):
+                self.client = self.client_class()
+                self._post('carrito_add', uno, cantidad=2)
+                self._post('carrito_add', dos, cantidad=1)
+                self._post('carrito_add', tres, cantidad=1)
+                self._post('carrito_add', uno, cantidad=9)  # Más que el stock: no cambia
+                self._post('carrito_update_quantity', uno, cantidad=3)
+                self._post('carrito_remove', tres)
+                carrito = self._carrito()
+                self.assertEqual(carrito.lineas(), {uno.pk: (3, Dinero(2000)), dos.pk: (1, Dinero(1250))})
+                self.assertEqual(len(carrito), 4)
+                self.assertEqual(carrito.get_total_price(), Dinero(7250))
+
+                self._post('carrito_update_quantity', dos, cantidad=0)
+                self._post('carrito_add', dos, cantidad=2)
+                self.client.post(reverse('orden_checkout'), {
+                    'nombre': 'Ana', 'apellido': 'Pérez', 'telefono': '555', 'direccion': 'Calle 1',
+                })
+                venta = Venta.objects.latest('id')
+                self.assertEqual(venta.precio_total, Decimal('85.00'))
+                self.assertEqual(
+                    set(venta.detalleventa_set.values_list('libro_id', 'cantidad', 'precio')),
+                    {(uno.pk, 3, Decimal('20.00')), (dos.pk, 2, Decimal('12.50'))},
+                )
+                self.assertEqual(len(self._carrito()), 0)
+        self.assertFalse(LineaCarrito.objects.exists())
+
+    def test_cookie_alterada_es_un_carrito_vacio(self):
+        self._post('carrito_add', self.libros[0], cantidad=1)
+        self.assertEqual(len(self._carrito()), 1)
+        # "<libro>:<cantidad>:<centavos>:<fecha>:<firma>": otra cantidad con la misma firma
+        contenido = f"{self.libros[0].pk}:1:2000:"
+        valor = self.client.cookies[nombre_cookie()].value
+        self.assertTrue(valor.startswith(contenido))
+        self.client.cookies[nombre_cookie()] = f"{self.libros[0].pk}:5:2000:" + valor[len(contenido):]
+        self.assertEqual(len(self._carrito()), 0)
+
+    def test_precios_decimales_de_carritos_viejos_en_la_sesion(self):
+        uno, dos, tres = self.libros
+        sesion = self.client.session
+        sesion[CLAVE_SESION] = {
+            str(uno.pk): {'cantidad': 2, 'precio': '20.00'},
+            str(dos.pk): {'cantidad': 1, 'precio': '12.5'},
+            str(tres.pk): {'cantidad': 3, 'precio': 7.99},
+        }
+        sesion.save()
+        with self.settings(CARRITO_ALMACEN='sesion'):
+            carrito = self._carrito()
+        self.assertEqual(
+            carrito.lineas(), {uno.pk: (2, Dinero(2000)), dos.pk: (1, Dinero(1250)), tres.pk: (3, Dinero(799))},
+        )
+        self.assertEqual(carrito.get_total_price(), Dinero(7647))
+
+
+class PaginacionTests(TestCase):
+    """Paginación por clave (nombre, id) del catálogo (paginacion.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        # Tres "B" iguales: el id desempata
+        cls.libros = [
+            Libro.objects.create(editorial=editorial, nombre=nombre, autor="Autor", costo=10, precio_venta=20)
+            for nombre in ("E", "B", "A", "B", "D", "B", "C")
+        ]
+        cls.orden = [libro.pk for libro in sorted(cls.libros, key=lambda libro: (libro.nombre, libro.pk))]
+
+    def _pagina(self, token=None):
+        return paginar_por_clave(Libro.objects.all(), token, 3)
+
+    def _ids(self, pagina):
+        return [libro.pk for libro in pagina]
+
+    def test_siguiente_y_anterior(self):
+        paginas = [self._pagina()]
+        self.assertIsNone(paginas[0].anterior)
+        while paginas[-1].siguiente:
+            paginas.append(self._pagina(paginas[-1].siguiente))
+        self.assertEqual([self._ids(pagina) for pagina in paginas], [self.orden[0:3], self.orden[3:6], self.orden[6:]])
+
+        # De vuelta desde la última página
+        anterior = self._pagina(paginas[-1].anterior)
+        self.assertEqual(self._ids(anterior), self.orden[3:6])
+        primera = self._pagina(anterior.anterior)
+        self.assertEqual(self._ids(primera), self.orden[0:3])
+        self.assertIsNone(primera.anterior)
+        self.assertEqual(self._ids(self._pagina(primera.siguiente)), self.orden[3:6])
+
+    def test_empates_en_nombre(self):
+        # El cursor cae entre dos "B": la página siguiente empieza en la B que falta
+        pagina = paginar_por_clave(Libro.objects.all(), None, 2)
+        siguiente = paginar_por_clave(Libro.objects.all(), pagina.siguiente, 2)
+        self.assertEqual([libro.nombre for libro in pagina] + [libro.nombre for libro in siguiente], ["A", "B", "B", "B"])
+        self.assertEqual(self._ids(pagina) + self._ids(siguiente), self.orden[:4])
+
+    def test_sin_offset(self):
+        pagina = self._pagina(self._pagina().siguiente)
+        with CaptureQueriesContext(connection) as capturadas:
+            self._pagina(pagina.siguiente)
+        self.assertEqual(len(capturadas), 1)
+        self.assertNotIn('OFFSET', capturadas[0]['sql'])
+
+    def test_cursor_invalido_vuelve_a_la_primera_pagina(self):
+        def token(valor):
+            return base64.urlsafe_b64encode(json.dumps(valor).encode()).decode().rstrip('=')
+
+        primera = self._ids(self._pagina())
+        for malo in (
+            'basura', '!!!', token({}), token(5), token(['s', 'nombre', 'B']),
+            token(['x', 'nombre', 'B', 1]), token(['s', 'nombre', 3, 1]), token(['s', 'nombre', 'B', '1']),
+            token(['s', 'nombre', 'B', True]), token(['s', 'relevancia', -1.5, 1]),
+        ):
+            with self.subTest(cursor=malo):
+                pagina = self._pagina(malo)
+                self.assertEqual(self._ids(pagina), primera)
+                self.assertIsNone(pagina.anterior)
+        self.assertEqual(self.client.get(reverse('catalogo_libros'), {'cursor': 'basura'}).status_code, 200)
+
+
+class CheckoutTests(TestCase):
+    """Revalidación de stock al pagar (checkout.py)."""
+
+    def setUp(self):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        bodega = Bodega.objects.create(nota="A")
+        self.uno = Libro.objects.create(editorial=editorial, nombre="Uno", autor="Autor", costo=10, precio_venta=20)
+        self.dos = Libro.objects.create(editorial=editorial, nombre="Dos", autor="Autor", costo=10, precio_venta=15)
+        self.stock_uno = Stock.objects.create(libro=self.uno, bodega=bodega, cantidad=2)
+        self.stock_dos = Stock.objects.create(libro=self.dos, bodega=bodega, cantidad=1)
+
+    def _checkout(self, cliente=None):
+        return (cliente or self.client).post(reverse('orden_checkout'), {
+            'nombre': 'Ana', 'apellido': 'Pérez', 'telefono': '555', 'direccion': 'Calle 1',
+        })
+
+    def _agregar(self, libro, cantidad, cliente=None):
+        (cliente or self.client).post(reverse('carrito_add', args=[libro.pk]), {'cantidad': cantidad})
+
+    def test_ajusta_o_quita_lineas_sin_stock(self):
+        self._agregar(self.uno, 2)
+        self._agregar(self.dos, 1)
+        # El stock baja después de llenar el carrito
+        self.stock_uno.cantidad = 1
+        self.stock_uno.save()
+        self.stock_dos.cantidad = 0
+        self.stock_dos.save()
+
+        respuesta = self._checkout()
+        self.assertRedirects(respuesta, reverse('carrito_detail'), fetch_redirect_response=False)
+        self.assertFalse(Venta.objects.exists())
+        mensajes = [str(mensaje) for mensaje in get_messages(respuesta.wsgi_request)][-2:]
+        self.assertIn('Solo quedan 1 unidades de "Uno"', mensajes[0])
+        self.assertIn('"Dos" se agotó', mensajes[1])
+        carrito = self.client.get(reverse('carrito_detail')).context['carrito']
+        self.assertEqual(carrito.lineas(), {self.uno.pk: (1, Dinero(2000))})
+
+        # Con el carrito ya ajustado, el checkout pasa
+        self.assertRedirects(self._checkout(), reverse('orden_confirmada'), fetch_redirect_response=False)
+        venta = Venta.objects.get()
+        self.assertEqual(list(venta.detalleventa_set.values_list('libro_id', 'cantidad')), [(self.uno.pk, 1)])
+        self.assertEqual(venta.precio_total, Decimal('20.00'))
+
+    def test_carrera_por_la_ultima_unidad(self):
+        # Dos compradores con la última unidad de "Dos" en el carrito. El checkout
+        # no aparta stock: las dos órdenes quedan PENDIENTES y gana quien se confirme primero.
+        otro, tercero = self.client_class(), self.client_class()
+        self._agregar(self.dos, 1)
+        self._agregar(self.dos, 1, otro)
+        self._agregar(self.dos, 1, tercero)
+        self._checkout()
+        self._checkout(otro)
+        primera, segunda = Venta.objects.order_by('id')
+
+        primera.estado = 'CONFIRMADA'
+        primera.save()
+        segunda.estado = 'CONFIRMADA'
+        with self.assertRaises(StockInsuficiente):
+            segunda.save()
+        self.assertEqual(Venta.objects.get(pk=segunda.pk).estado, 'PENDIENTE')
+        self.assertEqual(Stock.objects.get(pk=self.stock_dos.pk).cantidad, 0)
+        self.assertEqual(Libro.objects.get(pk=self.dos.pk).stock_total, 0)
+
+        # Quien llenó el carrito antes y paga después de la confirmación ya no puede pagar esa línea
+        self.assertRedirects(self._checkout(tercero), reverse('carrito_detail'), fetch_redirect_response=False)
+        self.assertEqual(Venta.objects.count(), 2)
+        self.assertEqual(len(tercero.get(reverse('carrito_detail')).context['carrito']), 0)
+
+
+class DineroTests(SimpleTestCase):
+    """Dinero en centavos enteros (dinero.py)."""
+
+    def test_ida_y_vuelta_exacta(self):
+        for texto in ('0.00', '0.01', '12.50', '19.99', '-3.05', '99999999.99'):
+            valor = Decimal(texto)
+            self.assertEqual(Dinero.desde_decimal(valor).a_decimal(), valor)
+            self.assertEqual(str(Dinero.desde_decimal(valor).a_decimal()), texto)
+        self.assertEqual(Dinero.desde_decimal('12.5').centavos, 1250)
+        self.assertEqual(Dinero.desde_decimal(7).centavos, 700)
+        self.assertEqual(Dinero.desde_decimal(None), Dinero(0))
+
+    def test_redondeo_a_centavos(self):
+        # Medio centavo hacia arriba (lejos del cero), no redondeo bancario
+        self.assertEqual(Dinero.desde_decimal('0.005').centavos, 1)
+        self.assertEqual(Dinero.desde_decimal('0.015').centavos, 2)
+        self.assertEqual(Dinero.desde_decimal('0.0049').centavos, 0)
+        self.assertEqual(Dinero.desde_decimal('-0.005').centavos, -1)
+        self.assertEqual(Dinero.desde_decimal(19.99).centavos, 1999)  # float de un carrito viejo
+
+    def test_aritmetica(self):
+        precio = Dinero(1999)
+        self.assertEqual(precio * 3, Dinero(5997))
+        self.assertEqual(3 * precio, Dinero(5997))
+        self.assertEqual(sum([precio, Dinero(1)]), Dinero(2000))
+        self.assertEqual(precio - Dinero(999), Dinero(1000))
+        self.assertEqual(f"{precio:.2f}", '19.99')
+        self.assertLess(Dinero(1), Dinero(2))
+        with self.assertRaises(TypeError):
+            precio * 1.5
+        with self.assertRaises(TypeError):
+            precio + Decimal('1.00')
+
+    def test_total_de_linea(self):
+        self.assertEqual(DetalleVenta(cantidad=3, precio=Decimal('0.10')).total_linea, Dinero(30))
+        self.assertEqual(DetalleVenta(cantidad=None, precio=Decimal('5.00')).total_linea, Dinero(0))
+
+
+class TotalesEnCentavosTests(TestCase):
+    """Totales del carrito, del checkout y de la venta sin error de redondeo."""
+
+    def test_carrito_checkout_y_venta(self):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        bodega = Bodega.objects.create(nota="A")
+        precios = (Decimal('0.10'), Decimal('0.20'), Decimal('19.99'))
+        for numero, precio in enumerate(precios):
+            libro = Libro.objects.create(editorial=editorial, nombre=f"L{numero}", autor="A", costo=0, precio_venta=precio)
+            Stock.objects.create(libro=libro, bodega=bodega, cantidad=10)
+            self.client.post(reverse('carrito_add', args=[libro.pk]), {'cantidad': 3})
+
+        carrito = self.client.get(reverse('carrito_detail')).context['carrito']
+        # 3 × (0.10 + 0.20 + 19.99) = 60.87; en float 0.1 + 0.2 ya no es 0.3
+        self.assertEqual(carrito.get_total_price(), Dinero(6087))
+        self.assertEqual([linea['total_linea'] for linea in carrito], [Dinero(30), Dinero(60), Dinero(5997)])
+
+        self.client.post(reverse('orden_checkout'), {
+            'nombre': 'Ana', 'apellido': 'Pérez', 'telefono': '555', 'direccion': 'Calle 1',
+        })
+        venta = Venta.objects.get()
+        self.assertEqual(venta.precio_total, Decimal('60.87'))
+        self.assertEqual(venta.total_calculado, Dinero(6087))
+        self.assertEqual(venta.comprobante.total, Dinero(6087))
+
+
+class CacheCatalogoTests(TestCase):
+    """Páginas del catálogo en caché por versión (cache_catalogo.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        self.libro = Libro.objects.create(editorial=self.editorial, nombre="Gatos", autor="Autor", costo=10, precio_venta=20)
+        self.stock = Stock.objects.create(libro=self.libro, bodega=Bodega.objects.create(nota="A"), cantidad=5)
+
+    def _html(self, cliente=None, url=None):
+        respuesta = (cliente or self.client).get(url or reverse('catalogo_libros'))
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.content.decode()
+
+    def _cambia_version(self, cambiar):
+        antes = version_catalogo()
+        with self.captureOnCommitCallbacks(execute=True):
+            cambiar()
+        self.assertNotEqual(version_catalogo(), antes)
+
+    def test_cambios_invalidan_las_paginas(self):
+        self.assertIn("Gatos", self._html())
+        with CaptureQueriesContext(connection) as capturadas:
+            self._html()
+        self.assertEqual(len(capturadas), 0)  # Desde la caché
+
+        def renombrar():
+            self.libro.nombre = "Perros"
+            self.libro.save()
+        self._cambia_version(renombrar)
+        self.assertIn("Perros", self._html())
+
+        def vaciar():
+            self.stock.cantidad = 0
+            self.stock.save()
+        self._cambia_version(vaciar)
+        self.assertNotIn("Perros", self._html())
+
+        def renombrar_editorial():
+            self.editorial.nombre = "Otra"
+            self.editorial.save()
+        self._cambia_version(renombrar_editorial)
+        self._cambia_version(lambda: Stock.objects.create(
+            libro=self.libro, bodega=Bodega.objects.create(nota="B"), cantidad=1,
+        ))
+        self.assertIn("Perros", self._html())
+
+    def test_nada_de_un_visitante_llega_a_otro(self):
+        detalle = reverse('detalle_libro', args=[self.libro.pk])
+        self.client.post(reverse('carrito_add', args=[self.libro.pk]), {'cantidad': 3})
+        for url in (reverse('catalogo_libros'), detalle):
+            self.assertIn('<span class="cart-count">3</span>', self._html(url=url))
+
+        # Otro visitante recibe las mismas páginas ya en caché, con su carrito y su token CSRF
+        otro = Client(enforce_csrf_checks=True)
+        for url in (reverse('catalogo_libros'), detalle):
+            html = self._html(otro, url)
+            self.assertIn('<span class="cart-count">0</span>', html)
+            self.assertNotIn(MARCADOR_CSRF, html)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', html).group(1)
+        respuesta = otro.post(reverse('carrito_add', args=[self.libro.pk]), {'cantidad': 1, 'csrfmiddlewaretoken': token})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertIn('<span class="cart-count">1</span>', self._html(otro, detalle))
+
+
+class ResumenStockTests(TestCase):
+    """Los resúmenes de stock mantenidos por señales coinciden con una reconstrucción completa."""
+
+    def _resumenes(self):
+        libros = dict(ResumenStockLibro.objects.values_list('libro_id', 'total'))
+        # La reconstrucción solo crea filas para bodegas con Stock; las que quedaron en 0 no cuentan
+        bodegas = dict(ResumenStockBodega.objects.exclude(total=0).values_list('bodega_id', 'total'))
+        return libros, bodegas
+
+    def assertIgualAReconstruir(self):
+        incremental = self._resumenes()
+        call_command('reconstruir_resumen_stock', stdout=io.StringIO())
+        self.assertEqual(incremental, self._resumenes())
+
+    def test_crear_editar_borrar_y_cascada(self):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        libros = [
+            Libro.objects.create(editorial=editorial, nombre=f"Libro {i}", autor="Autor", costo=10, precio_venta=20)
+            for i in range(4)
+        ]
+        bodegas = [Bodega.objects.create(nota=nota) for nota in "ABC"]
+        stocks = {
+            (libro.pk, bodega.pk): Stock.objects.create(libro=libro, bodega=bodega, cantidad=3 + i + j)
+            for i, libro in enumerate(libros) for j, bodega in enumerate(bodegas)
+        }
+        self.assertIgualAReconstruir()
+        self.assertEqual(ResumenStockLibro.objects.get(libro=libros[0]).total, 3 + 4 + 5)
+
+        # Editar la cantidad y pasar una fila a otra bodega
+        stock = stocks[(libros[0].pk, bodegas[0].pk)]
+        stock.cantidad = 10
+        stock.save()
+        stock = Stock.objects.get(pk=stocks[(libros[1].pk, bodegas[1].pk)].pk)
+        stock.bodega = Bodega.objects.create(nota="D")
+        stock.cantidad = 1
+        stock.save()
+        self.assertIgualAReconstruir()
+
+        stocks[(libros[2].pk, bodegas[2].pk)].delete()
+        Stock.objects.filter(libro=libros[3], bodega=bodegas[0]).delete()
+        self.assertIgualAReconstruir()
+
+        # En cascada: al borrar una bodega y un libro se van sus filas de Stock
+        bodegas[1].delete()
+        libros[2].delete()
+        self.assertIgualAReconstruir()
+        self.assertFalse(ResumenStockBodega.objects.filter(bodega_id=bodegas[1].pk).exclude(total=0).exists())
+        self.assertEqual(
+            ResumenStockLibro.objects.get(libro=libros[0]).total,
+            sum(Stock.objects.filter(libro=libros[0]).values_list('cantidad', flat=True)),
+        )
+
+
+class GenerarDatosTests(TestCase):
+    """Humo del comando generar_datos: crea lo pedido y deja libro mayor, resúmenes e índice al día."""
+
+    def test_datos_pequenos(self):
+        salida = io.StringIO()
+        call_command(
+            'generar_datos', '--editoriales=2', '--libros=15', '--bodegas=2', '--clientes=5', '--ventas=20',
+            '--dias=3', stdout=salida,
+        )
+        self.assertIn("15 libros", salida.getvalue())
+        self.assertEqual(Libro.objects.count(), 15)
+        self.assertEqual(Venta.objects.count(), 20)
+        self.assertTrue(DetalleVenta.objects.exists())
+
+        # ENTRADA + VENTAS de cada fila = Stock
+        for libro_id, bodega_id, cantidad in Stock.objects.values_list('libro_id', 'bodega_id', 'cantidad'):
+            self.assertEqual(stock_segun_libro_mayor(libro_id, bodega_id), cantidad)
+        totales = {}
+        for libro_id, cantidad in Stock.objects.values_list('libro_id', 'cantidad'):
+            totales[libro_id] = totales.get(libro_id, 0) + cantidad
+        self.assertEqual(dict(ResumenStockLibro.objects.values_list('libro_id', 'total')), totales)
+        libro = Libro.objects.order_by('id').first()
+        self.assertIn(libro, filtrar_por_busqueda(Libro.objects.all(), libro.nombre))
+
+
+class EstresCheckoutTests(TransactionTestCase):
+    """Humo del arnés de estrés (estres.py): cuenta bien confirmadas, rechazos y sobreventa."""
+
+    def setUp(self):
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        self.libro = Libro.objects.create(editorial=editorial, nombre="Caliente", autor="Estrés", costo=10, precio_venta=20)
+        Stock.objects.create(libro=self.libro, bodega=Bodega.objects.create(nota="A"), cantidad=2)
+        Stock.objects.create(libro=self.libro, bodega=Bodega.objects.create(nota="B"), cantidad=1)
+
+    def test_compradores_por_la_ultima_unidad(self):
+        # Un hilo: el arnés pasa por sus propias conexiones, pero sin pelear por el bloqueo
+        resultados = estres.ejecutar_compradores(5, [self.libro.pk], 1, concurrencia=1)
+        informe = estres.resumir(resultados, segundos=1)
+        self.assertEqual(informe['compradores'], 5)
+        self.assertEqual(informe['resultados'], {estres.CONFIRMADA: 3, estres.RECHAZADA_CARRITO: 2})
+        self.assertEqual(informe['latencias']['confirmar']['n'], 3)
+        self.assertEqual(informe['errores'], [])
+
+        sobreventa = estres.sobreventa([self.libro.pk], {self.libro.pk: 3})
+        self.assertEqual(sobreventa['unidades_en_negativo'], 0)
+        self.assertEqual(sobreventa['unidades_de_mas'], 0)
+        self.assertEqual(sobreventa['por_libro'][self.libro.pk]['vendidas'], 3)
+        self.assertEqual(sobreventa['por_libro'][self.libro.pk]['stock_final'], 0)
+
+    def test_sobreventa_detecta_stock_negativo(self):
+        Stock.objects.filter(libro=self.libro).update(cantidad=-1)
+        self.assertEqual(estres.sobreventa([self.libro.pk], {self.libro.pk: 3})['unidades_en_negativo'], 2)
+
+
+class VistasAsyncTests(TestCase):
+    """Catálogo, detalle y carrito en su versión async (CATALOGO_VISTAS_ASYNC) con AsyncClient."""
+
+    def setUp(self):
+        cache.clear()
+        # urls.py elige las vistas al importarse: se recarga con el ajuste activo
+        ajuste = self.settings(CATALOGO_VISTAS_ASYNC=True)
+        ajuste.enable()
+        self.addCleanup(self._recargar_urls)
+        self.addCleanup(ajuste.disable)
+        self._recargar_urls()
+
+        editorial = Editorial.objects.create(nombre="Editorial", telefono="555")
+        bodega = Bodega.objects.create(nota="A")
+        self.libros = [
+            Libro.objects.create(editorial=editorial, nombre=f"Libro {i:02d}", autor="Autor", costo=10, precio_venta=20)
+            for i in range(30)
+        ]
+        for libro in self.libros:
+            Stock.objects.create(libro=libro, bodega=bodega, cantidad=5)
+        self.gato = Libro.objects.create(editorial=editorial, nombre="El gato", autor="Ana", costo=10, precio_venta=20)
+        Stock.objects.create(libro=self.gato, bodega=bodega, cantidad=1)
+
+    def _recargar_urls(self):
+        importlib.reload(importlib.import_module('inventario_ventas.urls'))
+        importlib.reload(urls_proyecto)
+        clear_url_caches()
+
+    async def test_usa_las_vistas_async(self):
+        for nombre, kwargs, vista in (
+            ('catalogo_libros', {}, CatalogoLibrosAsyncView),
+            ('detalle_libro', {'pk': 1}, DetalleLibroPublicoAsyncView),
+        ):
+            self.assertIs(resolve(reverse(nombre, kwargs=kwargs)).func.view_class, vista)
+        self.assertIs(resolve(reverse('carrito_detail')).func, carrito_detail_async)
+
+    async def test_catalogo_pagina_y_busca(self):
+        respuesta = await self.async_client.get(reverse('catalogo_libros'))
+        self.assertEqual(respuesta.status_code, 200)
+        pagina = respuesta.context['pagina']
+        self.assertEqual([libro.nombre for libro in pagina.objetos][:2], ["El gato", "Libro 00"])
+        self.assertEqual(len(pagina.objetos), CatalogoLibrosView.por_pagina)
+        self.assertEqual(respuesta.context['total_resultados'], 31)
+
+        siguiente = await self.async_client.get(reverse('catalogo_libros'), {'cursor': pagina.siguiente})
+        self.assertEqual([libro.nombre for libro in siguiente.context['pagina'].objetos][-1], "Libro 29")
+
+        respuesta = await self.async_client.get(reverse('catalogo_libros'), {'q': 'gato'})
+        self.assertContains(respuesta, "El gato")
+        self.assertNotContains(respuesta, "Libro 00")
+
+    async def test_detalle_y_carrito(self):
+        respuesta = await self.async_client.get(reverse('detalle_libro', args=[self.gato.pk]))
+        self.assertContains(respuesta, "El gato")
+        self.assertEqual(respuesta.context['stock'], 1)
+        respuesta = await self.async_client.get(reverse('detalle_libro', args=[self.gato.pk + 100]))
+        self.assertEqual(respuesta.status_code, 404)
+
+        await self.async_client.post(reverse('carrito_add', args=[self.gato.pk]), {'cantidad': 1})
+        respuesta = await self.async_client.get(reverse('carrito_detail'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context['carrito']), 1)
+        # La página del detalle sale de la caché pero con el carrito de este visitante
+        respuesta = await self.async_client.get(reverse('detalle_libro', args=[self.gato.pk]))
+        self.assertContains(respuesta, '<span class="cart-count">1</span>')
 
-# Create your tests here.
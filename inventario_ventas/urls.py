@@ -1,30 +1,42 @@
 from django.urls import path, include
 from .views import (
     CatalogoLibrosView, DetalleLibroPublicoView, DashboardVentasView, # ¡Importar!
-    carrito_add, carrito_remove, carrito_detail, orden_checkout, orden_confirmada, carrito_update_quantity
+    carrito_add, carrito_remove, carrito_detail, orden_checkout, orden_confirmada, carrito_update_quantity,
+    perfil_sql, exportar_ventas, CatalogoLibrosAsyncView, DetalleLibroPublicoAsyncView, carrito_detail_async,
 )
 from django.conf import settings
 from django.conf.urls.static import static
 import os
 
+# Con ASGI, las páginas de solo lectura más visitadas pueden ir en versión async
+if getattr(settings, 'CATALOGO_VISTAS_ASYNC', False):
+    catalogo_view, detalle_view, carrito_view = CatalogoLibrosAsyncView, DetalleLibroPublicoAsyncView, carrito_detail_async
+else:
+    catalogo_view, detalle_view, carrito_view = CatalogoLibrosView, DetalleLibroPublicoView, carrito_detail
+
 urlpatterns = [
     # Catálogo (ya existe)
-    path('', CatalogoLibrosView.as_view(), name='catalogo_libros'),
+    path('', catalogo_view.as_view(), name='catalogo_libros'),
     # Detalle de Libro (ya existe)
-    path('libro/<int:pk>/', DetalleLibroPublicoView.as_view(), name='detalle_libro'),
+    path('libro/<int:pk>/', detalle_view.as_view(), name='detalle_libro'),
     
     # --- Nuevas URLs de Carrito ---
-    path('carrito/', carrito_detail, name='carrito_detail'),
+    path('carrito/', carrito_view, name='carrito_detail'),
     path('carrito/add/<int:libro_id>/', carrito_add, name='carrito_add'),
     path('carrito/remove/<int:libro_id>/', carrito_remove, name='carrito_remove'),
     path('carrito/update/<int:libro_id>/', carrito_update_quantity, name='carrito_update_quantity'),
-    path('', CatalogoLibrosView.as_view(), name='catalogo_libros'),
+    path('', catalogo_view.as_view(), name='catalogo_libros'),
     path('dashboard/', DashboardVentasView.as_view(), name='dashboard_ventas'),
+    # Exportación de líneas de venta por rango de fechas (solo staff)
+    path('ventas/exportar/', exportar_ventas, name='exportar_ventas'),
 
     # URLs de Checkout
     path('orden/checkout/', orden_checkout, name='orden_checkout'),
     path('orden/confirmada/', orden_confirmada, name='orden_confirmada'),
 
+    # Perfilado de SQL de los últimos requests (solo staff, con PERFIL_SQL activo)
+    path('debug/sql/', perfil_sql, name='perfil_sql'),
+
     # ... otras URLs
     
 ]
@@ -33,5 +45,5 @@ if settings.DEBUG:
     # 1. Manejo de Archivos Estáticos (CSS, JS)
     urlpatterns += static(settings.STATIC_URL, document_root=os.path.join(settings.BASE_DIR, 'static')) 
     
-    # 2. Manejo de Archivos de Medios (Imágenes de portada y black-cats.jpg)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Los archivos de medios (portadas y black-cats.jpg) se sirven con
+    # servir_media desde libreria_project/urls.py (ETag + Cache-Control).
\ No newline at end of file
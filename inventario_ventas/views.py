@@ -5,6 +5,7 @@ from django.views.decorators.http import require_POST
 from django.db import transaction, DatabaseError
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.utils import timezone
 
 # Importaciones necesarias para la solución
 from django.db.models import Sum, Q, F, DecimalField # <<< ¡Importa DecimalField!
@@ -12,57 +13,137 @@ from django.db.models.functions import Coalesce
 from datetime import date, timedelta
 from decimal import Decimal # <<< ¡Importa Decimal!
 
-import urllib.parse
+import mimetypes
+import os
+import stat
 
-from .models import Libro, Cliente, Venta, DetalleVenta, Cliente , Stock, Staff
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils._os import safe_join
+
+from .models import Libro, Cliente, Venta, DetalleVenta, Cliente , Stock, Staff, ComprobanteOrden
 from .carrito import Carrito
-from .forms import CarritoAddLibroForm, ClienteCheckoutForm
+from .cache_catalogo import PaginaEnCacheMixin, PaginaEnCacheAsyncMixin, precargar_visitante
+from .paginacion import paginar_por_clave, conteo_en_cache, apaginar_por_clave, aconteo_en_cache
+from .busqueda import filtrar_por_busqueda, relevancia
+from .checkout import validar_carrito, crear_venta, enlace_whatsapp
+from .almacenamiento import es_nombre_inmutable
+from .perfilado import perfil_activo, perfiles_recientes
+from .reportes import (
+    total_vendido, clientes_top, libros_mas_vendidos, libros_bajo_stock, contar_bajo_stock, umbral_bajo_stock,
+)
+from .forms import CarritoAddLibroForm, ClienteCheckoutForm, ExportarVentasForm
+from .exportacion import en_async, exportar, nombre_archivo
 
 # --- Vistas del Catálogo Público (Paso 3) ---
 
-class CatalogoLibrosView(ListView):
+class CatalogoLibrosView(PaginaEnCacheMixin, ListView):
     model = Libro
     template_name = 'catalogo/lista_libros.html' 
     context_object_name = 'libros'
-    # paginate_by = 12 
+    # Paginación por clave (nombre, id) en lugar de paginate_by/OFFSET
+    por_pagina = 24
+    mostrar_total = True
+    # El HTML se comparte entre visitantes (ver cache_catalogo.py)
+    parametros_cache = ('q', 'cursor')
 
     def get_queryset(self):
-        queryset = super().get_queryset().annotate(
-            stock_disponible=Coalesce(Sum('stock__cantidad'), 0)
-        ).filter(
-            stock_disponible__gt=0
+        # El stock viene de la tabla de resumen (índice sobre 'total'),
+        # así que ya no hacemos GROUP BY sobre toda la tabla Stock.
+        queryset = super().get_queryset().filter(
+            resumen_stock__total__gt=0
+        ).annotate(
+            stock_disponible=F('resumen_stock__total')
         )
+        self.campo_orden = 'nombre'
         query = self.request.GET.get('q')
         if query:
-            queryset = queryset.filter(
-                Q(nombre__icontains=query) | 
-                Q(autor__icontains=query) |  
-                Q(editorial__nombre__icontains=query)
-            )
-        return queryset.order_by('nombre')
+            # Índice FTS5: sin distinguir acentos/mayúsculas y por prefijo
+            queryset = filtrar_por_busqueda(queryset, query)
+            # Los resultados más relevantes primero (bm25); el cursor pagina sobre (relevancia, id)
+            orden = relevancia(query)
+            if orden is not None:
+                queryset = queryset.annotate(relevancia=orden)
+                self.campo_orden = 'relevancia'
+        return queryset.order_by(self.campo_orden, 'id')
     
-    def get_context_data(self, **kwargs):
+    def get_context_data(self, pagina=None, total_resultados=None, **kwargs):
+        # CatalogoLibrosAsyncView (más abajo) ya trae la página y el total consultados
+        if pagina is None:
+            pagina = paginar_por_clave(
+                self.object_list, self.request.GET.get('cursor'), self.por_pagina, self.campo_orden,
+            )
+        kwargs['object_list'] = pagina.objetos
         context = super().get_context_data(**kwargs)
-        # Instancia el objeto Carrito usando la request y lo añade al contexto
-        context['carrito'] = Carrito(self.request)
+        context['pagina'] = pagina
+        if self.mostrar_total:
+            # Conteo aproximado: se cachea por búsqueda, no se recalcula en cada visita
+            if total_resultados is None:
+                consulta = self.request.GET.get('q', '')
+                total_resultados = conteo_en_cache(self.object_list, consulta)
+            context['total_resultados'] = total_resultados
+        # El contador del carrito se inserta en cada request (fragmento_carrito)
         return context
 
 
-class DetalleLibroPublicoView(DetailView):
+class DetalleLibroPublicoView(PaginaEnCacheMixin, DetailView):
     model = Libro
     template_name = 'catalogo/detalle_libro_publico.html' 
     context_object_name = 'libro'
+
+    def get_queryset(self):
+        # Trae editorial y resumen de stock en la misma consulta del libro
+        return super().get_queryset().select_related('editorial', 'resumen_stock')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # El stock total se calcula automáticamente por el @property en el modelo.
+        # El stock total sale del resumen desnormalizado (ver Libro.stock_total).
         context['stock'] = self.object.stock_total
-        context['carrito'] = Carrito(self.request)
         # Añade la instancia del formulario al contexto para el botón "Añadir al Carrito"
         context['form'] = CarritoAddLibroForm() 
         return context
 
 
+# --- Versiones async (con ASGI; ver CATALOGO_VISTAS_ASYNC en settings) ---
+# Consultan con aiterator/aaggregate/aget y la caché y la sesión con su API
+# async; la plantilla se renderiza igual que en las síncronas. Bajo WSGI no
+# ganan nada: Django las ejecuta en un bucle de eventos por request.
+
+class CatalogoLibrosAsyncView(PaginaEnCacheAsyncMixin, CatalogoLibrosView):
+
+    async def acontexto(self):
+        self.object_list = self.get_queryset()
+        pagina = await apaginar_por_clave(
+            self.object_list, self.request.GET.get('cursor'), self.por_pagina, self.campo_orden,
+        )
+        total_resultados = None
+        if self.mostrar_total:
+            total_resultados = await aconteo_en_cache(self.object_list, self.request.GET.get('q', ''))
+        return self.get_context_data(pagina=pagina, total_resultados=total_resultados)
+
+
+class DetalleLibroPublicoAsyncView(PaginaEnCacheAsyncMixin, DetalleLibroPublicoView):
+
+    async def acontexto(self):
+        try:
+            self.object = await self.get_queryset().aget(pk=self.kwargs['pk'])
+        except Libro.DoesNotExist:
+            raise Http404("No se encontró el libro.")
+        return self.get_context_data(object=self.object)
+
+
+async def carrito_detail_async(request):
+    """Muestra el contenido del carrito (versión async de carrito_detail)."""
+    carrito = await precargar_visitante(request, con_libros=True)
+    return render(request, 'catalogo/carrito_detail.html', {
+        'carrito': carrito,
+        'checkout_form': ClienteCheckoutForm(),
+    })
+
+
 # --- Vistas para Manejar el Carrito (Paso 4) ---
 
 @require_POST
@@ -72,7 +153,7 @@ def carrito_update_quantity(request, libro_id):
     Asegura que la cantidad no exceda el stock y elimina si llega a 0.
     """
     carrito = Carrito(request)
-    libro = get_object_or_404(Libro, id=libro_id)
+    libro = get_object_or_404(Libro.objects.select_related('resumen_stock'), id=libro_id)
     
     # 1. Obtener la nueva cantidad solicitada
     try:
@@ -113,7 +194,7 @@ def carrito_update_quantity(request, libro_id):
 def carrito_add(request, libro_id):
     """Añade un libro al carrito (vista de acción POST)"""
     carrito = Carrito(request)
-    libro = get_object_or_404(Libro, id=libro_id)
+    libro = get_object_or_404(Libro.objects.select_related('resumen_stock'), id=libro_id)
     form = CarritoAddLibroForm(request.POST)
 
     if form.is_valid():        
@@ -190,166 +271,195 @@ class DashboardVentasView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
             context = super().get_context_data(**kwargs)
             
-            hoy = date.today()
+            hoy = timezone.localdate()
             hace_7_dias = hoy - timedelta(days=7)
 
             # 2. Métrica 1: Ventas Totales y Ventas de Hoy
-            ventas_totales_hoy = Venta.objects.filter(fecha_hora__date=hoy).aggregate(
-                # 1. Definir el tipo de salida como Decimal
-                total=Sum('precio_total', output_field=DecimalField()) 
-            )['total'] or Decimal('0.00') # 2. Usar Decimal('0.00') como default
-
-            ventas_totales_semana = Venta.objects.filter(fecha_hora__date__gte=hace_7_dias).aggregate(
-                total=Sum('precio_total', output_field=DecimalField())
-            )['total'] or Decimal('0.00') # 2. Usar Decimal('0.00') como default
+            # Se leen del resumen diario pre-agregado (unas pocas filas por día),
+            # no de la tabla Venta completa.
+            # (rangos semiabiertos [desde, mañana): el índice de fecha se recorre como un rango acotado)
+            manana = hoy + timedelta(days=1)
+            ventas_totales_hoy = total_vendido(hoy, manana)['total']
+            ventas_totales_semana = total_vendido(hace_7_dias, manana)['total']
 
             context['ventas_hoy'] = f"{ventas_totales_hoy:.2f}"
             context['ventas_semana'] = f"{ventas_totales_semana:.2f}"
             
             # 3. Métrica 2: Clientes Top (Basado en gasto)
-            clientes_top = Cliente.objects.annotate(
-                # 1. Definir el tipo de salida del Sum y Coalesce
-                gasto_total=Coalesce(
-                    Sum('venta__precio_total', output_field=DecimalField()), 
-                    Decimal('0.00') # 2. Usar Decimal('0.00') como default
-                )
-            ).order_by('-gasto_total')[:5]
-
-            context['clientes_top'] = clientes_top
+            # Se agrupa Venta por cliente con el índice (cliente, precio_total)
+            context['clientes_top'] = clientes_top(limite=5)
             
-            # ... (Las métricas 4 y 5 de libros vendidos y stock no usan decimales, por lo que quedan igual)
+            # 4. Métrica 3: Libros más vendidos (tabla mantenida al confirmar ventas)
+            context['libros_mas_vendidos'] = libros_mas_vendidos(limite=10)
+            context['libros_mas_vendidos_semana'] = libros_mas_vendidos(limite=10, dias=7)
+
+            # 5. Métrica 4: Libros con bajo inventario (resumen de stock indexado por total)
+            context['umbral_bajo_stock'] = umbral_bajo_stock()
+            context['libros_bajo_stock'] = libros_bajo_stock()
+            context['num_libros_bajo_stock'] = contar_bajo_stock()
             
             return context
     
-@transaction.atomic
 def orden_checkout(request):
     """
     Captura los datos del cliente, registra la Venta como PENDIENTE
-    y guarda la info del cliente en la sesión.
+    y congela los datos de contacto y las líneas en su ComprobanteOrden.
+    En la sesión solo queda el id de la orden (last_order_id).
     """
     carrito = Carrito(request)
     if not carrito:
         messages.error(request, "El carrito está vacío.")
         return redirect('carrito_detail')
 
-    if request.method == 'POST':
-        form = ClienteCheckoutForm(request.POST)
-        if form.is_valid():
-            datos_cliente = form.cleaned_data
+    if request.method != 'POST':
+        return redirect('carrito_detail')
 
-            try:
-            
-                # 1. CREAR EL ENCABEZADO DE LA VENTA COMO PENDIENTE
-                nueva_venta = Venta.objects.create(
-                    # Estos campos se dejarán NULL o con valores temporales.
-                    # Asegúrate que tus modelos permitan id_cliente, id_staff ser NULL.
-                    # Si no pueden ser NULL, DEBES DEJAR ESTA FUNCIÓN PENDIENTE
-                    # HASTA QUE MODIFIQUES TUS MIGRACIONES para permitir NULL.
-                    
-                    # Para fines de prueba, pondremos ID_CLIENTE=NULL, ID_STAFF=NULL. 
-                    # Si tienes restricciones NOT NULL en el modelo, comenta estas líneas.
-                    cliente=None, 
-                    staff=None,
-                    
-                    precio_total=carrito.get_total_price(),
-                    estado = 'PENDIENTE'
-
-                )
-                
-                # Guardamos los datos temporales del cliente en la sesión para el mensaje de WhatsApp
-                
-                # Opción más simple: Usar la sesión para el mensaje de WhatsApp.
-                request.session['temp_cliente_info'] = datos_cliente
-                
-
-                # 2. CREAR DETALLES DE VENTA
-                for item in carrito:
-
-                    libro = item['libro']
-                    cantidad_vendida = item['cantidad']
-
-                    DetalleVenta.objects.create(
-                        venta=nueva_venta,
-                        libro=libro,
-                        cantidad=cantidad_vendida,
-                        precio=item['precio']
-                    )
-
-
-                # 3. LIMPIAR CARRITO Y REDIRIGIR A CONFIRMACIÓN
-                carrito.clear()
-                request.session['last_order_id'] = nueva_venta.id 
-
-                datos_cliente = {
-                    'nombre': f"{datos_cliente['nombre']} {datos_cliente['apellido']}",
-                    'telefono': datos_cliente['telefono'],
-                    'email': datos_cliente['email'],
-                    # Agregamos un campo de dirección al contexto temporal.
-                    'direccion': request.POST.get('direccion', 'No especificada') 
-                }
-                request.session['temp_cliente_info'] = datos_cliente
-
-                messages.success(request, f"¡Orden #{nueva_venta.id} recibida! Por favor, contacte por WhatsApp para finalizar.")
-                return redirect('orden_confirmada')
-        
-            except DatabaseError as e:
-                # Si ocurre un error de stock/DB, la transacción se revierte automáticamente
-                messages.error(request, f"Lo sentimos, hubo un error con el inventario. Por favor, revisa tu carrito. ({e})")
-                return redirect('carrito_detail')
-
-        else:
-            # Si el formulario no es válido
-            messages.error(request, "Por favor, corrige los errores del formulario de contacto (Nombre, Teléfono, Dirección).")
-            return redirect('carrito_detail')
+    form = ClienteCheckoutForm(request.POST)
+    if not form.is_valid():
+        # Si el formulario no es válido
+        messages.error(request, "Por favor, corrige los errores del formulario de contacto (Nombre, Teléfono, Dirección).")
+        return redirect('carrito_detail')
+    datos_cliente = form.cleaned_data
+
+    # 1. REVALIDAR STOCK (una consulta para todo el carrito, fuera de la transacción)
+    lineas, ajustes = validar_carrito(carrito)
+    if ajustes:
+        # Ajustamos el carrito a lo que realmente hay y dejamos que el cliente lo revise
+        for ajuste in ajustes:
+            carrito.set_qty(ajuste.libro_id, ajuste.disponible)
+            if ajuste.disponible:
+                messages.error(request, f'Solo quedan {ajuste.disponible} unidades de "{ajuste.nombre}"; ajustamos tu carrito.')
+            else:
+                messages.error(request, f'"{ajuste.nombre}" se agotó y fue eliminado de tu carrito.')
+        return redirect('carrito_detail')
+
+    try:
+        # 2. CREAR VENTA PENDIENTE + DETALLES (transacción corta, un bulk insert)
+        # Cliente y staff quedan NULL: los datos de contacto van en el comprobante de la orden.
+        contacto = {
+            'nombre': f"{datos_cliente['nombre']} {datos_cliente['apellido']}",
+            'telefono': datos_cliente['telefono'],
+            'email': datos_cliente['email'],
+            'direccion': datos_cliente.get('direccion') or 'No especificada',
+        }
+        nueva_venta = crear_venta(lineas, contacto=contacto, cliente=None, staff=None)
+    except DatabaseError as e:
+        # Si ocurre un error de stock/DB, la transacción se revierte automáticamente
+        messages.error(request, f"Lo sentimos, hubo un error con el inventario. Por favor, revisa tu carrito. ({e})")
+        return redirect('carrito_detail')
+
+    # 3. LIMPIAR CARRITO Y REDIRIGIR A CONFIRMACIÓN
+    carrito.clear()
+    request.session['last_order_id'] = nueva_venta.id 
+
+    messages.success(request, f"¡Orden #{nueva_venta.id} recibida! Por favor, contacte por WhatsApp para finalizar.")
+    return redirect('orden_confirmada')
 
 
 def orden_confirmada(request):
     """Muestra la página final de confirmación y prepara el link de WhatsApp."""
     
     order_id = request.session.pop('last_order_id', None)
-    datos_cliente_temp = request.session.pop('temp_cliente_info', {}) # <<< Obtener datos de cliente
 
     if not order_id:
         return render(request, 'catalogo/orden_confirmada.html', {'order_id': None})
         
     try:
-        venta = Venta.objects.get(id=order_id)
-        detalles = venta.detalleventa_set.all()
-    except Venta.DoesNotExist:
+        # Una búsqueda por PK: líneas, títulos, total y contacto vienen en el comprobante
+        comprobante = ComprobanteOrden.objects.get(pk=order_id)
+    except ComprobanteOrden.DoesNotExist:
         messages.error(request, "La orden solicitada no existe.")
         return redirect('catalogo_libros')
 
-    # CONSTRUIR EL MENSAJE DETALLADO
-    mensaje_partes = [
-        f"¡Hola! He generado una Orden *PENDIENTE* *#{venta.id}*.",
-        f"Mis datos de contacto son:",
-        f"Nombre: {datos_cliente_temp.get('nombre', 'N/A')} {datos_cliente_temp.get('apellido', '')}",
-        f"Teléfono: {datos_cliente_temp.get('telefono', 'N/A')}",
-        f"Email: {datos_cliente_temp.get('email', 'N/A')}",
-        f"Dirección de Envío: {datos_cliente_temp.get('direccion', 'N/A')}",
-        "\n--- Detalle del Pedido ---"
-    ]
-    
-    for item in detalles:
-        linea = f"• {item.libro.nombre} (x{item.cantidad}) | P/U: ${item.precio}"
-        mensaje_partes.append(linea)
-
-    mensaje_partes.append(f"\n*SUBTOTAL (+ envío): ${venta.precio_total:.2f}*")
-    mensaje_partes.append("\nPor favor, confirme mi pedido y los pasos para el pago y envío.")
-    
-    mensaje_base = "\n".join(mensaje_partes)
-    
-    mensaje_codificado = urllib.parse.quote(mensaje_base)
-    
-    numero_whatsapp = "+525620576697" 
-    
-    whatsapp_url = f"https://wa.me/{numero_whatsapp}?text={mensaje_codificado}"
-    
     context = {
-        'order_id': venta.id,
-        'whatsapp_url': whatsapp_url,
-        'venta': venta,
-        'datos_cliente': datos_cliente_temp
+        'order_id': comprobante.venta_id,
+        'whatsapp_url': enlace_whatsapp(comprobante),
+        'comprobante': comprobante,
+        'datos_cliente': comprobante.contacto,
     }
     
     return render(request, 'catalogo/orden_confirmada.html', context)
+
+
+# --- Perfilado de SQL (ver perfilado.py) ---
+
+@staff_member_required
+def perfil_sql(request):
+    """Últimos requests perfilados con su número de consultas, tiempo y sentencias más lentas."""
+    if not perfil_activo():
+        raise Http404("El perfilado de SQL está desactivado (settings.PERFIL_SQL).")
+    perfiles = perfiles_recientes()
+    vista = request.GET.get('vista')
+    if vista:
+        perfiles = [perfil for perfil in perfiles if perfil['vista'] == vista]
+    return JsonResponse({'requests': perfiles}, json_dumps_params={'ensure_ascii': False, 'indent': 2})
+
+
+TIPOS_EXPORTACION = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+
+
+@staff_member_required
+def exportar_ventas(request):
+    """
+    Líneas de venta de un rango de fechas (?desde=AAAA-MM-DD&hasta=...&formato=csv|jsonl
+    &estado=...&gzip=1) como descarga. Se envían a medida que se leen de la BD.
+    """
+    if not request.user.has_perm('inventario_ventas.view_venta'):
+        raise PermissionDenied
+    form = ExportarVentasForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errores': form.errors.get_json_data()}, status=400)
+    datos = form.cleaned_data
+    contenido = exportar(datos['desde'], datos['hasta'], datos['formato'], datos['estado'], datos['gzip'])
+    if isinstance(request, ASGIRequest):
+        # Con ASGI, un iterador síncrono se lee entero a memoria antes de enviarlo
+        contenido = en_async(contenido)
+    respuesta = StreamingHttpResponse(
+        contenido, content_type='application/gzip' if datos['gzip'] else TIPOS_EXPORTACION[datos['formato']],
+    )
+    nombre = nombre_archivo(datos['desde'], datos['hasta'], datos['formato'], datos['gzip'])
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    respuesta['Cache-Control'] = 'no-store'
+    respuesta['X-Accel-Buffering'] = 'no'  # nginx: pasar cada pedazo sin juntar la respuesta
+    return respuesta
+
+
+# --- Archivos de medios (portadas) con caché HTTP ---
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_MUTABLE = 'public, max-age=3600'
+
+
+def servir_media(request, path):
+    """
+    Sirve archivos de MEDIA_ROOT con ETag fuerte y respuestas 304.
+    Los nombres por hash de contenido (ver almacenamiento.py) nunca cambian,
+    así que se marcan como 'immutable' y el navegador no vuelve a pedirlos.
+    """
+    try:
+        ruta = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Archivo no encontrado")
+    try:
+        info = os.stat(ruta)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Archivo no encontrado")
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404("Archivo no encontrado")
+
+    if es_nombre_inmutable(path):
+        etag = '"%s"' % os.path.splitext(os.path.basename(path))[0]
+        cache_control = CACHE_INMUTABLE
+    else:
+        etag = '"%x-%x"' % (int(info.st_mtime), info.st_size)
+        cache_control = CACHE_MUTABLE
+
+    if etag in [valor.strip() for valor in request.headers.get('If-None-Match', '').split(',')]:
+        respuesta = HttpResponseNotModified()
+    else:
+        tipo, _ = mimetypes.guess_type(ruta)
+        respuesta = FileResponse(open(ruta, 'rb'), content_type=tipo or 'application/octet-stream')
+        respuesta['Content-Length'] = str(info.st_size)
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = cache_control
+    return respuesta
@@ -43,12 +43,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para contar también las consultas de sesión/auth de los demás
+    'inventario_ventas.perfilado.PerfilSQLMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'inventario_ventas.middleware.CarritoMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -79,6 +82,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # BEGIN IMMEDIATE: la transacción pide el candado de escritura al empezar
+            # y espera con busy_timeout, en vez de fallar al querer escribir a mitad.
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Conexiones persistentes: los PRAGMA (ver inventario_ventas/basedatos.py)
+        # se aplican una vez por conexión y no en cada request.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -139,6 +151,47 @@ LOGIN_URL = '/admin/login/'
 MEDIA_URL = '/media/'
 # 💡 CORRECCIÓN 3: Uso de os.path.join para consistencia
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') 
-
-
-APPEND_SLASH = True
\ No newline at end of file
+# Django sirve /media/ (ver inventario_ventas.views.servir_media) solo en desarrollo;
+# en producción lo sirve el servidor web.
+SERVIR_MEDIA = DEBUG
+
+
+APPEND_SLASH = True
+
+# Asignación de bodegas al confirmar ventas (ver inventario_ventas/asignacion.py)
+# Políticas: 'menos_bodegas', 'mayor_primero', 'principal_primero'
+INVENTARIO_POLITICA_ASIGNACION = 'menos_bodegas'
+INVENTARIO_BODEGA_PRINCIPAL = 1
+
+# Libros con menos unidades que este umbral aparecen en "bajo inventario" del dashboard
+INVENTARIO_UMBRAL_BAJO_STOCK = 20
+
+# Dónde se guarda el carrito (ver inventario_ventas/almacen_carrito.py):
+# 'cookie' (firmada), 'cache' (CACHES[CARRITO_CACHE]), 'tabla' o 'sesion'
+CARRITO_ALMACEN = 'cookie'
+CARRITO_CACHE = 'default'
+
+# Páginas públicas del catálogo en caché (ver inventario_ventas/cache_catalogo.py).
+# Se invalidan solas al cambiar libros/stock; este es solo el tiempo máximo.
+CATALOGO_CACHE_SEGUNDOS = 300
+
+# Catálogo, detalle y carrito con vistas async (aiterator, aaggregate, aget).
+# Conviene solo al servir con asgi.py (uvicorn, daphne); con WSGI cada vista
+# async corre en su propio bucle de eventos y sale más cara.
+# Comparar con: python manage.py bench_asgi
+CATALOGO_VISTAS_ASYNC = False
+
+# Perfilado de SQL por request (cabeceras X-SQL-* y /debug/sql/ para staff).
+# Por defecto sigue a DEBUG.
+PERFIL_SQL = DEBUG
+
+# SQLite (ver inventario_ventas/basedatos.py): PRAGMA de cada conexión
+# (synchronous, busy_timeout, cache_size, mmap_size; el modo WAL lo activa la
+# migración 0015) y escrituras calientes
+# (checkout, confirmar venta, movimientos de stock) en fila dentro del proceso
+# con reintentos si la BD sigue bloqueada.
+SQLITE_PRAGMAS = {}
+SESSION_ENGINE = 'inventario_ventas.sesiones'  # sesiones en la BD, guardadas en la misma fila
+ESCRITOR_SERIALIZADO = True
+ESCRITOR_REINTENTOS = 3
+ESCRITOR_ESPERA_SEGUNDOS = 0.05
@@ -15,9 +15,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include 
+import re
+
+from django.urls import path, re_path, include 
 from django.conf import settings # <<< Importar settings
-from django.conf.urls.static import static # <<< Importar static
+from inventario_ventas.views import servir_media
 
 urlpatterns = [
     # URL de administración
@@ -29,7 +31,11 @@ urlpatterns = [
     path('', include('inventario_ventas.urls')), 
 ]
 
-# Solo sirve archivos media si estamos en DEBUG mode (producción usa un servidor web)
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Archivos media (portadas) con ETag, 304 y Cache-Control: immutable para los
+# nombres por hash de contenido. Solo en desarrollo (SERVIR_MEDIA sigue a
+# DEBUG): en producción /media/ lo sirve el servidor web, con esas mismas cabeceras.
+if settings.SERVIR_MEDIA:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), servir_media, name='servir_media'),
+    ]
 